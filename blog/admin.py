@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from .models import User, Consent, SubscriptionPlan, UserSubscription, PaymentMethod, Payment, Method, UserCard, \
-    SupportSession, SupportMessage, ClientCard, Advice, GiftedSubscription, Material
+    SupportSession, SupportMessage, ClientCard, Advice, GiftedSubscription, Material, \
+    ExpiryReminder, BalanceEntry, BalanceSnapshot, IdempotencyKey
 
 
 @admin.register(User)
@@ -40,6 +41,14 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
     is_expiring_soon.short_description = 'Tez orada tugaydi'
 
 
+@admin.register(ExpiryReminder)
+class ExpiryReminderAdmin(admin.ModelAdmin):
+    list_display = ('subscription', 'sent_at', 'delivered')
+    search_fields = ('subscription__user__telegram_id',)
+    list_filter = ('delivered', 'sent_at')
+    list_select_related = ('subscription__user', 'subscription__plan')
+
+
 @admin.register(PaymentMethod)
 class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ('name', 'description')
@@ -75,9 +84,9 @@ class SupportSessionAdmin(admin.ModelAdmin):
 
 @admin.register(SupportMessage)
 class SupportMessageAdmin(admin.ModelAdmin):
-    list_display = ('session', 'sender', 'message_text', 'timestamp')
+    list_display = ('session', 'sender', 'message_text', 'timestamp', 'from_user')
     search_fields = ('session__user__telegram_id', 'sender')
-    list_filter = ('timestamp',)
+    list_filter = ('timestamp', 'from_user')
 
 
 @admin.register(ClientCard)
@@ -101,3 +110,38 @@ class MaterialAdmin(admin.ModelAdmin):
     list_display = ('title', 'material_type')
     list_filter = ('material_type',)
     search_fields = ('title',)
+    readonly_fields = ('document_hash',)
+
+
+@admin.register(BalanceEntry)
+class BalanceEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'amount', 'reason', 'payment', 'created')
+    search_fields = ('user__telegram_id', 'payment__transaction_id')
+    list_filter = ('reason', 'created')
+    list_select_related = ('user', 'payment')
+
+    # Журнал только пополняется: баланс меняется через BalanceEntry.post()
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('user', 'balance', 'last_entry_id', 'created')
+    search_fields = ('user__telegram_id',)
+    list_select_related = ('user',)
+    readonly_fields = ('user', 'balance', 'last_entry_id', 'created')
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'key', 'status_code', 'created')
+    search_fields = ('key',)
+    list_filter = ('scope', 'status_code')
+    readonly_fields = ('scope', 'key', 'request_hash', 'status_code', 'response', 'created')
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache as DjangoFileBasedCache
+
+
+class FileBasedCache(DjangoFileBasedCache):
+    """
+    Файловый кэш Django с атомарным add(): из нескольких процессов (воркеров
+    gunicorn/uvicorn) ключ создаёт ровно один. Файл пишется во временный и
+    ставится на место через os.link, который не заменяет существующий файл.
+    На этом держится блокировка от stampede в response_cache.
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # has_key() заодно удаляет просроченный файл, иначе os.link упрётся в него
+        if self.has_key(key, version):
+            return False
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, "wb") as f:
+                self._write_content(f, timeout, value)
+            try:
+                os.link(tmp_path, fname)
+            except FileExistsError:
+                return False
+            except OSError:
+                # Файловая система без жёстких ссылок - обычный неатомарный add
+                return super().add(key, value, timeout, version)
+            return True
+        finally:
+            os.remove(tmp_path)
@@ -0,0 +1,24 @@
+"""
+Условные GET-ответы (ETag / If-None-Match). ETag сильный и считается из того,
+от чего зависит ответ, до сериализации: справочники - из ключа кэша ответов
+(в нём поколения моделей, см. response_cache.py), профиль - из уже выбранных
+полей. Совпал - 304 без тела, сериализатор не вызывается.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def make_etag(*parts) -> str:
+    return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+
+def not_modified(request, etag: str):
+    """
+    304 с тем же ETag, если он есть в If-None-Match, иначе None.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
@@ -0,0 +1,51 @@
+"""
+Идемпотентные POST: бот повторяет оплату и подарок после таймаута с тем же
+transaction_id, и повтор не должен ни падать на уникальности Payment.transaction_id,
+ни проводить оплату второй раз.
+
+Первый запрос вставляет IdempotencyKey(scope, key) через INSERT ... ON CONFLICT
+DO NOTHING, выполняет работу и в той же транзакции сохраняет ответ. Повтор
+упирается в ту же строку: пока первый не закончил, INSERT ждёт на уникальном
+индексе, потом отдаётся сохранённый ответ. Повтор с другими данными - 409.
+Ответы не 2xx не сохраняются: транзакция откатывается вместе с ключом, и
+исправленный запрос можно отправить с тем же transaction_id.
+"""
+import hashlib
+import json
+
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+# Заголовок повторного ответа
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_hash(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def replay_or_run(scope: str, key: str, fingerprint: str, run) -> Response:
+    """
+    Сохранённый ответ на ключ или run() - один раз на (scope, key).
+    """
+    with transaction.atomic():
+        IdempotencyKey.objects.bulk_create(
+            [IdempotencyKey(scope=scope, key=key, request_hash=fingerprint)], ignore_conflicts=True,
+        )
+        record = IdempotencyKey.objects.select_for_update().get(scope=scope, key=key)
+        if record.request_hash != fingerprint:
+            return Response({'error': 'Транзакция с таким ID уже проведена с другими данными.'},
+                            status=status.HTTP_409_CONFLICT)
+        if record.status_code is not None:
+            return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+        response = run()
+        if status.is_success(response.status_code):
+            record.status_code, record.response = response.status_code, response.data
+            record.save(update_fields=['status_code', 'response'])
+        else:
+            transaction.set_rollback(True)
+        return response
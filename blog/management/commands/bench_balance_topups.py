@@ -0,0 +1,149 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import F
+from rest_framework.test import APIRequestFactory
+
+from blog.models import BalanceEntry, BalanceSnapshot, PaymentMethod, User
+from blog.views import MakePaymentView
+
+# Синтетические telegram_id заведомо больше настоящих
+BENCH_TELEGRAM_ID_BASE = 9_000_000_000_000
+AMOUNT = Decimal("1000.00")
+
+
+def legacy_top_up(user_id, amount):
+    # Как было в MakePaymentView: прочитать, прибавить, save() всех полей
+    user = User.objects.get(pk=user_id)
+    user.balance += amount
+    user.save()
+
+
+def run_parallel(threads: int, jobs: list) -> tuple:
+    """
+    Выполняет jobs (функции без аргументов) в threads потоках, стартующих одновременно.
+    Возвращает (секунды, ошибки).
+    """
+    barrier = threading.Barrier(threads + 1)
+    errors = []
+
+    def worker(chunk):
+        barrier.wait()
+        try:
+            for job in chunk:
+                try:
+                    job()
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(jobs[n::threads],)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, errors
+
+
+class Command(BaseCommand):
+    help = ("Параллельные пополнения баланса: прежний read-modify-write против журнала BalanceEntry с "
+            "F()-обновлением (потерянные пополнения и пропускная способность), пополнения через MakePaymentView "
+            "и сверка по снимкам. Работает во временной тестовой базе, рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--topups", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=50)
+        parser.add_argument("--users", type=int, default=20, help="пользователей для пополнений через view")
+        parser.add_argument("--ledger-entries", type=int, default=200_000,
+                            help="длина журнала одного пользователя для замера сверки до и после снимка")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            # Потоки должны видеть одну базу: файл вместо общей памяти, ожидание блокировки вместо ошибки
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+            connection.settings_dict["OPTIONS"]["timeout"] = 60
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def report(self, label: str, topups: int, seconds: float, errors: list, expected, balance):
+        lost = (expected - balance) / AMOUNT
+        self.stdout.write(f"{label:<22} {topups / seconds:>8.0f} top-ups/s  lost {lost:>4.0f}  errors {len(errors)}")
+
+    def run(self, options):
+        topups, threads = options["topups"], options["threads"]
+        hot = User.objects.create(telegram_id=BENCH_TELEGRAM_ID_BASE, username="hot")
+        expected = AMOUNT * topups
+        self.stdout.write(f"{topups} top-ups of one user in {threads} threads ({connection.vendor})")
+
+        seconds, errors = run_parallel(threads, [lambda: legacy_top_up(hot.pk, AMOUNT)] * topups)
+        hot.refresh_from_db()
+        self.report("read-modify-write", topups, seconds, errors, expected, hot.balance)
+
+        User.objects.filter(pk=hot.pk).update(balance=0)
+        seconds, errors = run_parallel(threads, [lambda: BalanceEntry.post(hot.pk, AMOUNT)] * topups)
+        hot.refresh_from_db()
+        self.report("ledger + F()", topups, seconds, errors, expected, hot.balance)
+        assert not errors, errors[:3]
+        assert hot.balance == expected, hot.balance
+        assert BalanceSnapshot.fold(hot.pk) == (expected, BalanceEntry.objects.latest("id").pk)
+
+        # Через эндпоинт: пополнения разных пользователей вперемешку
+        method = PaymentMethod.objects.create(name="bench")
+        users = [User.objects.create(telegram_id=BENCH_TELEGRAM_ID_BASE + 1 + n, username=f"user{n}")
+                 for n in range(options["users"])]
+        factory = APIRequestFactory()
+        view = MakePaymentView.as_view()
+        timings = []
+
+        def request(n):
+            telegram_id = users[n % len(users)].telegram_id
+            started = time.perf_counter()
+            response = view(factory.post(f"/blog/make-payment/{telegram_id}/", {
+                "payment_method": method.pk, "transaction_id": f"bench-{n}", "amount": str(AMOUNT),
+            }, format="json"), telegram_id=telegram_id)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 201, response.data
+
+        seconds, errors = run_parallel(threads, [lambda n=n: request(n) for n in range(topups)])
+        assert not errors, errors[:3]
+        self.stdout.write(f"{'MakePaymentView':<22} {topups / seconds:>8.0f} top-ups/s  "
+                          f"p50 {statistics.median(timings) * 1000:.1f}ms")
+        for user in users:
+            user.refresh_from_db()
+            count = len(range(users.index(user), topups, len(users)))
+            assert user.balance == AMOUNT * count == BalanceSnapshot.fold(user.pk)[0], user.balance
+
+        # Снимок: сверка суммирует только записи после него
+        history = options["ledger_entries"]
+        for offset in range(0, history, 10_000):
+            BalanceEntry.objects.bulk_create([BalanceEntry(user=hot, amount=1, reason="top_up")
+                                              for _ in range(min(10_000, history - offset))])
+        User.objects.filter(pk=hot.pk).update(balance=F("balance") + history)
+        started = time.perf_counter()
+        full = BalanceSnapshot.fold(hot.pk)
+        full_seconds = time.perf_counter() - started
+        BalanceSnapshot.compact(hot.pk)
+        BalanceEntry.post(hot.pk, AMOUNT)
+        started = time.perf_counter()
+        after = BalanceSnapshot.fold(hot.pk)
+        after_seconds = time.perf_counter() - started
+        assert after[0] == full[0] + AMOUNT == User.objects.get(pk=hot.pk).balance
+        BalanceSnapshot.compact(hot.pk, prune=True)
+        assert BalanceEntry.objects.filter(user=hot).count() == 0
+        assert BalanceSnapshot.fold(hot.pk)[0] == after[0]
+        self.stdout.write(f"ledger balance: {topups + history} entries {full_seconds * 1000:.2f}ms, "
+                          f"after compaction {after_seconds * 1000:.2f}ms")
+        self.stdout.write(self.style.SUCCESS("OK"))
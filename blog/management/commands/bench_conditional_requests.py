@@ -0,0 +1,118 @@
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from blog.models import Advice, Method, Payment, PaymentMethod, SubscriptionPlan, User, UserSubscription
+from blog.response_cache import response_cache
+
+BENCH_TELEGRAM_ID = 9_000_000_000_000
+ENDPOINTS = [
+    "/blog/subscription-plans/",
+    "/blog/payment-methods/",
+    "/blog/methods/",
+    "/blog/advice/",
+    f"/blog/profile/{BENCH_TELEGRAM_ID}/",
+]
+
+
+def wire_bytes(response) -> int:
+    """
+    Байт ответа на проводе: заголовки и тело.
+    """
+    return len(response.serialize_headers()) + len(response.content)
+
+
+class Command(BaseCommand):
+    help = ("Замеряет байты и CPU на запрос для справочников и профиля: полный GET против условного "
+            "с If-None-Match (304), проверяет смену ETag после правки. Работает во временной тестовой базе "
+            "и отдельной папке кэша, рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50, help="строк в каждом справочнике")
+        parser.add_argument("--requests", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+        from django.core.cache import caches
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        settings.CACHES[response_cache.alias]["LOCATION"] = tempfile.mkdtemp()
+        caches[response_cache.alias].close()
+        del caches[response_cache.alias]
+        setup_test_environment()
+        try:
+            self.run(options)
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, rows: int):
+        plans = SubscriptionPlan.objects.bulk_create([
+            SubscriptionPlan(name=f"План {n}", description="Описание плана " * 10, price="99000.00", duration_days=30)
+            for n in range(rows)
+        ])
+        PaymentMethod.objects.bulk_create([PaymentMethod(name=f"Способ {n}", description="bench") for n in range(rows)])
+        Method.objects.bulk_create([Method(name=f"Метод {n}", description="Описание метода " * 20, details="…")
+                                    for n in range(rows)])
+        Advice.objects.bulk_create([Advice(title=f"Совет {n}", content="Текст совета " * 20) for n in range(rows)])
+        user = User.objects.create(telegram_id=BENCH_TELEGRAM_ID, username="bench", balance=150)
+        UserSubscription.objects.create(user=user, plan=plans[0], start_date=timezone.now() - timedelta(days=3))
+        Payment.objects.bulk_create([
+            Payment(user=user, subscription_plan=plans[0], amount="99000.00", transaction_id=f"bench-{n}",
+                    status="completed")
+            for n in range(5)
+        ])
+        return user
+
+    @staticmethod
+    def measure(client, path: str, count: int, **headers):
+        """
+        CPU на запрос (process_time, весь стек Django) и байт последнего ответа.
+        """
+        timings = []
+        for _ in range(count):
+            started = time.process_time()
+            response = client.get(path, headers=headers)
+            timings.append(time.process_time() - started)
+        return response, timings
+
+    def run(self, options):
+        user = self.seed(options["rows"])
+        count = options["requests"]
+        client = Client()
+        self.stdout.write(f"{'endpoint':<38} {'200 bytes':>10} {'304 bytes':>10} {'200 CPU':>9} {'304 CPU':>9}")
+        for path in ENDPOINTS:
+            full, full_cpu = self.measure(client, path, count)
+            assert full.status_code == 200 and full.has_header("ETag"), (path, full.status_code)
+            etag = full["ETag"]
+            conditional, conditional_cpu = self.measure(client, path, count, if_none_match=etag)
+            assert conditional.status_code == 304 and conditional.content == b"", (path, conditional.status_code)
+            assert conditional["ETag"] == etag
+            self.stdout.write(f"{path:<38} {wire_bytes(full):>10} {wire_bytes(conditional):>10} "
+                              f"{statistics.median(full_cpu) * 1e6:>7.0f}µs "
+                              f"{statistics.median(conditional_cpu) * 1e6:>7.0f}µs")
+
+        # Правка меняет ETag: старый валидатор получает полный ответ
+        path = "/blog/subscription-plans/"
+        etag = client.get(path)["ETag"]
+        plan = SubscriptionPlan.objects.first()
+        plan.name = "Переименованный план"
+        plan.save()
+        response = client.get(path, headers={"if_none_match": etag})
+        assert response.status_code == 200 and "Переименованный план".encode() in response.content
+        assert response["ETag"] != etag
+
+        path = f"/blog/profile/{BENCH_TELEGRAM_ID}/"
+        etag = client.get(path)["ETag"]
+        User.objects.filter(pk=user.pk).update(balance=200)
+        response = client.get(path, headers={"if_none_match": etag})
+        assert response.status_code == 200 and float(response.json()["balance"]) == 200, response.status_code
+        self.stdout.write("validators: a saved plan and a balance change produce a new ETag")
+        self.stdout.write(self.style.SUCCESS("OK"))
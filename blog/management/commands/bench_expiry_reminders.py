@@ -0,0 +1,142 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from blog.models import ExpiryReminder, SubscriptionPlan, User, UserSubscription
+from blog.views import ExpiringSubscriptionsView, ExpiryRemindersView
+
+# Синтетические telegram_id заведомо больше настоящих
+BENCH_TELEGRAM_ID_BASE = 9_000_000_000_000
+
+
+class Command(BaseCommand):
+    help = ("Замеряет выборку подписок для напоминаний об окончании (/subscriptions/expiring/) на синтетической "
+            "таблице. Работает во временной тестовой базе, рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscriptions", type=int, default=1_000_000)
+        parser.add_argument("--page-size", type=int, default=500)
+        parser.add_argument("--skip-naive", action="store_true",
+                            help="не замерять проход по всем строкам с is_expiring_soon() в Python")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, total: int, now):
+        """
+        total подписок: окончания равномерно от -180 до +365 дней, каждая двадцатая -
+        продление подписки другого пользователя (про старую напоминать не нужно).
+        """
+        rnd = random.Random(1)
+        plan = SubscriptionPlan.objects.create(name="Месяц", description="bench", price="99000.00", duration_days=30)
+        renewals = total // 20
+        users_count = total - renewals
+        chunk = 10_000
+        started = time.perf_counter()
+        for offset in range(0, users_count, chunk):
+            User.objects.bulk_create([
+                User(telegram_id=BENCH_TELEGRAM_ID_BASE + n, username=f"user{n}")
+                for n in range(offset, min(offset + chunk, users_count))
+            ])
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+
+        end_dates = {}
+        batch = []
+        for index in range(total):
+            if index < users_count:
+                user_id = user_ids[index]
+                end_date = now + timedelta(seconds=rnd.uniform(-180, 365) * 86400)
+                end_dates[user_id] = end_date
+            else:
+                user_id = user_ids[rnd.randrange(users_count)]
+                end_date = end_dates[user_id] + timedelta(days=30)
+            batch.append(UserSubscription(user_id=user_id, plan=plan, start_date=end_date - timedelta(days=30),
+                                          end_date=end_date))
+            if len(batch) == chunk:
+                UserSubscription.objects.bulk_create(batch)
+                batch = []
+        UserSubscription.objects.bulk_create(batch)
+        self.stdout.write(f"seeded {users_count} users and {total} subscriptions in {time.perf_counter() - started:.1f}s")
+
+    def naive(self, now):
+        """
+        Как без индекса и пагинации: все подписки в Python и is_expiring_soon() на каждой.
+        """
+        started = time.perf_counter()
+        found = 0
+        for subscription in UserSubscription.objects.all().iterator(chunk_size=5000):
+            if subscription.end_date >= now and subscription.is_expiring_soon():
+                found += 1
+        return found, time.perf_counter() - started
+
+    def run_job(self, factory, page_size: int):
+        """
+        Проход рассылки, как в боте: страница за страницей, после каждой - отметка отправленных.
+        """
+        expiring = ExpiringSubscriptionsView.as_view()
+        record = ExpiryRemindersView.as_view()
+        timings = []
+        found = 0
+        cursor = None
+        started = time.perf_counter()
+        while True:
+            params = {"limit": page_size}
+            if cursor:
+                params["after"] = cursor
+            page_started = time.perf_counter()
+            page = expiring(factory.get("/blog/subscriptions/expiring/", params))
+            timings.append(time.perf_counter() - page_started)
+            assert page.status_code == 200, page.data
+            subscriptions = page.data["subscriptions"]
+            found += len(subscriptions)
+            if subscriptions:
+                reminders = [{"subscription_id": item["id"], "delivered": True} for item in subscriptions]
+                recorded = record(factory.post("/blog/subscriptions/expiry-reminders/", {"reminders": reminders},
+                                               format="json"))
+                assert recorded.status_code == 201, recorded.data
+            cursor = page.data["next"]
+            if not cursor:
+                break
+        return found, timings, time.perf_counter() - started
+
+    def run(self, options):
+        now = timezone.now()
+        self.seed(options["subscriptions"], now)
+
+        window_end = now + timedelta(days=UserSubscription.EXPIRING_SOON_DAYS)
+        in_window = UserSubscription.objects.filter(end_date__gte=now, end_date__lt=window_end).count()
+        self.stdout.write(f"subscriptions ending in the next {UserSubscription.EXPIRING_SOON_DAYS} days: {in_window}")
+
+        self.stdout.write("page query plan:")
+        for line in ExpiringSubscriptionsView.expiring_queryset(now).explain().splitlines():
+            self.stdout.write(f"    {line}")
+
+        if not options["skip_naive"]:
+            found, elapsed = self.naive(now)
+            self.stdout.write(f"naive: every row through is_expiring_soon() - {found} found in {elapsed:.2f}s")
+
+        factory = APIRequestFactory()
+        found, timings, elapsed = self.run_job(factory, options["page_size"])
+        self.stdout.write(
+            f"keyset pages of {options['page_size']}: {found} reminders in {len(timings)} pages, {elapsed:.2f}s "
+            f"(page p50={statistics.median(timings) * 1000:.1f}ms, first={timings[0] * 1000:.1f}ms, "
+            f"last={timings[-1] * 1000:.1f}ms)"
+        )
+        assert ExpiryReminder.objects.count() == found
+        assert found < in_window, "renewed subscriptions must not get a reminder"
+
+        # Повторный запуск ничего не находит: всё уже отмечено
+        again, timings, elapsed = self.run_job(factory, options["page_size"])
+        self.stdout.write(f"rerun: {again} reminders, {len(timings)} page in {elapsed * 1000:.1f}ms")
+        assert again == 0, "a rerun must not remind anyone twice"
+        self.stdout.write(self.style.SUCCESS("OK"))
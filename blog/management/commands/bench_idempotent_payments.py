@@ -0,0 +1,93 @@
+import os
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from rest_framework.test import APIRequestFactory
+
+from blog.management.commands.bench_balance_topups import run_parallel
+from blog.models import BalanceEntry, IdempotencyKey, Payment, PaymentMethod, User
+from blog.views import MakePaymentView
+
+# Синтетические telegram_id заведомо больше настоящих
+BENCH_TELEGRAM_ID_BASE = 9_000_000_000_000
+AMOUNT = Decimal("1000.00")
+
+
+class Command(BaseCommand):
+    help = ("Повторы POST /make-payment/ с тем же transaction_id: параллельные дубли проводят оплату один раз и "
+            "получают один и тот же ответ; замеряет первый запрос против повтора. Работает во временной "
+            "тестовой базе, рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=200)
+        parser.add_argument("--retries", type=int, default=3, help="дублей каждого запроса")
+        parser.add_argument("--threads", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            # Потоки должны видеть одну базу: файл вместо общей памяти, ожидание блокировки вместо ошибки
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+            connection.settings_dict["OPTIONS"]["timeout"] = 60
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        payments, copies, threads = options["payments"], 1 + options["retries"], options["threads"]
+        method = PaymentMethod.objects.create(name="bench")
+        users = [User.objects.create(telegram_id=BENCH_TELEGRAM_ID_BASE + n, username=f"user{n}") for n in range(20)]
+        factory = APIRequestFactory()
+        view = MakePaymentView.as_view()
+        responses = {}
+        timings = {"first": [], "replay": []}
+
+        def submit(n):
+            telegram_id = users[n % len(users)].telegram_id
+            started = time.perf_counter()
+            response = view(factory.post(f"/blog/make-payment/{telegram_id}/", {
+                "payment_method": method.pk, "transaction_id": f"bench-{n}", "amount": str(AMOUNT),
+            }, format="json"), telegram_id=telegram_id)
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 201, (response.status_code, response.data)
+            timings["replay" if response.has_header("Idempotent-Replayed") else "first"].append(elapsed)
+            responses.setdefault(n, []).append(dict(response.data))
+
+        # Каждый запрос и его дубли уходят одновременно из разных потоков
+        jobs = [lambda n=n: submit(n) for n in range(payments) for _ in range(copies)]
+        seconds, errors = run_parallel(threads, jobs)
+        assert not errors, errors[:3]
+        self.stdout.write(f"{len(jobs)} requests ({payments} payments x {copies}) in {threads} threads "
+                          f"({connection.vendor}): {len(jobs) / seconds:.0f} requests/s")
+
+        assert Payment.objects.count() == payments == IdempotencyKey.objects.count()
+        assert BalanceEntry.objects.count() == payments
+        assert sum(User.objects.values_list("balance", flat=True)) == AMOUNT * payments
+        assert all(len(copies_seen) == copies and all(data == copies_seen[0] for data in copies_seen)
+                   for copies_seen in responses.values()), "a duplicate got a different response"
+        assert len(timings["first"]) == payments
+        self.stdout.write(f"each payment made once, duplicates replayed the same response; "
+                          f"first p50={statistics.median(timings['first']) * 1000:.1f}ms, "
+                          f"replay p50={statistics.median(timings['replay']) * 1000:.1f}ms")
+
+        # Без параллельной нагрузки: повтор против первого запроса
+        timings = {"first": [], "replay": []}
+        for n in range(payments, payments * 2):
+            submit(n)
+            submit(n)
+        self.stdout.write(f"sequential: first p50={statistics.median(timings['first']) * 1000:.2f}ms, "
+                          f"replay p50={statistics.median(timings['replay']) * 1000:.2f}ms")
+
+        telegram_id = users[0].telegram_id
+        response = view(factory.post(f"/blog/make-payment/{telegram_id}/", {
+            "payment_method": method.pk, "transaction_id": "bench-0", "amount": "1.00",
+        }, format="json"), telegram_id=telegram_id)
+        assert response.status_code == 409, response.status_code
+        self.stdout.write("same transaction_id with another amount -> 409")
+        self.stdout.write(self.style.SUCCESS("OK"))
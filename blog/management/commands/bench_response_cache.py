@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from blog.models import Advice, Method, PaymentMethod, SubscriptionPlan
+from blog.response_cache import response_cache
+from blog.views import AdviceView, MethodsListView, PaymentMethodListView, SubscriptionPlanListView
+
+ENDPOINTS = [
+    ("/blog/subscription-plans/", SubscriptionPlanListView),
+    ("/blog/payment-methods/", PaymentMethodListView),
+    ("/blog/methods/", MethodsListView),
+    ("/blog/advice/", AdviceView),
+]
+
+
+def uncached(view_class):
+    """
+    Тот же view без CachedResponseMixin: запрос к базе и сериализация на каждый вызов.
+    """
+    class Uncached(view_class):
+        def dispatch(self, request, *args, **kwargs):
+            return APIView.dispatch(self, request, *args, **kwargs)
+
+    return Uncached.as_view()
+
+
+def time_requests(view, path: str, count: int) -> list:
+    factory = APIRequestFactory()
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = view(factory.get(path))
+        if hasattr(response, "render"):
+            response.render()
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return timings
+
+
+class FakeView:
+    pass
+
+
+def stampede_worker(barrier, renders_path: str, results):
+    """
+    Процесс-"воркер": одновременно с остальными просит ещё не закэшированный ответ.
+    """
+    from django.db import connections
+    connections.close_all()
+
+    def render():
+        with open(renders_path, "a") as renders:
+            renders.write("x")
+        time.sleep(0.2)
+        return HttpResponse(b"rendered", content_type="text/plain")
+
+    request = APIRequestFactory().get("/blog/stampede/")
+    barrier.wait()
+    key = response_cache.key(FakeView(), request, {}, (SubscriptionPlan,))
+    response = response_cache.get_or_render(key, render)
+    results.put(response.content)
+
+
+class Command(BaseCommand):
+    help = ("Замеряет справочные эндпоинты с кэшем готовых ответов и без него, проверяет сброс по сигналам "
+            "и защиту от stampede (потоки и процессы). Работает во временной тестовой базе и отдельной "
+            "папке кэша, рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50, help="строк в каждом справочнике")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=8, help="одновременных потоков и процессов")
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+        from django.core.cache import caches
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        settings.CACHES[response_cache.alias]["LOCATION"] = tempfile.mkdtemp()
+        caches[response_cache.alias].close()
+        del caches[response_cache.alias]
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, rows: int):
+        SubscriptionPlan.objects.bulk_create([
+            SubscriptionPlan(name=f"План {n}", description="Описание плана " * 10, price="99000.00", duration_days=30)
+            for n in range(rows)
+        ])
+        PaymentMethod.objects.bulk_create([PaymentMethod(name=f"Способ {n}", description="bench") for n in range(rows)])
+        Method.objects.bulk_create([Method(name=f"Метод {n}", description="Описание метода " * 20, details="…")
+                                    for n in range(rows)])
+        Advice.objects.bulk_create([Advice(title=f"Совет {n}", content="Текст совета " * 20) for n in range(rows)])
+
+    def run(self, options):
+        self.seed(options["rows"])
+        count = options["requests"]
+        self.stdout.write(f"{'endpoint':<28} {'uncached p50':>13} {'cached p50':>11} {'speedup':>8}")
+        for path, view_class in ENDPOINTS:
+            before = time_requests(uncached(view_class), path, count)
+            view = view_class.as_view()
+            time_requests(view, path, 1)
+            after = time_requests(view, path, count)
+            self.stdout.write(f"{path:<28} {statistics.median(before) * 1e6:>11.0f}µs "
+                              f"{statistics.median(after) * 1e6:>9.0f}µs "
+                              f"{statistics.median(before) / statistics.median(after):>7.1f}x")
+            assert statistics.median(after) < statistics.median(before)
+
+        # Правка в админке сбрасывает ответ
+        view = SubscriptionPlanListView.as_view()
+        factory = APIRequestFactory()
+        plan = SubscriptionPlan.objects.first()
+        plan.name = "Переименованный план"
+        plan.save()
+        response = view(factory.get("/blog/subscription-plans/"))
+        assert "Переименованный план".encode() in response.content, "a saved plan is still served from the cache"
+        SubscriptionPlan.objects.filter(pk=plan.pk).delete()
+        response = view(factory.get("/blog/subscription-plans/"))
+        assert "Переименованный план".encode() not in response.content, "a deleted plan is still served"
+        self.stdout.write("invalidation: save and delete are visible on the next request")
+
+        # Потоки одного процесса: ответ строит один
+        workers = options["workers"]
+        Advice.objects.create(title="Новый совет", content="...")
+        misses = response_cache.misses
+        barrier = threading.Barrier(workers)
+
+        def thread_request():
+            barrier.wait()
+            AdviceView.as_view()(APIRequestFactory().get("/blog/advice/"))
+
+        threads = [threading.Thread(target=thread_request) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        thread_renders = response_cache.misses - misses
+
+        # Процессы (как воркеры gunicorn): общий файловый кэш, ответ строит один
+        renders_path = os.path.join(tempfile.mkdtemp(), "renders")
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [context.Process(target=stampede_worker, args=(barrier, renders_path, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        contents = [results.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join()
+        with open(renders_path) as renders:
+            process_renders = len(renders.read())
+        self.stdout.write(f"stampede: {workers} threads -> {thread_renders} render, "
+                          f"{workers} processes -> {process_renders} render")
+        assert thread_renders == 1 and process_renders == 1 and set(contents) == {b"rendered"}
+        self.stdout.write(self.style.SUCCESS("OK"))
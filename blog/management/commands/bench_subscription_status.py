@@ -0,0 +1,134 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from blog.models import SubscriptionPlan, User, UserSubscription
+from blog.views import SubscriptionStatusView
+
+# Синтетические telegram_id заведомо больше настоящих
+BENCH_TELEGRAM_ID_BASE = 9_000_000_000_000
+
+
+def p50_ms(timings: list) -> str:
+    return f"{statistics.median(timings) * 1000:.3f}ms"
+
+
+class Command(BaseCommand):
+    help = ("Замеряет проверку статуса подписки: последняя подписка запросом по UserSubscription (с индексом "
+            "(user, end_date) и без него) против User.current_subscription. Работает во временной тестовой базе, "
+            "рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200_000)
+        parser.add_argument("--subscriptions-per-user", type=int, default=3)
+        parser.add_argument("--lookups", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, users: int, per_user: int, now):
+        """
+        Подписки идут через bulk_create (мимо save()), указатель заполняется одним
+        UPDATE, как в миграции 0007.
+        """
+        rnd = random.Random(1)
+        plan = SubscriptionPlan.objects.create(name="Месяц", description="bench", price="99000.00", duration_days=30)
+        chunk = 10_000
+        started = time.perf_counter()
+        for offset in range(0, users, chunk):
+            User.objects.bulk_create([
+                User(telegram_id=BENCH_TELEGRAM_ID_BASE + n, username=f"user{n}")
+                for n in range(offset, min(offset + chunk, users))
+            ])
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+        batch = []
+        # Подписки разных пользователей вперемешку, как они приходят в жизни
+        for _ in range(per_user):
+            for user_id in user_ids:
+                end_date = now + timedelta(days=rnd.uniform(-400, 30))
+                batch.append(UserSubscription(user_id=user_id, plan=plan, start_date=end_date - timedelta(days=30),
+                                              end_date=end_date))
+                if len(batch) == chunk:
+                    UserSubscription.objects.bulk_create(batch)
+                    batch = []
+        UserSubscription.objects.bulk_create(batch)
+        latest = UserSubscription.objects.filter(user_id=OuterRef("pk")).order_by("-end_date", "-id").values("pk")[:1]
+        User.objects.update(current_subscription=Subquery(latest))
+        self.stdout.write(f"seeded {users} users and {users * per_user} subscriptions "
+                          f"in {time.perf_counter() - started:.1f}s")
+
+    def time_lookups(self, lookup, telegram_ids: list) -> list:
+        timings = []
+        for telegram_id in telegram_ids:
+            started = time.perf_counter()
+            lookup(telegram_id)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    @staticmethod
+    def latest_by_query(telegram_id):
+        # Как было в SubscriptionStatusView: пользователь, затем его последняя подписка
+        user = User.objects.get(telegram_id=telegram_id)
+        subscription = UserSubscription.objects.select_related("plan").filter(user=user).order_by("-end_date").first()
+        return subscription if subscription and subscription.end_date > timezone.now() else None
+
+    @staticmethod
+    def latest_by_pointer(telegram_id):
+        return User.objects.select_related("current_subscription__plan").get(telegram_id=telegram_id) \
+            .active_subscription()
+
+    def run(self, options):
+        now = timezone.now()
+        self.seed(options["users"], options["subscriptions_per_user"], now)
+        rnd = random.Random(2)
+        telegram_ids = [BENCH_TELEGRAM_ID_BASE + rnd.randrange(options["users"]) for _ in range(options["lookups"])]
+
+        for telegram_id in telegram_ids[:200]:
+            by_query, by_pointer = self.latest_by_query(telegram_id), self.latest_by_pointer(telegram_id)
+            assert (by_query and by_query.pk) == (by_pointer and by_pointer.pk), telegram_id
+
+        index = next(index for index in UserSubscription._meta.indexes if index.name == "usersub_user_end_date_idx")
+        with connection.schema_editor() as editor:
+            editor.remove_index(UserSubscription, index)
+        without_index = self.time_lookups(self.latest_by_query, telegram_ids[:200])
+        with connection.schema_editor() as editor:
+            editor.add_index(UserSubscription, index)
+        with_index = self.time_lookups(self.latest_by_query, telegram_ids)
+        pointer = self.time_lookups(self.latest_by_pointer, telegram_ids)
+        self.stdout.write(f"latest subscription by query: without (user, end_date) index p50={p50_ms(without_index)}, "
+                          f"with index p50={p50_ms(with_index)}")
+        self.stdout.write(f"User.current_subscription: p50={p50_ms(pointer)}")
+
+        factory = APIRequestFactory()
+        view = SubscriptionStatusView.as_view()
+        # При DEBUG журнал запросов ограничен и уже полон - CaptureQueriesContext считает по его длине
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(factory.get(f"/blog/subscription-status/{telegram_ids[0]}/"), telegram_id=telegram_ids[0])
+        assert response.status_code == 200, response.data
+        assert len(queries) == 1, [query["sql"] for query in queries]
+        timings = []
+        for telegram_id in telegram_ids:
+            started = time.perf_counter()
+            view(factory.get(f"/blog/subscription-status/{telegram_id}/"), telegram_id=telegram_id)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f"SubscriptionStatusView: 1 query, p50={p50_ms(timings)}")
+
+        # Новая подписка переставляет указатель в той же транзакции
+        user = User.objects.get(telegram_id=telegram_ids[0])
+        plan = SubscriptionPlan.objects.get()
+        renewal = UserSubscription.objects.create(user=user, plan=plan, start_date=now + timedelta(days=60))
+        assert self.latest_by_pointer(telegram_ids[0]).pk == renewal.pk
+        self.stdout.write(self.style.SUCCESS("OK"))
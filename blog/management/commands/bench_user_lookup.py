@@ -0,0 +1,131 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+from rest_framework.test import APIRequestFactory
+
+from blog.models import User
+from blog.views import BootstrapView, ProfileView, UserRegistrationView
+
+# Синтетические telegram_id заведомо больше настоящих
+BENCH_TELEGRAM_ID_BASE = 9_000_000_000_000
+# Копия таблицы в старом виде: telegram_id - varchar, без индексов
+BEFORE_TABLE = "bench_user_before"
+
+
+def percentiles(timings: list) -> str:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, round(0.99 * len(ordered)) - 1)]
+    return f"p50={statistics.median(ordered) * 1000:.3f}ms p99={p99 * 1000:.3f}ms"
+
+
+class Command(BaseCommand):
+    help = ("Замеряет поиск пользователя по telegram_id и username на синтетической таблице: уникальный "
+            "bigint-индекс против прежнего varchar без индекса. Работает во временной тестовой базе, "
+            "рабочие данные не трогает.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--lookups", type=int, default=5000)
+        parser.add_argument("--before-lookups", type=int, default=50,
+                            help="поисков по таблице без индекса (каждый - полный проход)")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, total: int):
+        chunk = 10_000
+        started = time.perf_counter()
+        for offset in range(0, total, chunk):
+            User.objects.bulk_create([
+                User(telegram_id=BENCH_TELEGRAM_ID_BASE + n, username=f"user{n}")
+                for n in range(offset, min(offset + chunk, total))
+            ])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {BEFORE_TABLE} AS "
+                f"SELECT id, CAST(telegram_id AS VARCHAR(200)) AS telegram_id, username FROM blog_user"
+            )
+        self.stdout.write(f"seeded {total} users in {time.perf_counter() - started:.1f}s")
+
+    def time_queries(self, lookup, keys: list) -> list:
+        timings = []
+        for key in keys:
+            started = time.perf_counter()
+            found = lookup(key)
+            timings.append(time.perf_counter() - started)
+            assert found is not None, key
+        return timings
+
+    def time_raw(self, column: str, keys: list) -> list:
+        def lookup(key):
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT id FROM {BEFORE_TABLE} WHERE {column} = %s", [key])
+                return cursor.fetchone()
+
+        return self.time_queries(lookup, keys)
+
+    def run(self, options):
+        total = options["users"]
+        self.seed(total)
+        rnd = random.Random(1)
+        numbers = [rnd.randrange(total) for _ in range(options["lookups"])]
+        before_numbers = numbers[:options["before_lookups"]]
+
+        self.stdout.write("query plans:")
+        for label, queryset in (("telegram_id", User.objects.filter(telegram_id=BENCH_TELEGRAM_ID_BASE + 1)),
+                                ("username", User.objects.filter(username="user1").order_by("-id"))):
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"    {label}: {line}")
+
+        before = self.time_raw("telegram_id", [str(BENCH_TELEGRAM_ID_BASE + n) for n in before_numbers])
+        after = self.time_queries(lambda key: User.objects.filter(telegram_id=key).first(),
+                                  [BENCH_TELEGRAM_ID_BASE + n for n in numbers])
+        self.stdout.write(f"by telegram_id: varchar without index {percentiles(before)} ({len(before)} lookups), "
+                          f"unique bigint {percentiles(after)} ({len(after)} lookups), "
+                          f"{statistics.median(before) / statistics.median(after):.0f}x faster")
+        assert statistics.median(after) < statistics.median(before)
+
+        before = self.time_raw("username", [f"user{n}" for n in before_numbers])
+        after = self.time_queries(lambda key: User.objects.filter(username=key).order_by("-id").first(),
+                                  [f"user{n}" for n in numbers])
+        self.stdout.write(f"by username: without index {percentiles(before)}, indexed {percentiles(after)}")
+
+        factory = APIRequestFactory()
+        profile = ProfileView.as_view()
+        bootstrap = BootstrapView.as_view()
+        timings = {"profile": [], "bootstrap": []}
+        for n in numbers[:1000]:
+            telegram_id = BENCH_TELEGRAM_ID_BASE + n
+            started = time.perf_counter()
+            response = profile(factory.get(f"/blog/profile/{telegram_id}/"), telegram_id=telegram_id)
+            timings["profile"].append(time.perf_counter() - started)
+            assert response.status_code == 200, response.data
+            started = time.perf_counter()
+            response = bootstrap(factory.post("/blog/bootstrap/", {"telegram_id": telegram_id,
+                                                                    "username": f"user{n}"}, format="json"))
+            timings["bootstrap"].append(time.perf_counter() - started)
+            assert response.status_code == 200, response.data
+        self.stdout.write("views: " + ", ".join(f"{name} {percentiles(values)}" for name, values in timings.items()))
+
+        # Повторная регистрация не создаёт второго пользователя, а прямой дубль отклоняет база
+        register = UserRegistrationView.as_view()
+        telegram_id = BENCH_TELEGRAM_ID_BASE + total
+        codes = [register(factory.post("/blog/register/", {"telegram_id": telegram_id, "username": "new"},
+                                       format="json")).status_code for _ in range(2)]
+        assert codes == [201, 200], codes
+        try:
+            with transaction.atomic():
+                User.objects.create(telegram_id=telegram_id, username="duplicate")
+        except IntegrityError:
+            pass
+        else:
+            raise AssertionError("a duplicate telegram_id was accepted")
+        assert User.objects.filter(telegram_id=telegram_id).count() == 1
+        self.stdout.write(self.style.SUCCESS("OK"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import BalanceEntry, BalanceSnapshot
+
+
+def users_to_compact(min_entries: int):
+    """
+    Пользователи, у которых после последнего снимка набралось не меньше min_entries записей.
+    """
+    covered = BalanceSnapshot.objects.filter(user_id=OuterRef('user_id')) \
+        .order_by('-last_entry_id').values('last_entry_id')[:1]
+    return BalanceEntry.objects.annotate(covered=Coalesce(Subquery(covered), 0)) \
+        .filter(id__gt=F('covered')).order_by().values('user_id') \
+        .annotate(entries=Count('id')).filter(entries__gte=min_entries).values_list('user_id', flat=True)
+
+
+class Command(BaseCommand):
+    help = ("Сворачивает журнал баланса (BalanceEntry) в снимки, чтобы сверка баланса не суммировала весь "
+            "журнал. Запускать периодически (cron). С --prune свёрнутые записи удаляются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-entries", type=int, default=100,
+                            help="сворачивать, если после снимка не меньше стольких записей")
+        parser.add_argument("--prune", action="store_true", help="удалить свёрнутые записи и старые снимки")
+
+    def handle(self, *args, **options):
+        # Расхождения User.balance с журналом compact() пишет в лог blog.models
+        user_ids = list(users_to_compact(options["min_entries"]))
+        for user_id in user_ids:
+            BalanceSnapshot.compact(user_id, prune=options["prune"])
+        self.stdout.write(f"compacted the ledger of {len(user_ids)} users")
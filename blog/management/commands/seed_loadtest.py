@@ -0,0 +1,34 @@
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+
+from blog.models import Material, PaymentMethod, SubscriptionPlan
+
+
+class Command(BaseCommand):
+    help = "Создаёт планы подписки, способы оплаты и материалы для нагрузочного прогона бота (bot/bench_load.py)."
+
+    def handle(self, *args, **options):
+        plans = [
+            ("Месяц", 30, "99000.00"),
+            ("Три месяца", 90, "249000.00"),
+            ("Год", 365, "799000.00"),
+        ]
+        for name, duration_days, price in plans:
+            SubscriptionPlan.objects.get_or_create(
+                name=name,
+                defaults={"description": f"Подписка: {name}", "price": price, "duration_days": duration_days},
+            )
+
+        for name in ("Payme", "Click"):
+            PaymentMethod.objects.get_or_create(name=name)
+
+        for material_type, title in Material.MATERIAL_TYPES:
+            if not Material.objects.filter(material_type=material_type).exists():
+                material = Material(title=title, material_type=material_type)
+                material.document.save(f"{material_type}.pdf", ContentFile(b"%PDF-1.4\n% load test\n"), save=False)
+                material.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Plans: {SubscriptionPlan.objects.count()}, payment methods: {PaymentMethod.objects.count()}, "
+            f"materials: {Material.objects.count()}"
+        ))
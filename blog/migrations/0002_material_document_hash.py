@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:07
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_document_hashes(apps, schema_editor):
+    # Hash для уже загруженных файлов, иначе бот не сможет кэшировать их file_id
+    Material = apps.get_model('blog', 'Material')
+    for material in Material.objects.exclude(document='').iterator():
+        digest = hashlib.sha256()
+        try:
+            with material.document.open('rb') as document:
+                for chunk in document.chunks():
+                    digest.update(chunk)
+        except OSError:
+            continue
+        Material.objects.filter(pk=material.pk).update(document_hash=digest.hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='document_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(fill_document_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_material_document_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportmessage',
+            name='from_user',
+            field=models.BooleanField(default=False),
+        ),
+    ]
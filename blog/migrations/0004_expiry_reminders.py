@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-18 06:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_supportmessage_from_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('delivered', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['end_date', 'id'], name='usersub_end_date_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='expiryreminder',
+            name='subscription',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_reminder', to='blog.usersubscription'),
+        ),
+    ]
@@ -0,0 +1,115 @@
+import logging
+
+from django.db import migrations
+from django.db.models import Count, F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк User читать за раз при проверке telegram_id
+CHUNK_SIZE = 10_000
+
+
+def normalize_telegram_ids(User):
+    """
+    Приводит telegram_id к виду str(int(...)) (" 123", "0123" -> "123"), чтобы
+    дубли с разной записью нашлись, а перевод в bigint прошёл. Нечисловые id
+    перевести нельзя - миграция останавливается и перечисляет их.
+    """
+    invalid, rewrites = [], []
+    rows = User.objects.order_by('id').values_list('id', 'telegram_id').iterator(chunk_size=CHUNK_SIZE)
+    for pk, telegram_id in rows:
+        try:
+            normalized = str(int(str(telegram_id).strip()))
+        except ValueError:
+            invalid.append((pk, telegram_id))
+            continue
+        if normalized != telegram_id:
+            rewrites.append((pk, normalized))
+    if invalid:
+        listed = ', '.join(f'id={pk} telegram_id={telegram_id!r}' for pk, telegram_id in invalid[:20])
+        raise RuntimeError(
+            f'{len(invalid)} users have a non-numeric telegram_id and cannot be converted to bigint: {listed}. '
+            f'Fix or delete them and run the migration again.'
+        )
+    for pk, normalized in rewrites:
+        User.objects.filter(pk=pk).update(telegram_id=normalized)
+    return len(rewrites)
+
+
+def collapse_single_rows(apps, user):
+    """
+    Согласие, карта клиента и активная сессия поддержки у пользователя одни: вьюхи
+    читают их через get()/update_or_create(). После переноса с дублей остаётся самая
+    новая запись; старые активные сессии закрываются, чтобы не потерять их сообщения.
+    """
+    collapsed = 0
+    for name, newest_first in (
+        ('Consent', (F('consent_date').desc(nulls_last=True), '-id')),
+        ('ClientCard', ('-created', '-id')),
+    ):
+        model = apps.get_model('blog', name)
+        stale = list(model._base_manager.filter(user=user).order_by(*newest_first).values_list('pk', flat=True)[1:])
+        collapsed += len(stale)
+        model._base_manager.filter(pk__in=stale).delete()
+
+    SupportSession = apps.get_model('blog', 'SupportSession')
+    stale = list(
+        SupportSession._base_manager.filter(user=user, is_active=True).order_by('-started_at', '-id')
+        .values_list('pk', flat=True)[1:]
+    )
+    collapsed += len(stale)
+    SupportSession._base_manager.filter(pk__in=stale).update(is_active=False, ended_at=timezone.now())
+    return collapsed
+
+
+def merge_duplicate_users(apps, schema_editor):
+    """
+    Оставляет по одному User на telegram_id - самого раннего. Связанные записи
+    (подписки, платежи, сессии поддержки и т.д.) переносятся на него, балансы
+    складываются, username берётся последний непустой, а записи "одна на
+    пользователя" сводятся к одной (collapse_single_rows).
+    """
+    User = apps.get_model('blog', 'User')
+    normalized = normalize_telegram_ids(User)
+
+    relations = [
+        relation for relation in User._meta.related_objects
+        if relation.one_to_many or relation.one_to_one
+    ]
+    duplicated = (
+        User.objects.values('telegram_id').annotate(count=Count('id')).filter(count__gt=1)
+        .values_list('telegram_id', flat=True)
+    )
+    merged = collapsed = 0
+    for telegram_id in list(duplicated):
+        keeper, *duplicates = User.objects.filter(telegram_id=telegram_id).order_by('id')
+        for relation in relations:
+            relation.related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': duplicates}
+            ).update(**{relation.field.name: keeper})
+        for duplicate in duplicates:
+            keeper.balance += duplicate.balance
+            if duplicate.username:
+                keeper.username = duplicate.username
+        keeper.save(update_fields=['balance', 'username'])
+        collapsed += collapse_single_rows(apps, keeper)
+        User.objects.filter(pk__in=[duplicate.pk for duplicate in duplicates]).delete()
+        merged += len(duplicates)
+
+    if normalized or merged:
+        logger.warning(
+            'Normalized %s telegram_id values, merged %s duplicate users, collapsed %s consents, '
+            'client cards and active support sessions', normalized, merged, collapsed
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_expiry_reminders'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_dedupe_user_telegram_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='telegram_id',
+            field=models.BigIntegerField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='username',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_current_subscription(apps, schema_editor):
+    # Одним UPDATE по индексу (user, end_date): последняя по end_date подписка каждого пользователя
+    User = apps.get_model('blog', 'User')
+    UserSubscription = apps.get_model('blog', 'UserSubscription')
+    latest = UserSubscription.objects.filter(user_id=OuterRef('pk')).order_by('-end_date', '-id').values('pk')[:1]
+    User.objects.update(current_subscription=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_user_telegram_id_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='current_subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.usersubscription'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', 'end_date'], name='usersub_user_end_date_idx'),
+        ),
+        migrations.RunPython(fill_current_subscription, migrations.RunPython.noop),
+    ]
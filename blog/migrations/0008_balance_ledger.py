@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-18 05:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    # Журнал начинается со снимка текущих балансов: до него записей нет
+    User = apps.get_model('blog', 'User')
+    BalanceSnapshot = apps.get_model('blog', 'BalanceSnapshot')
+    users = User.objects.exclude(balance=0).values_list('pk', 'balance').iterator(chunk_size=2000)
+    batch = []
+    for user_id, balance in users:
+        batch.append(BalanceSnapshot(user_id=user_id, balance=balance, last_entry_id=0))
+        if len(batch) == 2000:
+            BalanceSnapshot.objects.bulk_create(batch)
+            batch = []
+    BalanceSnapshot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_user_current_subscription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reason', models.CharField(choices=[('top_up', 'Top-up'), ('purchase', 'Purchase'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balance_entries', to='blog.payment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_entries', to='blog.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='balance_entry_user_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='blog.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_entry_id'], name='balance_snapshot_latest_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,43 @@
+import hashlib
+import logging
 from datetime import timedelta
+from decimal import Decimal
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F, Max, Subquery, Sum
 from django.utils import timezone
 
 
+logger = logging.getLogger(__name__)
+
 # Create your models here.
 
 class User(models.Model):
-    telegram_id = models.CharField(max_length=200)
-    username = models.CharField(max_length=200)
+    # Почти каждый запрос бота ищет пользователя по telegram_id; уникальность
+    # не даёт параллельным /start создать его дважды
+    telegram_id = models.BigIntegerField(unique=True)
+    # По username ищется получатель подарка (GiftSubscriptionView)
+    username = models.CharField(max_length=200, db_index=True)
+    # Сумма журнала BalanceEntry; менять только через BalanceEntry.post()
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created = models.DateTimeField(auto_now_add=True)
+    # Подписка с самым поздним end_date (может быть уже истёкшей): статус
+    # проверяется по одной строке. Ведётся в UserSubscription.refresh_current()
+    current_subscription = models.ForeignKey('UserSubscription', on_delete=models.SET_NULL, null=True, blank=True,
+                                             related_name='+')
 
     def __str__(self):
-        return self.username if self.username else self.telegram_id
+        return self.username if self.username else str(self.telegram_id)
+
+    def active_subscription(self):
+        """
+        Текущая подписка, если она ещё не закончилась, иначе None.
+        """
+        subscription = self.current_subscription
+        if subscription is not None and subscription.end_date > timezone.now():
+            return subscription
+        return None
 
 
 class Consent(models.Model):
@@ -42,13 +66,38 @@ class UserSubscription(models.Model):
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField()
 
+    # За сколько дней до окончания подписка считается истекающей (и приходит напоминание)
+    EXPIRING_SOON_DAYS = 7
+
+    class Meta:
+        indexes = [
+            # Диапазон по end_date и keyset-пагинация по (end_date, id) для напоминаний
+            models.Index(fields=['end_date', 'id'], name='usersub_end_date_id_idx'),
+            # Подписки пользователя по end_date: последняя, истекающие, история
+            models.Index(fields=['user', 'end_date'], name='usersub_user_end_date_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.end_date:
             self.end_date = self.start_date + timezone.timedelta(days=self.plan.duration_days)
-        super(UserSubscription, self).save(*args, **kwargs)
+        with transaction.atomic():
+            super(UserSubscription, self).save(*args, **kwargs)
+            UserSubscription.refresh_current(self.user_id)
+
+    @classmethod
+    def refresh_current(cls, user_id):
+        """
+        Ставит User.current_subscription на подписку пользователя с самым поздним
+        end_date. Строка пользователя блокируется до конца транзакции, так что
+        параллельные подписки одного пользователя не перетирают друг друга.
+        """
+        with transaction.atomic():
+            list(User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+            latest = cls.objects.filter(user_id=user_id).order_by('-end_date', '-id').values('pk')[:1]
+            User.objects.filter(pk=user_id).update(current_subscription=Subquery(latest))
 
     def is_expiring_soon(self):
-        return self.end_date - timezone.now() <= timedelta(days=7)
+        return self.end_date - timezone.now() <= timedelta(days=self.EXPIRING_SOON_DAYS)
 
     def __str__(self):
         return f"{self.user} - {self.plan.name}"
@@ -57,6 +106,20 @@ class UserSubscription(models.Model):
         return f"{self.user} - {self.plan.name}"
 
 
+class ExpiryReminder(models.Model):
+    """
+    Напоминание об окончании подписки, которое бот уже отправил (или не смог
+    отправить, потому что пользователь заблокировал бота). По одному на подписку,
+    так что повторный запуск рассылки не пишет пользователю второй раз.
+    """
+    subscription = models.OneToOneField(UserSubscription, on_delete=models.CASCADE, related_name='expiry_reminder')
+    sent_at = models.DateTimeField(default=timezone.now)
+    delivered = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"Reminder for {self.subscription} - {'sent' if self.delivered else 'not delivered'}"
+
+
 class GiftedSubscription(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_gifts')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_gifts')
@@ -90,6 +153,115 @@ class Payment(models.Model):
         return f"{self.user} - {self.subscription_plan.name if self.subscription_plan else 'Balance Top-up'} - {self.payment_method.name if self.payment_method else 'N/A'} - {self.status}"
 
 
+class BalanceEntry(models.Model):
+    """
+    Журнал изменений баланса. Строки только добавляются через post(), а
+    User.balance - их сумма, которую post() ведёт F()-выражением в той же
+    транзакции: параллельные пополнения не теряются и не переписывают другие
+    поля пользователя. Снимки (BalanceSnapshot) сворачивают журнал, так что
+    сверка баланса суммирует только записи после последнего снимка.
+    """
+    REASONS = [('top_up', 'Top-up'), ('purchase', 'Purchase'), ('adjustment', 'Adjustment')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_entries')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=20, choices=REASONS)
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='balance_entries')
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Записи пользователя после снимка: WHERE user_id = ... AND id > ...
+            models.Index(fields=['user', 'id'], name='balance_entry_user_id_idx'),
+        ]
+
+    @classmethod
+    def post(cls, user_id, amount, reason='top_up', payment=None):
+        """
+        Записывает изменение баланса и прибавляет его к User.balance атомарно.
+        """
+        with transaction.atomic():
+            # Сначала UPDATE: блокировка строки пользователя берётся до вставки записи,
+            # поэтому BalanceSnapshot.compact() под той же блокировкой не пропустит запись
+            if not User.objects.filter(pk=user_id).update(balance=F('balance') + amount):
+                raise User.DoesNotExist(f'User {user_id} does not exist.')
+            return cls.objects.create(user_id=user_id, amount=amount, reason=reason, payment=payment)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.amount:+} ({self.reason})"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Баланс пользователя по журналу на момент записи last_entry_id (включительно).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_snapshots')
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+    last_entry_id = models.BigIntegerField(default=0)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-last_entry_id'], name='balance_snapshot_latest_idx'),
+        ]
+
+    @classmethod
+    def fold(cls, user_id):
+        """
+        (баланс, id последней записи) по журналу: последний снимок плюс записи после него.
+        """
+        snapshot = cls.objects.filter(user_id=user_id).order_by('-last_entry_id', '-id').first()
+        balance, last_entry_id = (snapshot.balance, snapshot.last_entry_id) if snapshot else (Decimal(0), 0)
+        tail = BalanceEntry.objects.filter(user_id=user_id, id__gt=last_entry_id) \
+            .aggregate(total=Sum('amount'), last=Max('id'))
+        return balance + (tail['total'] or 0), tail['last'] or last_entry_id
+
+    @classmethod
+    def compact(cls, user_id, prune=False):
+        """
+        Сворачивает записи после последнего снимка в новый снимок. prune=True
+        удаляет свёрнутые записи и старые снимки. Расхождение с User.balance
+        пишется в лог, баланс не правится.
+        """
+        with transaction.atomic():
+            cached = User.objects.select_for_update().filter(pk=user_id).values_list('balance', flat=True).get()
+            balance, last_entry_id = cls.fold(user_id)
+            if balance != cached:
+                logger.warning("Balance of user %s is %s, ledger says %s", user_id, cached, balance)
+            snapshot = cls.objects.filter(user_id=user_id, last_entry_id=last_entry_id, balance=balance).first()
+            if snapshot is None:
+                snapshot = cls.objects.create(user_id=user_id, balance=balance, last_entry_id=last_entry_id)
+            if prune:
+                BalanceEntry.objects.filter(user_id=user_id, id__lte=last_entry_id).delete()
+                cls.objects.filter(user_id=user_id).exclude(pk=snapshot.pk).delete()
+            return snapshot
+
+    def __str__(self):
+        return f"{self.user_id}: {self.balance} @ {self.last_entry_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на первый POST с ключом (transaction_id) в рамках scope (эндпоинта).
+    Повтор с тем же запросом получает сохранённый ответ, см. idempotency.py.
+    """
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}: {self.key} -> {self.status_code}"
+
+
 class Method(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -124,6 +296,8 @@ class SupportMessage(models.Model):
     sender = models.CharField(max_length=250)
     message_text = models.TextField()
     timestamp = models.DateTimeField(default=timezone.now)
+    # True - сообщение пользователя из бота, False - ответ оператора (например, из админки)
+    from_user = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Message from {self.sender} in Session {self.session.id}"
@@ -157,8 +331,28 @@ class Material(models.Model):
 
     title = models.CharField(max_length=100)
     document = models.FileField(upload_to='materials/')
+    document_hash = models.CharField(max_length=64, blank=True, editable=False)
     material_type = models.CharField(max_length=20, choices=MATERIAL_TYPES)
 
+    def save(self, *args, **kwargs):
+        # Hash faqat yangi fayl yuklanganda qayta hisoblanadi; bot file_id keshini shu orqali yangilaydi
+        if self.document and (not self.document._committed or not self.document_hash):
+            self.document_hash = self.compute_document_hash()
+        super().save(*args, **kwargs)
+
+    def compute_document_hash(self):
+        digest = hashlib.sha256()
+        try:
+            self.document.open('rb')
+            for chunk in self.document.chunks():
+                digest.update(chunk)
+        except OSError:
+            return ''
+        finally:
+            if self.document._committed:
+                self.document.close()
+        return digest.hexdigest()
+
     def __str__(self):
         return self.title
 
@@ -0,0 +1,162 @@
+"""
+Кэш готовых ответов справочных эндпоинтов (планы подписки, способы оплаты,
+методы, советы, материалы). Эти данные меняются только из админки, поэтому
+ответ хранится уже отрендеренным - байты, статус и заголовки - по view,
+хосту, параметрам запроса и Accept.
+
+Сброс - сигналы post_save/post_delete (signals.py) меняют "поколение" модели
+после коммита. Поколения всех моделей view входят в ключ ответа, старые
+записи просто перестают находиться и вытесняются по TIMEOUT/MAX_ENTRIES.
+Поколение - случайный токен, а не счётчик: потерянный (вытесненный) токен
+не вернёт старые ответы.
+
+Хранилище - кэш RESPONSE_CACHE_ALIAS (файловый cache_backends.FileBasedCache
+в общей папке): сброс в одном воркере gunicorn/uvicorn сразу виден остальным
+без Redis или memcached.
+
+Защита от stampede: при промахе ответ строит один запрос - внутри процесса по
+threading.Lock, между процессами по блокировке через cache.add(). Остальные
+ждут готовый ответ до RESPONSE_CACHE_LOCK_TIMEOUT и только потом строят его сами.
+
+ETag ответа - хэш того же ключа: пока поколения моделей не сменились, клиент с
+If-None-Match получает 304 без чтения кэша (conditional.py).
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .conditional import make_etag, not_modified
+
+# Заголовки, которые не отдаются из кэша чужому запросу
+PRIVATE_HEADERS = frozenset({'set-cookie'})
+
+
+class ResponseCache:
+    def __init__(self, alias: str = None, lock_timeout: float = None, poll_interval: float = 0.01,
+                 lock_stripes: int = 64):
+        self.alias = alias or getattr(settings, 'RESPONSE_CACHE_ALIAS', 'responses')
+        self.lock_timeout = lock_timeout or getattr(settings, 'RESPONSE_CACHE_LOCK_TIMEOUT', 5)
+        self.poll_interval = poll_interval
+        # Фиксированный набор блокировок: ключей может быть много, блокировок - нет
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _generation_key(model) -> str:
+        return f'generation:{model._meta.label_lower}'
+
+    def generations(self, models) -> list:
+        keys = [self._generation_key(model) for model in models]
+        found = self.cache.get_many(keys)
+        tokens = []
+        for key in keys:
+            token = found.get(key)
+            if token is None:
+                token = uuid.uuid4().hex
+                # Другой воркер мог завести поколение раньше - тогда берём его
+                if not self.cache.add(key, token, timeout=None):
+                    token = self.cache.get(key) or token
+            tokens.append(token)
+        return tokens
+
+    def invalidate(self, model):
+        self.cache.set(self._generation_key(model), uuid.uuid4().hex, timeout=None)
+
+    def key(self, view, request, kwargs: dict, models) -> str:
+        params = sorted((name, value) for name, values in request.GET.lists() for value in values)
+        parts = [
+            f'{type(view).__module__}.{type(view).__qualname__}',
+            request.scheme,
+            request.get_host(),
+            repr(sorted(kwargs.items())),
+            repr(params),
+            request.META.get('HTTP_ACCEPT', ''),
+            *self.generations(models),
+        ]
+        return 'response:' + hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def _restore(cached) -> HttpResponse:
+        status, content, headers = cached
+        response = HttpResponse(content, status=status)
+        for name, value in headers:
+            response[name] = value
+        return response
+
+    def get_or_render(self, key: str, render) -> HttpResponse:
+        """
+        Ответ из кэша или render() (один на ключ среди всех процессов), отрендеренный и сохранённый.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return self._restore(cached)
+
+        with self._locks[hash(key) % len(self._locks)]:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                return self._restore(cached)
+
+            lock_key = f'{key}:lock'
+            deadline = time.monotonic() + self.lock_timeout
+            locked = self.cache.add(lock_key, 1, timeout=self.lock_timeout)
+            while not locked and time.monotonic() < deadline:
+                # Ответ строит другой воркер
+                time.sleep(self.poll_interval)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.hits += 1
+                    return self._restore(cached)
+                locked = self.cache.add(lock_key, 1, timeout=self.lock_timeout)
+
+            self.misses += 1
+            try:
+                response = render()
+                if response.status_code == 200:
+                    if hasattr(response, 'render'):
+                        response.render()
+                    headers = [(name, value) for name, value in response.items()
+                               if name.lower() not in PRIVATE_HEADERS]
+                    self.cache.set(key, (response.status_code, response.content, headers))
+            finally:
+                if locked:
+                    self.cache.delete(lock_key)
+            return response
+
+
+response_cache = ResponseCache()
+
+
+class CachedResponseMixin:
+    """
+    Для APIView: GET-ответы отдаются из response_cache с ETag, на совпавший
+    If-None-Match - 304. cache_models - модели, изменение которых сбрасывает
+    ответ (сигналы подключаются в signals.py).
+    """
+    cache_models = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+        key = response_cache.key(self, request, kwargs, self.cache_models)
+        etag = make_etag(key)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        response = response_cache.get_or_render(
+            key, lambda: super(CachedResponseMixin, self).dispatch(request, *args, **kwargs),
+        )
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
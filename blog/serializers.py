@@ -7,6 +7,8 @@ import random
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
+    # Объявлено явно, чтобы не было UniqueValidator: повторная регистрация - не ошибка (get_or_create во view)
+    telegram_id = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
     website_login = serializers.CharField(read_only=True)
     website_password = serializers.CharField(read_only=True)
 
@@ -125,7 +127,7 @@ class MaterialSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Material
-        fields = ['id', 'title', 'material_type', 'document_url']
+        fields = ['id', 'title', 'material_type', 'document_url', 'document_hash']
 
     def get_document_url(self, obj):
         request = self.context.get('request')
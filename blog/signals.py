@@ -0,0 +1,56 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Advice, Material, Method, PaymentMethod, SubscriptionPlan, SupportMessage, UserSubscription
+from .response_cache import response_cache
+
+
+class ChangeNotifier:
+    """
+    Будит запросы, ждущие новых данных (long-poll), в пределах одного процесса.
+    Версия растёт с каждым изменением: ждущий запоминает её до запроса к БД
+    и не пропустит изменение, случившееся между запросом и ожиданием.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, seen_version: int, timeout: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != seen_version, timeout)
+
+
+support_replies = ChangeNotifier()
+
+
+@receiver(post_save, sender=SupportMessage)
+def notify_support_reply(sender, instance, created, **kwargs):
+    # Ответ оператора становится виден другим соединениям только после коммита
+    if created and not instance.from_user:
+        transaction.on_commit(support_replies.notify)
+
+
+@receiver(post_delete, sender=UserSubscription)
+def refresh_current_subscription(sender, instance, **kwargs):
+    # Удалили текущую подписку - указатель переходит на следующую по end_date
+    UserSubscription.refresh_current(instance.user_id)
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    # До коммита другие соединения видят старые данные - сброс раньше закэшировал бы их снова
+    transaction.on_commit(lambda: response_cache.invalidate(sender))
+
+
+# Модели справочных эндпоинтов с CachedResponseMixin (views.py)
+for cached_model in (SubscriptionPlan, PaymentMethod, Method, Advice, Material):
+    post_save.connect(invalidate_cached_responses, sender=cached_model)
+    post_delete.connect(invalidate_cached_responses, sender=cached_model)
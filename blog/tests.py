@@ -1,3 +1,418 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
-# Create your tests here.
+from django.apps import apps as global_apps
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Advice, BalanceEntry, BalanceSnapshot, GiftedSubscription, IdempotencyKey, Material, Method, \
+    Payment, PaymentMethod, SubscriptionPlan, User, UserSubscription
+from .response_cache import response_cache
+
+
+class ProfileStatisticsQueriesTests(TestCase):
+    """
+    Профиль и статистика читают пользователя, текущую подписку с планом и
+    счётчики одним запросом.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name="Месяц", description="План", price="99000.00",
+                                                   duration_days=30)
+        cls.user = User.objects.create(telegram_id=1001, username="user", balance=150)
+        now = timezone.now()
+        UserSubscription.objects.create(user=cls.user, plan=cls.plan, start_date=now - timedelta(days=90))
+        cls.subscription = UserSubscription.objects.create(user=cls.user, plan=cls.plan,
+                                                           start_date=now - timedelta(days=3))
+        for n, payment_status in enumerate(["completed", "completed", "failed"]):
+            Payment.objects.create(user=cls.user, subscription_plan=cls.plan, amount="99000.00",
+                                   transaction_id=f"tx-{n}", status=payment_status)
+        User.objects.create(telegram_id=1002, username="new")
+
+    def test_profile_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/blog/profile/1001/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["total_payments"], 2)
+        self.assertEqual(data["current_subscription"]["id"], self.subscription.id)
+        self.assertEqual(data["current_subscription"]["plan"]["name"], "Месяц")
+
+    def test_profile_without_subscription(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/blog/profile/1002/")
+        self.assertEqual(response.json()["total_payments"], 0)
+        self.assertIsNone(response.json()["current_subscription"])
+
+    def test_statistics_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/blog/statistics/1001/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["total_subscriptions"], 2)
+        self.assertEqual(data["total_payments"], 2)
+        self.assertEqual(data["last_subscription"]["id"], self.subscription.id)
+
+    def test_statistics_without_subscription(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/blog/statistics/1002/")
+        self.assertEqual(response.json(), {"total_subscriptions": 0, "total_payments": 0,
+                                           "last_subscription": None})
+
+    def test_unknown_user(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/blog/profile/999/")
+        self.assertEqual(response.status_code, 404)
+
+
+class IdempotentPaymentTests(TestCase):
+    """
+    Повтор оплаты или подарка с тем же transaction_id отдаёт первый ответ и не проводит их заново.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name="Месяц", description="План", price="99000.00",
+                                                   duration_days=30)
+        cls.method = PaymentMethod.objects.create(name="Payme")
+        cls.user = User.objects.create(telegram_id=1001, username="user")
+        User.objects.create(telegram_id=1002, username="friend")
+
+    def top_up(self, transaction_id, amount="5000.00", method=None):
+        return self.client.post("/blog/make-payment/1001/", {
+            "payment_method": method or self.method.pk, "transaction_id": transaction_id, "amount": amount,
+        }, content_type="application/json")
+
+    def test_retry_replays_the_first_response(self):
+        first = self.top_up("tx-1")
+        retry = self.top_up("tx-1")
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        self.assertEqual(Payment.objects.filter(transaction_id="tx-1").count(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal("5000.00"))
+
+    def test_same_id_with_other_payload_conflicts(self):
+        self.top_up("tx-1")
+        response = self.top_up("tx-1", amount="7000.00")
+        self.assertEqual(response.status_code, 409)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal("5000.00"))
+
+    def test_failed_request_is_not_stored(self):
+        self.assertEqual(self.top_up("tx-1", method=999).status_code, 404)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.top_up("tx-1").status_code, 201)
+
+    def test_payment_without_stored_response_conflicts(self):
+        Payment.objects.create(user=self.user, amount="1.00", transaction_id="tx-old", status="completed")
+        self.assertEqual(self.top_up("tx-old").status_code, 409)
+
+    def test_gift_retry_is_replayed(self):
+        data = {"recipient_username": "friend", "plan_id": self.plan.pk, "transaction_id": "gift-1"}
+        responses = [self.client.post("/blog/gift-subscription/1001/", data, content_type="application/json")
+                     for _ in range(2)]
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(responses[1].json(), responses[0].json())
+        self.assertEqual(GiftedSubscription.objects.count(), 1)
+        self.assertEqual(UserSubscription.objects.count(), 1)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "response-cache-tests"},
+})
+class ResponseCacheTests(TestCase):
+    """
+    Справочные ответы кэшируются с ETag и сбрасываются после коммита изменения модели.
+    """
+
+    # (модель, адрес списка, поля новой записи, изменяемое поле)
+    CASES = [
+        (SubscriptionPlan, "/blog/subscription-plans/",
+         {"name": "Месяц", "description": "План", "price": "99000.00", "duration_days": 30}, "name"),
+        (PaymentMethod, "/blog/payment-methods/", {"name": "Payme"}, "name"),
+        (Method, "/blog/methods/", {"name": "Метод", "description": "Описание"}, "name"),
+        (Advice, "/blog/advice/", {"title": "Совет", "content": "Текст"}, "title"),
+        (Material, "/blog/materials/", {"title": "Методичка", "document": "materials/m.pdf",
+                                        "material_type": "methodichka"}, "title"),
+    ]
+
+    def setUp(self):
+        response_cache.cache.clear()
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assert_changed(self, url, old):
+        response = self.get(url, old["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], old["ETag"])
+        self.assertNotEqual(response.content, old.content)
+        return response
+
+    def test_save_and_delete_invalidate_after_commit(self):
+        for model, url, fields, field in self.CASES:
+            with self.subTest(model=model.__name__):
+                instance = model.objects.create(**fields)
+                first = self.get(url)
+                self.assertEqual(first.status_code, 200)
+
+                with self.captureOnCommitCallbacks() as callbacks:
+                    setattr(instance, field, "Изменено")
+                    instance.save()
+                # До коммита другие соединения видят старые данные - ответ ещё прежний
+                self.assertEqual(self.get(url, first["ETag"]).status_code, 304)
+                for callback in callbacks:
+                    callback()
+                saved = self.assert_changed(url, first)
+                self.assertIn("Изменено".encode(), saved.content)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    instance.delete()
+                deleted = self.assert_changed(url, saved)
+                self.assertNotIn("Изменено".encode(), deleted.content)
+
+    def test_matching_etag_gets_304(self):
+        PaymentMethod.objects.create(name="Payme")
+        first = self.get("/blog/payment-methods/")
+        self.assertTrue(first.has_header("ETag"))
+        with self.assertNumQueries(0):
+            response = self.get("/blog/payment-methods/", first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.get("/blog/payment-methods/", '"other"').status_code, 200)
+
+    def test_non_200_is_not_cached(self):
+        misses = response_cache.misses
+        for _ in range(2):
+            response = self.get("/blog/methods/999/")
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse(response.has_header("ETag"))
+        self.assertEqual(response_cache.misses - misses, 2)
+
+        calls = []
+
+        def render():
+            calls.append(1)
+            return HttpResponse(status=503)
+
+        for _ in range(2):
+            self.assertEqual(response_cache.get_or_render("response:test", render).status_code, 503)
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(response_cache.cache.get("response:test"))
+
+
+class BalanceLedgerTests(TestCase):
+    """
+    Журнал баланса: post() ведёт User.balance, снимки сворачивают журнал без расхождений.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(telegram_id=1001, username="user")
+
+    def balance(self):
+        self.user.refresh_from_db()
+        return self.user.balance
+
+    def test_post_for_unknown_user(self):
+        with self.assertRaises(User.DoesNotExist):
+            BalanceEntry.post(999, Decimal("10.00"))
+        self.assertFalse(BalanceEntry.objects.exists())
+
+    def test_post_with_linked_payment(self):
+        payment = Payment.objects.create(user=self.user, amount="250.00", transaction_id="tx-1", status="completed")
+        entry = BalanceEntry.post(self.user.pk, payment.amount, payment=payment)
+        self.assertEqual((entry.payment, entry.reason), (payment, "top_up"))
+        self.assertEqual(self.balance(), Decimal("250.00"))
+        # Платёж можно удалить, запись журнала остаётся
+        payment.delete()
+        entry.refresh_from_db()
+        self.assertIsNone(entry.payment)
+        self.assertEqual(BalanceSnapshot.fold(self.user.pk), (Decimal("250.00"), entry.pk))
+
+    def test_compact_without_prune(self):
+        entries = [BalanceEntry.post(self.user.pk, amount) for amount in (Decimal("100.00"), Decimal("-30.00"))]
+        snapshot = BalanceSnapshot.compact(self.user.pk)
+        self.assertEqual((snapshot.balance, snapshot.last_entry_id), (Decimal("70.00"), entries[-1].pk))
+        self.assertEqual(BalanceEntry.objects.count(), 2)
+        # Без новых записей повторное сжатие не плодит снимки
+        self.assertEqual(BalanceSnapshot.compact(self.user.pk), snapshot)
+        self.assertEqual(BalanceSnapshot.objects.count(), 1)
+
+    def test_compact_with_prune(self):
+        BalanceEntry.post(self.user.pk, Decimal("100.00"))
+        BalanceSnapshot.compact(self.user.pk)
+        last = BalanceEntry.post(self.user.pk, Decimal("5.00"))
+        snapshot = BalanceSnapshot.compact(self.user.pk, prune=True)
+        self.assertEqual((snapshot.balance, snapshot.last_entry_id), (Decimal("105.00"), last.pk))
+        self.assertFalse(BalanceEntry.objects.exists())
+        self.assertEqual(list(BalanceSnapshot.objects.all()), [snapshot])
+
+    def test_fold_after_compaction_matches_balance(self):
+        for amount in ("100.00", "-40.00", "12.50"):
+            BalanceEntry.post(self.user.pk, Decimal(amount))
+        BalanceSnapshot.compact(self.user.pk, prune=True)
+        last = BalanceEntry.post(self.user.pk, Decimal("7.50"))
+        self.assertEqual(BalanceSnapshot.fold(self.user.pk), (self.balance(), last.pk))
+        self.assertEqual(self.balance(), Decimal("80.00"))
+
+    def test_compact_logs_a_mismatch(self):
+        BalanceEntry.post(self.user.pk, Decimal("100.00"))
+        User.objects.filter(pk=self.user.pk).update(balance=Decimal("90.00"))
+        with self.assertLogs("blog.models", "WARNING"):
+            snapshot = BalanceSnapshot.compact(self.user.pk)
+        self.assertEqual((snapshot.balance, self.balance()), (Decimal("100.00"), Decimal("90.00")))
+
+    def test_open_balances_snapshot(self):
+        funded = User.objects.create(telegram_id=1002, username="funded", balance=Decimal("42.00"))
+        migration = importlib.import_module("blog.migrations.0008_balance_ledger")
+        migration.open_balances(global_apps, None)
+        snapshot = BalanceSnapshot.objects.get()
+        self.assertEqual((snapshot.user, snapshot.balance, snapshot.last_entry_id), (funded, Decimal("42.00"), 0))
+        BalanceEntry.post(funded.pk, Decimal("8.00"))
+        funded.refresh_from_db()
+        self.assertEqual(BalanceSnapshot.fold(funded.pk)[0], funded.balance)
+
+
+BOT_DIR = Path(__file__).resolve().parent.parent / "bot"
+
+
+def import_bot_module(name):
+    """
+    Импортирует модуль бота. Его config.py называется так же, как пакет настроек
+    Django, поэтому на время импорта config - это конфиг бота.
+    """
+    django_config = sys.modules.pop("config")
+    sys.path.insert(0, str(BOT_DIR))
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(str(BOT_DIR))
+        sys.modules["config"] = django_config
+
+
+class BotGiftPayloadTests(TestCase):
+    """
+    Подарок, который отправляет enter_gift_payment_details, проходит GiftSubscriptionView.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name="Месяц", description="План", price="99000.00",
+                                                   duration_days=30)
+        cls.method = PaymentMethod.objects.create(name="Payme")
+        User.objects.create(telegram_id=1001, username="user")
+        cls.friend = User.objects.create(telegram_id=1002, username="friend")
+
+    def bot_request(self):
+        subscription_handler = import_bot_module("subscription_handler")
+        update = SimpleNamespace(message=SimpleNamespace(
+            text="8600123412341234", from_user=SimpleNamespace(id=1001), reply_text=AsyncMock(),
+        ))
+        context = SimpleNamespace(user_data={
+            "recipient_username": "@friend", "selected_plan_id": self.plan.pk, "selected_method_id": self.method.pk,
+        })
+        backend_post = AsyncMock()
+        with patch.object(subscription_handler, "backend_post", backend_post), \
+                patch.object(subscription_handler, "show_main_menu", AsyncMock()):
+            asyncio.run(subscription_handler.enter_gift_payment_details(update, context))
+        backend_post.assert_awaited_once()
+        return backend_post.await_args
+
+    def test_bot_payload_creates_the_gift(self):
+        request = self.bot_request()
+        response = self.client.post(f"/blog{request.args[0]}", request.kwargs["json"],
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        gift = GiftedSubscription.objects.get()
+        self.assertEqual((gift.recipient, gift.plan), (self.friend, self.plan))
+        self.friend.refresh_from_db()
+        self.assertEqual(self.friend.current_subscription.plan, self.plan)
+
+
+class DedupeUsersMigrationTests(TransactionTestCase):
+    """
+    0005 сливает пользователей с одним telegram_id и оставляет им по одному
+    согласию, карте клиента и активной сессии поддержки.
+    """
+
+    before = [("blog", "0004_expiry_reminders")]
+    after = [("blog", "0006_user_telegram_id_unique")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_merge_duplicates_with_related_rows(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model("blog", "User")
+        Consent = apps.get_model("blog", "Consent")
+        ClientCard = apps.get_model("blog", "ClientCard")
+        SupportSession = apps.get_model("blog", "SupportSession")
+        SupportMessage = apps.get_model("blog", "SupportMessage")
+        Payment = apps.get_model("blog", "Payment")
+
+        now = timezone.now()
+        users = [User.objects.create(telegram_id=telegram_id, username=username, balance=balance)
+                 for telegram_id, username, balance in [("123", "old", 10), (" 123", "", 5), ("0123", "new", 1)]]
+        other = User.objects.create(telegram_id="456", username="other")
+        for n, user in enumerate(users):
+            Consent.objects.create(user=user, consent_given=n == 2, consent_date=now - timedelta(days=3 - n))
+            ClientCard.objects.create(user=user, name=f"card-{n}", age=30, goals="", challenges="")
+            session = SupportSession.objects.create(user=user, started_at=now - timedelta(days=3 - n))
+            SupportMessage.objects.create(session=session, sender=user.username, message_text=f"msg-{n}")
+            Payment.objects.create(user=user, amount="1.00", transaction_id=f"tx-{n}", status="completed")
+        Consent.objects.create(user=other, consent_given=True)
+        newest_session = SupportSession.objects.filter(user=users[2]).get()
+        # Пустая дата согласия не должна оказаться "самой новой"
+        Consent.objects.create(user=users[0], consent_given=False, consent_date=None)
+
+        with self.assertLogs("blog.migrations", "WARNING") as logs:
+            apps = self.migrate(self.after)
+        self.assertIn("merged 2 duplicate users", logs.output[0])
+        User = apps.get_model("blog", "User")
+        Consent = apps.get_model("blog", "Consent")
+        ClientCard = apps.get_model("blog", "ClientCard")
+        SupportSession = apps.get_model("blog", "SupportSession")
+        SupportMessage = apps.get_model("blog", "SupportMessage")
+        Payment = apps.get_model("blog", "Payment")
+
+        keeper = User.objects.get(telegram_id=123)
+        self.assertEqual(keeper.pk, users[0].pk)
+        self.assertEqual((keeper.username, keeper.balance), ("new", Decimal("16.00")))
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Payment.objects.filter(user=keeper).count(), 3)
+
+        self.assertEqual(list(Consent.objects.filter(user=keeper).values_list("consent_given", flat=True)), [True])
+        self.assertEqual(Consent.objects.filter(user=keeper).get().consent_date, now - timedelta(days=1))
+        self.assertEqual(Consent.objects.filter(user__telegram_id=456).count(), 1)
+        self.assertEqual(list(ClientCard.objects.filter(user=keeper).values_list("name", flat=True)), ["card-2"])
+
+        active = SupportSession.objects.filter(user=keeper, is_active=True).get()
+        self.assertEqual(active.pk, newest_session.pk)
+        closed = SupportSession.objects.filter(user=keeper, is_active=False)
+        self.assertEqual(closed.count(), 2)
+        self.assertFalse(closed.filter(ended_at__isnull=True).exists())
+        self.assertEqual(SupportMessage.objects.filter(session__user=keeper).count(), 3)
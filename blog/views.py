@@ -1,20 +1,38 @@
-from _decimal import Decimal
+from datetime import datetime, timedelta
+
+from _decimal import Decimal, InvalidOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 import logging
+import time
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from tutorial.quickstart.serializers import UserSerializer
 
+from .conditional import make_etag, not_modified
+from .idempotency import replay_or_run, request_hash
 from .models import User, SubscriptionPlan, UserSubscription, Payment, PaymentMethod, Consent, Method, SupportSession, \
-    SupportMessage, ClientCard, Advice, GiftedSubscription, Material
+    SupportMessage, ExpiryReminder, ClientCard, Advice, GiftedSubscription, Material, BalanceEntry
+from .response_cache import CachedResponseMixin
+from .signals import support_replies
 from .serializers import UserRegistrationSerializer, ConsentSerializer, UserSubscriptionSerializer, \
     SubscriptionPlanSerializer, PaymentSerializer, PaymentMethodSerializer, MethodSerializer, UserCardSerializer, \
     ClientCardSerializer, AdviceSerializer, MaterialSerializer, SessionSerializer, FeedBackSerializer
 
 
+def count_subquery(queryset):
+    """
+    COUNT(*) строк queryset пользователя (фильтр по user=OuterRef('pk')) подзапросом -
+    для annotate() без JOIN, которые размножают строки друг друга.
+    """
+    counted = queryset.order_by().values('user').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
 class UserRegistrationView(APIView):
     def post(self, request):
         serializer = UserRegistrationSerializer(data=request.data)
@@ -28,6 +46,58 @@ class UserRegistrationView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BootstrapView(APIView):
+    """
+    /start uchun: foydalanuvchini ro'yxatdan o'tkazadi (yoki username ni yangilaydi) va
+    bitta javobda rozilik holati, aktiv obuna va balansni qaytaradi.
+    """
+
+    def post(self, request):
+        telegram_id = request.data.get('telegram_id')
+        if not telegram_id:
+            return Response({'error': 'Введите telegram_id.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            telegram_id = int(telegram_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'telegram_id должен быть числом.'}, status=status.HTTP_400_BAD_REQUEST)
+        username = request.data.get('username') or ''
+
+        latest_consent = Consent.objects.filter(user=OuterRef('pk')).order_by('-id')
+        users = User.objects.select_related('current_subscription__plan').annotate(
+            consent_given=Subquery(latest_consent.values('consent_given')[:1]),
+            consent_date=Subquery(latest_consent.values('consent_date')[:1]),
+        )
+        with transaction.atomic():
+            user = users.filter(telegram_id=telegram_id).first()
+
+            created = user is None
+            if created:
+                try:
+                    with transaction.atomic():
+                        user = User.objects.create(telegram_id=telegram_id, username=username)
+                except IntegrityError:
+                    # Параллельный /start этого же пользователя успел создать его первым
+                    user = users.get(telegram_id=telegram_id)
+                    created = False
+                else:
+                    user.consent_given, user.consent_date = False, None
+            if not created and username and user.username != username:
+                user.username = username
+                user.save(update_fields=['username'])
+
+            current_subscription = None if created else user.active_subscription()
+
+        return Response({
+            'created': created,
+            'telegram_id': user.telegram_id,
+            'username': user.username,
+            'balance': user.balance,
+            'consent_given': bool(user.consent_given),
+            'consent_date': user.consent_date,
+            'current_subscription': UserSubscriptionSerializer(current_subscription).data if current_subscription else None,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
 class ConsentView(APIView):
     def get(self, request, telegram_id):
         user = get_object_or_404(User, telegram_id=telegram_id)
@@ -65,7 +135,9 @@ class ConsentStatusView(APIView):
             return Response({'consent_given': False, 'consent_date': None}, status=status.HTTP_200_OK)
 
 
-class SubscriptionPlanListView(APIView):
+class SubscriptionPlanListView(CachedResponseMixin, APIView):
+    cache_models = (SubscriptionPlan,)
+
     def get(self, request):
         plans = SubscriptionPlan.objects.all()
         serializer = SubscriptionPlanSerializer(plans, many=True)
@@ -95,12 +167,8 @@ logger = logging.getLogger(__name__)
 
 class GiftSubscriptionView(APIView):
     def post(self, request, telegram_id):
-        try:
-            sender = User.objects.get(telegram_id=telegram_id)
-        except User.DoesNotExist:
-            return Response({'error': 'Foydalanuvchi topilmadi.'}, status=status.HTTP_404_NOT_FOUND)
-
-        recipient_username = request.data.get('recipient_username')
+        # Бот присылает username так, как его ввели, - с "@"; в базе он хранится без него
+        recipient_username = str(request.data.get('recipient_username') or '').lstrip('@')
         plan_id = request.data.get('plan_id')
         transaction_id = request.data.get('transaction_id')
 
@@ -112,9 +180,26 @@ class GiftSubscriptionView(APIView):
         if not transaction_id:
             return Response({'error': 'Tranzaksiya ID kiriting.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if not isinstance(transaction_id, str):
+            return Response({'error': 'Tranzaksiya ID matn ko\'rinishida bo\'lishi kerak.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if len(transaction_id) > 255:
+            return Response({'error': 'Tranzaksiya ID juda uzun.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Повтор после таймаута получает ответ первого запроса, подписка не дарится дважды
+        return replay_or_run('gift-subscription', transaction_id, request_hash(telegram_id, request.data),
+                             lambda: self.create_gift(telegram_id, recipient_username, plan_id, transaction_id))
+
+    def create_gift(self, telegram_id, recipient_username, plan_id, transaction_id):
         try:
-            recipient = User.objects.get(username=recipient_username)
+            sender = User.objects.get(telegram_id=telegram_id)
         except User.DoesNotExist:
+            return Response({'error': 'Foydalanuvchi topilmadi.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # username не уникален (его могли сменить и отдать другому) - берём последнего зарегистрированного
+        recipient = User.objects.filter(username=recipient_username).order_by('-id').first()
+        if recipient is None:
             return Response({'error': 'Qabul qiluvchi topilmadi.'}, status=status.HTTP_404_NOT_FOUND)
 
         try:
@@ -122,39 +207,34 @@ class GiftSubscriptionView(APIView):
         except SubscriptionPlan.DoesNotExist:
             return Response({'error': 'Obuna rejasi topilmadi.'}, status=status.HTTP_404_NOT_FOUND)
 
-        if not isinstance(transaction_id, str):
-            return Response({'error': 'Tranzaksiya ID matn ko\'rinishida bo\'lishi kerak.'},
-                            status=status.HTTP_400_BAD_REQUEST)
-
         logger.debug(
             f"Sender ID: {sender.id}, Recipient ID: {recipient.id}, Plan ID: {plan.id}, Transaction ID: {transaction_id}")
 
-        if len(transaction_id) > 255:
-            return Response({'error': 'Tranzaksiya ID juda uzun.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            gifted_subscription = GiftedSubscription.objects.create(
-                sender=sender,
-                recipient=recipient,
-                plan=plan,
-                transaction_id=transaction_id
-            )
-        except Exception as e:
-            logger.error(f"Error creating GiftedSubscription: {e}")
-            return Response({'error': 'Xatolik yuz berdi sovg\'a yaratishda.'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        try:
-            user_subscription = UserSubscription.objects.create(
-                user=recipient,
-                plan=plan,
-                start_date=timezone.now(),
-                end_date=timezone.now() + timezone.timedelta(days=plan.duration_days),
-                amount=plan.price
-            )
-        except Exception as e:
-            logger.error(f"Error creating UserSubscription: {e}")
-            return Response({'error': 'Xatolik yuz berdi abonentlik yaratishda.'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Подарок и подписка получателя (вместе с его current_subscription) - одной транзакцией
+        with transaction.atomic():
+            try:
+                gifted_subscription = GiftedSubscription.objects.create(
+                    sender=sender,
+                    recipient=recipient,
+                    plan=plan,
+                    transaction_id=transaction_id
+                )
+            except Exception as e:
+                logger.error(f"Error creating GiftedSubscription: {e}")
+                return Response({'error': 'Xatolik yuz berdi sovg\'a yaratishda.'},
+                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            try:
+                user_subscription = UserSubscription.objects.create(
+                    user=recipient,
+                    plan=plan,
+                    start_date=timezone.now(),
+                    end_date=timezone.now() + timezone.timedelta(days=plan.duration_days),
+                )
+            except Exception as e:
+                logger.error(f"Error creating UserSubscription: {e}")
+                transaction.set_rollback(True)
+                return Response({'error': 'Xatolik yuz berdi abonentlik yaratishda.'},
+                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return Response(
             {"message": f"'{plan.name}' obunasi {recipient.username} foydalanuvchisiga sovgʻa qilindi."},
@@ -165,30 +245,122 @@ class GiftSubscriptionView(APIView):
 class SubscriptionStatusView(APIView):
     def get(self, request, telegram_id):
         try:
-            user = User.objects.get(telegram_id=telegram_id)
+            user = User.objects.select_related('current_subscription__plan').get(telegram_id=telegram_id)
         except User.DoesNotExist:
             return Response({'error': 'Пользователь не найден.'}, status=status.HTTP_404_NOT_FOUND)
-        user_subscription = UserSubscription.objects.filter(user=user).order_by('-end_date').first()
-        if user_subscription and user_subscription.end_date > timezone.now():
+        user_subscription = user.active_subscription()
+        if user_subscription:
             serializer = UserSubscriptionSerializer(user_subscription)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response({'message': 'Пользователь не подписан или срок подписки истек.'}, status=status.HTTP_200_OK)
 
 
+class ExpiringSubscriptionsView(APIView):
+    """
+    Подписки, которые заканчиваются в ближайшие UserSubscription.EXPIRING_SOON_DAYS
+    дней и по которым ещё не отправлено напоминание:
+    GET /subscriptions/expiring/?after=<cursor>&limit=<n>.
+
+    Диапазон по end_date и keyset-пагинация по (end_date, id) идут по индексу
+    usersub_end_date_id_idx, поэтому страница стоит одинаково в начале и в конце
+    выборки. cursor - "<end_date>|<id>" последней строки, next == null на последней
+    странице. Подписки, у пользователя которых есть более поздняя, пропускаются.
+    """
+    max_limit = 1000
+
+    @staticmethod
+    def expiring_queryset(now, after=None):
+        """
+        Подписки без напоминания, заканчивающиеся в окне, по порядку (end_date, id);
+        after - (end_date, id) последней строки предыдущей страницы.
+        """
+        later = UserSubscription.objects.filter(user_id=OuterRef('user_id'), end_date__gt=OuterRef('end_date'))
+        subscriptions = UserSubscription.objects.filter(
+            end_date__gte=now,
+            end_date__lt=now + timedelta(days=UserSubscription.EXPIRING_SOON_DAYS),
+            expiry_reminder__isnull=True,
+        ).exclude(Exists(later))
+        if after:
+            after_end, after_id = after
+            subscriptions = subscriptions.filter(
+                Q(end_date__gt=after_end) | Q(end_date=after_end, id__gt=after_id), end_date__gte=after_end
+            )
+        return subscriptions.order_by('end_date', 'id')
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 500)), 1), self.max_limit)
+            after = request.query_params.get('after')
+            if after:
+                after_end, after_id = after.rsplit('|', 1)
+                after_end, after_id = datetime.fromisoformat(after_end), int(after_id)
+                if timezone.is_naive(after_end):
+                    after_end = timezone.make_aware(after_end)
+        except ValueError:
+            return Response({'error': 'Неверные параметры запроса.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        subscriptions = self.expiring_queryset(timezone.now(), (after_end, after_id) if after else None)
+        rows = list(subscriptions.values(
+            'id', 'end_date', 'user__telegram_id', 'plan__name'
+        )[:limit])
+
+        results = [
+            {
+                'id': row['id'],
+                'telegram_id': row['user__telegram_id'],
+                'plan': row['plan__name'],
+                'end_date': row['end_date'],
+            }
+            for row in rows
+        ]
+        next_cursor = f"{rows[-1]['end_date'].isoformat()}|{rows[-1]['id']}" if len(rows) == limit else None
+        return Response({'subscriptions': results, 'next': next_cursor}, status=status.HTTP_200_OK)
+
+
+class ExpiryRemindersView(APIView):
+    """
+    Отмечает отправленные напоминания: {"reminders": [{"subscription_id": 1, "delivered": true}, ...]}.
+    Повторная отметка той же подписки ничего не меняет.
+    """
+    max_reminders = 1000
+
+    def post(self, request):
+        items = request.data.get("reminders")
+        if not isinstance(items, list) or not items or len(items) > self.max_reminders:
+            return Response({'error': f'Передайте от 1 до {self.max_reminders} напоминаний.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            delivered = {int(item["subscription_id"]): bool(item.get("delivered", True)) for item in items}
+        except (TypeError, KeyError, ValueError):
+            return Response({'error': 'Неверный subscription_id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        existing = UserSubscription.objects.filter(id__in=delivered).values_list('id', flat=True)
+        reminders = [
+            ExpiryReminder(subscription_id=subscription_id, delivered=delivered[subscription_id])
+            for subscription_id in existing
+        ]
+        ExpiryReminder.objects.bulk_create(reminders, ignore_conflicts=True)
+        return Response({'recorded': len(reminders)}, status=status.HTTP_201_CREATED)
+
+
 class MakePaymentView(APIView):
     def post(self, request, telegram_id):
+        transaction_id = request.data.get('transaction_id')
+        if not transaction_id:
+            return Response({'error': 'Введите ID транзакции.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Повтор после таймаута получает ответ первого запроса, оплата не проводится дважды
+        return replay_or_run('make-payment', str(transaction_id), request_hash(telegram_id, request.data),
+                             lambda: self.create_payment(request, telegram_id, transaction_id))
+
+    def create_payment(self, request, telegram_id, transaction_id):
         try:
             user = User.objects.get(telegram_id=telegram_id)
         except User.DoesNotExist:
             return Response({'error': 'Пользователь не найден.'}, status=status.HTTP_404_NOT_FOUND)
 
         method_id = request.data.get('payment_method')
-        transaction_id = request.data.get('transaction_id')
         amount = request.data.get('amount')  # Optional for balance top-up
 
-        if not transaction_id:
-            return Response({'error': 'Введите ID транзакции.'}, status=status.HTTP_400_BAD_REQUEST)
-
         try:
             payment_method = PaymentMethod.objects.get(id=method_id)
         except PaymentMethod.DoesNotExist:
@@ -203,28 +375,32 @@ class MakePaymentView(APIView):
                 amount = subscription_plan.price  # Override amount for subscription
             except SubscriptionPlan.DoesNotExist:
                 return Response({'error': 'Тип подписки не найден.'}, status=status.HTTP_404_NOT_FOUND)
-        elif amount:
+        else:
             try:
                 amount = Decimal(amount)  # Convert amount to Decimal
                 if amount <= 0:
                     raise ValueError
-            except (ValueError, TypeError, Decimal.InvalidOperation):
+            except (ValueError, TypeError, InvalidOperation):
                 return Response({'error': 'Неверный формат суммы.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create payment
-        payment = Payment.objects.create(
-            user=user,
-            subscription_plan=subscription_plan,
-            payment_method=payment_method,
-            amount=amount,
-            transaction_id=transaction_id,
-            status='pending'
-        )
-
-        # Update user balance if it’s a top-up
-        if subscription_plan is None:
-            user.balance += amount  # No error here because amount is Decimal
-            user.save()
+        try:
+            with transaction.atomic():
+                # Create payment
+                payment = Payment.objects.create(
+                    user=user,
+                    subscription_plan=subscription_plan,
+                    payment_method=payment_method,
+                    amount=amount,
+                    transaction_id=transaction_id,
+                    status='pending'
+                )
+
+                # Пополнение: запись в журнал и balance = balance + amount одним UPDATE
+                if subscription_plan is None:
+                    BalanceEntry.post(user.id, amount, 'top_up', payment=payment)
+        except IntegrityError:
+            # Оплата с этим ID проведена до появления IdempotencyKey - ответа для повтора нет
+            return Response({'error': 'Транзакция с таким ID уже существует.'}, status=status.HTTP_409_CONFLICT)
 
         serializer = PaymentSerializer(payment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -240,21 +416,27 @@ class PaymentStatusView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class PaymentMethodListView(APIView):
+class PaymentMethodListView(CachedResponseMixin, APIView):
+    cache_models = (PaymentMethod,)
+
     def get(self, request):
         methods = PaymentMethod.objects.all()
         serializer = PaymentMethodSerializer(methods, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class MethodsListView(APIView):
+class MethodsListView(CachedResponseMixin, APIView):
+    cache_models = (Method,)
+
     def get(self, request):
         methods = Method.objects.all()
         serializer = MethodSerializer(methods, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class MethodDetailView(APIView):
+class MethodDetailView(CachedResponseMixin, APIView):
+    cache_models = (Method,)
+
     def get(self, request, method_id):
         try:
             method = Method.objects.get(id=method_id)
@@ -266,26 +448,51 @@ class MethodDetailView(APIView):
 
 class StatisticsView(APIView):
     def get(self, request, telegram_id):
+        # Пользователь, последняя подписка с планом и оба счётчика - одним запросом
+        users = User.objects.select_related('current_subscription__plan').annotate(
+            total_subscriptions=count_subquery(UserSubscription.objects.filter(user=OuterRef('pk'))),
+            total_payments=count_subquery(Payment.objects.filter(user=OuterRef('pk'), status='completed')),
+        )
         try:
-            user = User.objects.get(telegram_id=telegram_id)
+            user = users.get(telegram_id=telegram_id)
         except User.DoesNotExist:
             return Response({'error': 'Пользователь не найден.'}, status=status.HTTP_404_NOT_FOUND)
+        last_subscription = user.current_subscription
         statistics = {
-            "total_subscriptions": UserSubscription.objects.filter(user=user).count(),
-            "total_payments": Payment.objects.filter(user=user, status='completed').count(),
-            "last_subscription": UserSubscription.objects.filter(user=user).order_by('-end_date').first(),
+            "total_subscriptions": user.total_subscriptions,
+            "total_payments": user.total_payments,
+            "last_subscription": UserSubscriptionSerializer(last_subscription).data if last_subscription else None,
         }
         return Response(statistics, status=status.HTTP_200_OK)
 
 
 class ProfileView(APIView):
     def get(self, request, telegram_id):
+        # Один запрос: пользователь, текущая подписка с планом и число оплат
+        users = User.objects.select_related('current_subscription__plan').annotate(
+            total_payments=count_subquery(Payment.objects.filter(user=OuterRef('pk'), status='completed')),
+        )
         try:
-            user = User.objects.get(telegram_id=telegram_id)
+            user = users.get(telegram_id=telegram_id)
         except User.DoesNotExist:
             return Response({'error': 'Пользователь не найден.'}, status=status.HTTP_404_NOT_FOUND)
 
-        current_subscription = UserSubscription.objects.filter(user=user, end_date__gte=timezone.now()).first()
+        current_subscription = user.active_subscription()
+        total_payments = user.total_payments
+        # ETag из тех же значений, что попадут в ответ: на совпадение - 304 без сериализации
+        subscription_parts = None
+        if current_subscription:
+            plan = current_subscription.plan
+            subscription_parts = (current_subscription.id, current_subscription.start_date,
+                                  current_subscription.end_date, current_subscription.is_expiring_soon(),
+                                  plan.id, plan.name, plan.description, plan.price, plan.duration_days,
+                                  plan.renewable)
+        etag = make_etag(user.telegram_id, user.username, user.created, user.balance, total_payments,
+                         subscription_parts)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         if current_subscription:
             subscription_serializer = UserSubscriptionSerializer(current_subscription)
             subscription_data = subscription_serializer.data
@@ -297,10 +504,10 @@ class ProfileView(APIView):
             "username": user.username,
             "created": user.created.isoformat(),
             "current_subscription": subscription_data,
-            "total_payments": Payment.objects.filter(user=user, status='completed').count(),
+            "total_payments": total_payments,
             "balance": user.balance,
         }
-        return Response(profile_data, status=status.HTTP_200_OK)
+        return Response(profile_data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
 
 class UserCardView(APIView):
@@ -361,7 +568,8 @@ class SendSupportMessageView(APIView):
             message = SupportMessage.objects.create(
                 session=session,
                 sender=sender,
-                message_text=message_text
+                message_text=message_text,
+                from_user=True,
             )
             logger.debug(f"SupportMessage created: {message.id}")
         except Exception as e:
@@ -372,6 +580,69 @@ class SendSupportMessageView(APIView):
         return Response({'message': 'Сообщение успешно отправлено.'}, status=status.HTTP_201_CREATED)
 
 
+class SendSupportMessagesBulkView(APIView):
+    """
+    Сообщения поддержки пачкой (в том числе из разных сессий):
+    {"messages": [{"session_id": 1, "sender": "...", "message_text": "..."}, ...]}.
+    Сессии проверяются одним запросом, сообщения сохраняются одним bulk_create.
+    Ответ - результат по каждому сообщению в том же порядке.
+    """
+    max_messages = 500
+
+    def post(self, request):
+        items = request.data.get("messages")
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Передайте список messages.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_messages:
+            return Response({'error': f'Не больше {self.max_messages} сообщений за запрос.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        session_ids = set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get("session_id") or not item.get("sender") \
+                    or not item.get("message_text"):
+                results[index] = {'status': 'error', 'error': 'Все поля обязательны.'}
+                continue
+            try:
+                session_ids.add(int(item["session_id"]))
+            except (TypeError, ValueError):
+                results[index] = {'status': 'error', 'error': 'Сессия не найдена или завершена.'}
+
+        active_sessions = set(
+            SupportSession.objects.filter(id__in=session_ids, is_active=True).values_list('id', flat=True)
+        )
+
+        messages = []
+        stored = []
+        for index, item in enumerate(items):
+            if results[index] is not None:
+                continue
+            if int(item["session_id"]) not in active_sessions:
+                results[index] = {'status': 'error', 'error': 'Сессия не найдена или завершена.'}
+                continue
+            messages.append(SupportMessage(
+                session_id=int(item["session_id"]),
+                sender=str(item["sender"])[:250],
+                message_text=item["message_text"],
+                from_user=True,
+            ))
+            stored.append(index)
+
+        try:
+            with transaction.atomic():
+                SupportMessage.objects.bulk_create(messages)
+        except Exception as e:
+            logger.error(f"Error creating {len(messages)} SupportMessages: {e}")
+            return Response({'error': 'Произошла ошибка при создании сообщений.'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        for index in stored:
+            results[index] = {'status': 'ok'}
+        logger.debug(f"Bulk support messages: {len(stored)} stored, {len(items) - len(stored)} rejected")
+        return Response({'results': results, 'stored': len(stored)}, status=status.HTTP_201_CREATED)
+
+
 class GetSupportMessagesView(APIView):
     def get(self, request, session_id):
         try:
@@ -390,6 +661,59 @@ class GetSupportMessagesView(APIView):
         return Response({'messages': message_data}, status=status.HTTP_200_OK)
 
 
+class SupportChangesView(APIView):
+    """
+    Лента ответов операторов для бота: GET /support/changes/?after=<cursor>&timeout=<сек>.
+    Возвращает только ответы с id больше after (по возрастанию id) и новый cursor.
+    Если новых ответов нет, запрос ждёт до timeout секунд (long-poll): его будит
+    сохранение ответа в этом процессе, а ответы из других процессов находятся
+    повторным запросом раз в poll_interval. Без after возвращает текущий cursor.
+    """
+    max_timeout = 30
+    poll_interval = 1.0
+    max_limit = 500
+
+    def get(self, request):
+        try:
+            timeout = min(max(float(request.query_params.get('timeout', 0)), 0), self.max_timeout)
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), self.max_limit)
+            after = request.query_params.get('after')
+            after = int(after) if after is not None else None
+        except ValueError:
+            return Response({'error': 'Неверные параметры запроса.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        replies = SupportMessage.objects.filter(from_user=False)
+        if after is None:
+            last_id = replies.order_by('-id').values_list('id', flat=True).first()
+            return Response({'messages': [], 'cursor': last_id or 0}, status=status.HTTP_200_OK)
+
+        query = replies.filter(id__gt=after).order_by('id').values(
+            'id', 'session_id', 'session__user__telegram_id', 'sender', 'message_text', 'timestamp'
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            seen_version = support_replies.version
+            rows = list(query[:limit])
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                break
+            support_replies.wait(seen_version, min(remaining, self.poll_interval))
+
+        messages = [
+            {
+                'id': row['id'],
+                'session_id': row['session_id'],
+                'telegram_id': row['session__user__telegram_id'],
+                'sender': row['sender'],
+                'message_text': row['message_text'],
+                'timestamp': row['timestamp'],
+            }
+            for row in rows
+        ]
+        cursor = messages[-1]['id'] if messages else after
+        return Response({'messages': messages, 'cursor': cursor}, status=status.HTTP_200_OK)
+
+
 class ClientCardListCreateView(APIView):
     def get(self, request):
         client_cards = ClientCard.objects.all()
@@ -424,14 +748,18 @@ class ClientCardView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class AdviceView(APIView):
+class AdviceView(CachedResponseMixin, APIView):
+    cache_models = (Advice,)
+
     def get(self, request):
         advice = Advice.objects.all()
         serializer = AdviceSerializer(advice, many=True)
         return Response({"advice": serializer.data}, status=status.HTTP_200_OK)
 
 
-class MaterialListAPIView(APIView):
+class MaterialListAPIView(CachedResponseMixin, APIView):
+    cache_models = (Material,)
+
     def get(self, request, format=None):
         material_type = request.query_params.get('material_type', None)
         if material_type:
@@ -442,7 +770,9 @@ class MaterialListAPIView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class MaterialDetailAPIView(APIView):
+class MaterialDetailAPIView(CachedResponseMixin, APIView):
+    cache_models = (Material,)
+
     def get(self, request, material_type, format=None):
         material = get_object_or_404(Material, material_type=material_type)
         serializer = MaterialSerializer(material, context={'request': request})
@@ -0,0 +1,258 @@
+# backend_client.py
+import asyncio
+import collections
+import logging
+import random
+import time
+
+import httpx
+
+from config import (
+    BACKEND_API_BASE_URL,
+    BACKEND_CONNECT_TIMEOUT,
+    BACKEND_TIMEOUT,
+    BACKEND_MAX_CONNECTIONS,
+    BACKEND_MAX_KEEPALIVE_CONNECTIONS,
+    BACKEND_ENDPOINT_TIMEOUTS,
+    BACKEND_GET_RETRIES,
+    BACKEND_RETRY_BACKOFF,
+    BACKEND_RETRY_BUDGET_RATIO,
+    BACKEND_BREAKER_FAILURE_THRESHOLD,
+    BACKEND_BREAKER_RECOVERY_TIMEOUT,
+    BACKEND_ETAG_CACHE_SIZE,
+)
+from instrumentation import record_backend_call
+from metrics import COLLECTORS, sample_lines
+from resilience import (
+    BackendUnavailable,
+    CircuitBreaker,
+    RetryBudget,
+    endpoint_name,
+    endpoint_timeout,
+    is_backend_failure,
+    is_retryable,
+)
+
+logger = logging.getLogger(__name__)
+
+# Единственный долгоживущий клиент с пулом keep-alive соединений.
+# Создаётся в Application.post_init и закрывается в post_shutdown.
+_client = None
+
+# Общие для всех запросов к бэкенду предохранитель и бюджет повторов
+breaker = CircuitBreaker(
+    "backend",
+    failure_threshold=BACKEND_BREAKER_FAILURE_THRESHOLD,
+    recovery_timeout=BACKEND_BREAKER_RECOVERY_TIMEOUT,
+)
+retry_budget = RetryBudget(ratio=BACKEND_RETRY_BUDGET_RATIO)
+
+
+class ValidatorCache:
+    """
+    ETag и тело последних 200-ответов GET (LRU на maxsize запросов). backend_get
+    шлёт с ними If-None-Match, и на 304 бэкенд не сериализует и не передаёт
+    ответ заново - хендлер получает сохранённый.
+    """
+
+    def __init__(self, maxsize: int = BACKEND_ETAG_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self.conditional_requests = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        COLLECTORS.append(self._collect)
+
+    @staticmethod
+    def key(path: str, params=None) -> tuple:
+        return path, tuple(sorted((str(name), str(value)) for name, value in (params or {}).items()))
+
+    def get(self, key: tuple):
+        """
+        Сохранённый (etag, тело, заголовки) или None. backend_get берёт его до отправки
+        запроса: к приходу 304 запись могут вытеснить параллельные запросы.
+        """
+        return self._entries.get(key)
+
+    def headers(self, entry) -> dict:
+        if entry is None:
+            return {}
+        self.conditional_requests += 1
+        return {"If-None-Match": entry[0]}
+
+    def not_modified_response(self, key: tuple, entry, response: httpx.Response) -> httpx.Response:
+        """
+        200-ответ из entry вместо 304; подтверждённая запись снова становится свежей в LRU.
+        """
+        self.not_modified += 1
+        self.bytes_saved += len(entry[1])
+        self._store(key, entry)
+        return httpx.Response(200, content=entry[1], headers=entry[2], request=response.request)
+
+    def update(self, key: tuple, response: httpx.Response) -> httpx.Response:
+        """
+        Запоминает ETag из 200-ответа.
+        """
+        etag = response.headers.get("ETag")
+        if response.status_code == 200 and etag:
+            self._store(key, (etag, response.content, response.headers))
+        return response
+
+    def _store(self, key: tuple, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _collect(self) -> list:
+        lines = sample_lines("bot_backend_conditional_requests_total", "GET requests sent with If-None-Match.",
+                             [({}, self.conditional_requests)], kind="counter")
+        lines += sample_lines("bot_backend_not_modified_total", "GET requests answered with 304 Not Modified.",
+                              [({}, self.not_modified)], kind="counter")
+        lines += sample_lines("bot_backend_not_modified_bytes_total", "Response bytes not transferred thanks to 304.",
+                              [({}, self.bytes_saved)], kind="counter")
+        lines += sample_lines("bot_backend_validators", "GET responses kept for conditional requests.",
+                              [({}, len(self._entries))])
+        return lines
+
+
+validators = ValidatorCache()
+
+
+def build_backend_client(base_url: str = BACKEND_API_BASE_URL, **kwargs) -> httpx.AsyncClient:
+    """
+    Создаёт AsyncClient с общими для всех хендлеров таймаутами и лимитами пула.
+    """
+    kwargs.setdefault("timeout", httpx.Timeout(BACKEND_TIMEOUT, connect=BACKEND_CONNECT_TIMEOUT))
+    kwargs.setdefault("limits", httpx.Limits(
+        max_connections=BACKEND_MAX_CONNECTIONS,
+        max_keepalive_connections=BACKEND_MAX_KEEPALIVE_CONNECTIONS,
+    ))
+    return httpx.AsyncClient(base_url=base_url, **kwargs)
+
+
+async def init_backend_client(application=None):
+    """
+    Хук Application.post_init: открывает общий клиент бэкенда.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_backend_client()
+        logger.info(f"Backend client initialised for {BACKEND_API_BASE_URL}")
+
+
+async def close_backend_client(application=None):
+    """
+    Хук Application.post_shutdown: закрывает пул соединений.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Backend client closed")
+
+
+def get_backend_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("Backend client is not initialised, call init_backend_client() first.")
+    return _client
+
+
+async def _send(method: str, path: str, timeout, **kwargs) -> httpx.Response:
+    """
+    Один запрос через предохранитель. Бросает httpx.HTTPStatusError для 4xx/5xx (и 3xx, кроме 304).
+    """
+    endpoint = endpoint_name(path)
+    try:
+        breaker.before_call()
+    except BackendUnavailable:
+        record_backend_call(endpoint, "rejected", 0.0)
+        raise
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await get_backend_client().request(method, path, timeout=timeout, **kwargs)
+        outcome = str(response.status_code)
+        # 304 - ответ на условный GET, его разворачивает ValidatorCache
+        if response.status_code != 304:
+            response.raise_for_status()
+    except Exception as e:
+        if is_backend_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except BaseException:
+        outcome = "cancelled"
+        breaker.release()
+        raise
+    finally:
+        record_backend_call(endpoint, outcome, time.perf_counter() - started)
+    breaker.record_success()
+    return response
+
+
+async def _send_retrying(method: str, path: str, timeout, **kwargs) -> httpx.Response:
+    """
+    _send() с повторами сетевых ошибок и 502/503/504 (не больше BACKEND_GET_RETRIES
+    раз и в пределах бюджета повторов). Только для идемпотентных запросов.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await _send(method, path, timeout, **kwargs)
+        except httpx.HTTPError as e:
+            if (attempt >= BACKEND_GET_RETRIES or not is_retryable(e) or breaker.state == CircuitBreaker.OPEN
+                    or not retry_budget.try_withdraw()):
+                raise
+            # Экспоненциальная пауза с полным разбросом, чтобы повторы не шли волной
+            delay = random.uniform(0, BACKEND_RETRY_BACKOFF * 2 ** attempt)
+            attempt += 1
+            logger.info(f"Retrying {method} {endpoint_name(path)} in {delay:.2f}s (attempt {attempt}): {e!r}")
+            await asyncio.sleep(delay)
+
+
+async def backend_get(path: str, params=None, timeout=None) -> httpx.Response:
+    """
+    GET-запрос к бэкенду. Путь задаётся относительно BACKEND_API_BASE_URL, например "/profile/1/".
+    Бросает httpx.HTTPStatusError для ответов 4xx/5xx и BackendUnavailable, если
+    предохранитель разомкнут. GET идемпотентен, поэтому сетевые ошибки и 502/503/504
+    повторяются (не больше BACKEND_GET_RETRIES раз и в пределах бюджета повторов).
+
+    Запрос условный: с If-None-Match из прошлого ответа, а 304 возвращается как
+    сохранённый 200-ответ.
+    """
+    if timeout is None:
+        timeout = endpoint_timeout(path, BACKEND_ENDPOINT_TIMEOUTS, BACKEND_TIMEOUT)
+    retry_budget.record_request()
+    key = validators.key(path, params)
+    entry = validators.get(key)
+    response = await _send_retrying("GET", path, timeout, params=params, headers=validators.headers(entry))
+    if response.status_code == 304:
+        if entry is not None:
+            return validators.not_modified_response(key, entry, response)
+        # 304 без сохранённого ответа: тело взять неоткуда, один раз просим полный ответ
+        response = await _send_retrying("GET", path, timeout, params=params)
+        if response.status_code == 304:
+            raise httpx.HTTPStatusError("Unexpected 304 for an unconditional request",
+                                        request=response.request, response=response)
+    return validators.update(key, response)
+
+
+async def backend_post(path: str, json=None, timeout=None, idempotent: bool = False) -> httpx.Response:
+    """
+    POST-запрос к бэкенду с JSON-телом. По умолчанию не повторяется: запрос может быть
+    неидемпотентным. idempotent=True - для эндпоинтов, которые повтор с тем же
+    transaction_id отдают из сохранённого ответа (make-payment, gift-subscription):
+    такие повторяются как GET. Бросает httpx.HTTPStatusError для ответов 4xx/5xx и
+    BackendUnavailable, если предохранитель разомкнут.
+    """
+    if timeout is None:
+        timeout = endpoint_timeout(path, BACKEND_ENDPOINT_TIMEOUTS, BACKEND_TIMEOUT)
+    retry_budget.record_request()
+    if idempotent:
+        return await _send_retrying("POST", path, timeout, json=json)
+    return await _send("POST", path, timeout, json=json)
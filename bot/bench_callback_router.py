@@ -0,0 +1,145 @@
+# bench_callback_router.py
+"""
+Стоимость выбора хендлера для одного нажатия кнопки.
+
+1. Синтетика: N кнопок как N отдельных CallbackQueryHandler с регулярками
+   (Application проверяет их по очереди до первого совпадения) и как один
+   CallbackRouter. Нажатия равномерно распределены по кнопкам.
+2. Хендлеры бота (main.build_application): текущий список с CallbackRouter и
+   тот же список, где роутер заменён отдельными CallbackQueryHandler, как было
+   раньше (по хендлеру на каждую кнопку чатбота).
+
+Проверяет, что роутер выбирает тот же колбэк, что и регулярки.
+
+Запуск (из папки bot/):
+    python bench_callback_router.py --updates 20000 --buttons 10,100,1000
+"""
+import argparse
+import random
+import time
+import warnings
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler
+from telegram.warnings import PTBUserWarning
+
+from callback_router import CallbackRouter
+
+USER = {"id": 100001, "is_bot": False, "first_name": "Test"}
+CHAT = {"id": 100001, "type": "private"}
+
+
+def callback_update(data: str) -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "callback_query": {
+            "id": "1",
+            "from": USER,
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 1, "date": 0, "chat": CHAT, "text": "menu"},
+        },
+    }, None)
+
+
+def make_callback(name: str):
+    async def callback(update, context):
+        return name
+    callback.__name__ = name
+    return callback
+
+
+def dispatch(handlers: list, update: Update):
+    """
+    Первый хендлер, принявший обновление, как в Application.process_update.
+    """
+    for handler in handlers:
+        check = handler.check_update(update)
+        if check is not None and check is not False:
+            return handler, check
+    return None, None
+
+
+def matched_callback(handler, check):
+    if isinstance(handler, CallbackRouter):
+        return check[0]
+    return handler.callback
+
+
+def measure(handlers: list, updates: list) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        dispatch(handlers, update)
+    return (time.perf_counter() - started) / len(updates) * 1e6
+
+
+def bench_synthetic(buttons: int, total: int):
+    callbacks = [make_callback(f"button_{i}") for i in range(buttons)]
+    regex_handlers = [CallbackQueryHandler(callback, pattern=f"^button_{i}$") for i, callback in enumerate(callbacks)]
+    router = CallbackRouter()
+    for i, callback in enumerate(callbacks):
+        router.route(f"button_{i}", callback)
+
+    rnd = random.Random(buttons)
+    updates = [callback_update(f"button_{rnd.randrange(buttons)}") for _ in range(total)]
+    for update in updates[:200]:
+        assert matched_callback(*dispatch(regex_handlers, update)) is matched_callback(*dispatch([router], update))
+
+    regex = measure(regex_handlers, updates)
+    routed = measure([router], updates)
+    print(f"    {buttons:>6} buttons: regex handlers={regex:8.2f}µs  router={routed:6.2f}µs  (x{regex / routed:.0f})")
+    return regex, routed
+
+
+def legacy_handlers(handlers: list) -> list:
+    """
+    Тот же список хендлеров, но вместо CallbackRouter - по CallbackQueryHandler на кнопку.
+    """
+    from keyboards import CHATBOTS
+
+    result = []
+    for handler in handlers:
+        if not isinstance(handler, CallbackRouter):
+            result.append(handler)
+            continue
+        for data, callback in handler._routes.items():
+            result.append(CallbackQueryHandler(callback, pattern=f"^{data}$"))
+        for namespace, callback in handler._prefixes.items():
+            for key in CHATBOTS:
+                result.append(CallbackQueryHandler(callback, pattern=f"^{namespace}_{key}$"))
+    return result
+
+
+def bench_application(total: int):
+    import main
+
+    application = main.build_application()
+    current = application.handlers[0]
+    legacy = legacy_handlers(current)
+    cases = ["chatbot_narrativniya_terapiya", "chatbot_kpt", "my_account", "go_back_to_menu", "chatbots"]
+    print(f"bot handlers ({len(legacy)} with one handler per button -> {len(current)} with the router), µs per update:")
+    for data in cases:
+        updates = [callback_update(data) for _ in range(total // len(cases))]
+        assert matched_callback(*dispatch(legacy, updates[0])) is matched_callback(*dispatch(current, updates[0]))
+        before = measure(legacy, updates)
+        after = measure(current, updates)
+        print(f"    {data:<32} before={before:7.2f}  after={after:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--buttons", default="10,100,1000")
+    args = parser.parse_args()
+
+    print("dispatch cost per update:")
+    results = [bench_synthetic(int(n), args.updates) for n in args.buttons.split(",")]
+    # Стоимость роутера не должна расти вместе с числом кнопок
+    assert results[-1][1] < results[0][1] * 3, "router dispatch cost grows with the number of buttons"
+
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    bench_application(args.updates)
+
+
+if __name__ == "__main__":
+    main()
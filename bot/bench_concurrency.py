@@ -0,0 +1,115 @@
+# bench_concurrency.py
+"""
+Стресс-тест PerChatUpdateProcessor: тысячи симулированных пользователей
+присылают по несколько обновлений вперемешку, обработчик "ходит в бэкенд"
+(asyncio.sleep со случайной длительностью). Проверяет, что обновления каждого
+пользователя обработаны строго по порядку, и показывает, как растёт пропускная
+способность с лимитом параллельности.
+
+Очередь и цикл выборки повторяют Application: обновление забирается из
+InFlightBoundedQueue, для него создаётся задача, по завершении - task_done().
+
+Запуск (из папки bot/):
+    python bench_concurrency.py --users 2000 --per-user 3 --limits 1,8,64,256
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from telegram import Update
+
+from update_processor import PerChatUpdateProcessor, InFlightBoundedQueue
+
+QUEUE_LIMIT = 1000
+
+
+def make_updates(users: int, per_user: int, seed: int = 1) -> list:
+    """
+    Обновления всех пользователей вперемешку, но для каждого пользователя по порядку.
+    """
+    rnd = random.Random(seed)
+    pending = {user_id: 0 for user_id in range(1, users + 1)}
+    updates = []
+    update_id = 0
+    while pending:
+        user_id = rnd.choice(list(pending))
+        seq = pending[user_id]
+        update_id += 1
+        updates.append(Update.de_json({
+            "update_id": update_id,
+            "message": {
+                "message_id": seq,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "text": str(seq),
+            },
+        }, None))
+        if seq + 1 == per_user:
+            del pending[user_id]
+        else:
+            pending[user_id] = seq + 1
+    return updates
+
+
+async def run(updates: list, limit: int, latency: float) -> tuple:
+    processor = PerChatUpdateProcessor(limit, QUEUE_LIMIT)
+    queue = InFlightBoundedQueue(QUEUE_LIMIT)
+    seen = {}
+    violations = [0]
+    rnd = random.Random(limit)
+
+    async def handler(update: Update):
+        await asyncio.sleep(latency * rnd.uniform(0.2, 1.8))
+        user_id = update.effective_user.id
+        seq = int(update.message.text)
+        if seen.get(user_id, -1) != seq - 1:
+            violations[0] += 1
+        seen[user_id] = seq
+
+    async def process(update):
+        try:
+            await processor.process_update(update, handler(update))
+        finally:
+            queue.task_done()
+
+    async def fetcher():
+        while True:
+            update = await queue.get()
+            asyncio.create_task(process(update))
+
+    fetch_task = asyncio.create_task(fetcher())
+    started = time.perf_counter()
+    for update in updates:
+        await queue.put(update)
+    await queue.join()
+    elapsed = time.perf_counter() - started
+    fetch_task.cancel()
+    return elapsed, violations[0], processor.active_chats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--per-user", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.002, help="средняя длительность обработчика, сек")
+    parser.add_argument("--limits", default="1,8,64,256")
+    args = parser.parse_args()
+
+    updates = make_updates(args.users, args.per_user)
+    baseline = None
+    for limit in (int(x) for x in args.limits.split(",")):
+        elapsed, violations, leaked = asyncio.run(run(updates, limit, args.latency))
+        rate = len(updates) / elapsed
+        baseline = baseline or rate
+        print(
+            f"limit={limit:>4}: {len(updates)} updates from {args.users} users in {elapsed:.2f}s "
+            f"-> {rate:,.0f} updates/s (x{rate / baseline:.1f}), ordering violations={violations}"
+        )
+        assert violations == 0, "per-user ordering violated"
+        assert leaked == 0, "per-chat locks were not released"
+
+
+if __name__ == "__main__":
+    main()
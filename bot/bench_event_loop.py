@@ -0,0 +1,123 @@
+# bench_event_loop.py
+"""
+Сравнивает задержку event loop при N одновременных пользователях:
+
+  blocking - старый вариант, синхронный requests.get внутри async def;
+  pooled   - общий httpx.AsyncClient из backend_client.
+
+Запуск (из папки bot/):
+    python bench_event_loop.py --users 200 --delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import backend_client
+
+
+def start_stub_backend(delay: float) -> ThreadingHTTPServer:
+    """
+    Локальный бэкенд-заглушка: отвечает JSON после искусственной задержки.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps({"consent_given": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: list, interval: float = 0.01):
+    """
+    Тикер: насколько позже запланированного просыпается корутина.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+async def blocking_user(base_url: str, user_id: int):
+    import requests  # Старый вариант, только для сравнения
+    response = requests.get(f"{base_url}/consent-status/{user_id}/")
+    response.raise_for_status()
+    return response.json()
+
+
+async def pooled_user(base_url: str, user_id: int):
+    response = await backend_client.backend_get(f"/consent-status/{user_id}/")
+    return response.json()
+
+
+async def run_mode(mode: str, base_url: str, users: int) -> dict:
+    if mode == "pooled":
+        backend_client._client = backend_client.build_backend_client(base_url)
+    user_coro = pooled_user if mode == "pooled" else blocking_user
+
+    stop = asyncio.Event()
+    samples = []
+    ticker = asyncio.create_task(measure_loop_lag(stop, samples))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_coro(base_url, i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    if mode == "pooled":
+        await backend_client.close_backend_client()
+
+    samples.sort()
+    return {
+        "mode": mode,
+        "wall_s": elapsed,
+        "lag_p50_ms": statistics.median(samples) * 1000,
+        "lag_p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000 if len(samples) > 1 else samples[-1] * 1000,
+        "lag_max_ms": samples[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="число одновременных пользователей")
+    parser.add_argument("--delay", type=float, default=0.05, help="задержка ответа бэкенда, сек")
+    args = parser.parse_args()
+
+    server = start_stub_backend(args.delay)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for mode in ("blocking", "pooled"):
+            result = asyncio.run(run_mode(mode, base_url, args.users))
+            print(
+                f"{result['mode']:>8}: users={args.users} wall={result['wall_s']:.2f}s "
+                f"loop lag p50={result['lag_p50_ms']:.1f}ms p99={result['lag_p99_ms']:.1f}ms "
+                f"max={result['lag_max_ms']:.1f}ms"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
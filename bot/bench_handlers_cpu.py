@@ -0,0 +1,155 @@
+# bench_handlers_cpu.py
+"""
+Микро-бенчмарк процессорного времени обработчиков на одно обновление.
+
+1. Сборка клавиатур: как раньше (InlineKeyboardButton/InlineKeyboardMarkup
+   заново на каждый вызов) и готовые объекты из keyboards.py.
+2. Полный вызов обработчиков меню на callback-обновлении. Сеть заменена
+   запросом, который сразу возвращает готовый ответ, поэтому время - это
+   только работа обработчика и сериализация запроса в python-telegram-bot.
+
+Запуск (из папки bot/):
+    python bench_handlers_cpu.py --iterations 2000
+"""
+import argparse
+import asyncio
+import copy
+import json
+import time
+from types import SimpleNamespace
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest
+
+import catalogue
+import keyboards
+from fake_bot_api import BOT_USER
+from other_handlers import chatbots_menu, go_back_to_menu, show_materials_menu, support_faq
+from subscription_handler import select_subscription_plan, show_subscription_plans
+
+TOKEN = "123456:BENCH"
+USER = {"id": 100001, "is_bot": False, "first_name": "Test", "username": "test_user"}
+CHAT = {"id": 100001, "first_name": "Test", "username": "test_user", "type": "private"}
+PLANS = [{"id": i, "name": f"План {i}", "price": 10000 * i, "duration_days": 30 * i} for i in range(1, 6)]
+METHODS = [{"id": i, "name": f"Способ {i}"} for i in range(1, 4)]
+
+
+class InstantRequest(BaseRequest):
+    """
+    Отвечает на любой метод Bot API без сети.
+    """
+
+    def __init__(self):
+        message = {"message_id": 1, "date": 0, "chat": CHAT, "from": BOT_USER, "text": ""}
+        self._message = json.dumps({"ok": True, "result": message}).encode()
+        self._true = json.dumps({"ok": True, "result": True}).encode()
+        self._me = json.dumps({"ok": True, "result": BOT_USER}).encode()
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        if endpoint == "getMe":
+            return 200, self._me
+        if endpoint == "answerCallbackQuery":
+            return 200, self._true
+        return 200, self._message
+
+
+def callback_update(data: str) -> dict:
+    return {
+        "update_id": 1,
+        "callback_query": {
+            "id": "1",
+            "from": USER,
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 1, "date": 0, "chat": CHAT, "from": BOT_USER, "text": "menu"},
+        },
+    }
+
+
+def rebuild(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    """
+    Сборка клавиатуры заново, как это делали обработчики до keyboards.py.
+    """
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(button.text, callback_data=button.callback_data) for button in row]
+         for row in markup.inline_keyboard]
+    )
+
+
+def bench_keyboards(iterations: int):
+    print("keyboard construction, µs per call:")
+    for name in ("MAIN_MENU_KEYBOARD", "SUPPORT_FAQ_KEYBOARD", "MATERIALS_MENU_KEYBOARD", "CHATBOTS_MENU_KEYBOARD"):
+        markup = getattr(keyboards, name)
+        started = time.process_time()
+        for _ in range(iterations):
+            rebuild(markup)
+        rebuilt = (time.process_time() - started) / iterations * 1e6
+
+        started = time.process_time()
+        for _ in range(iterations):
+            getattr(keyboards, name)
+        prebuilt = (time.process_time() - started) / iterations * 1e6
+        print(f"    {name:<24} rebuilt={rebuilt:8.1f}  prebuilt={prebuilt:6.2f}")
+
+    started = time.process_time()
+    for _ in range(iterations):
+        keyboards.catalogue_keyboard(PLANS, "select_plan_", "go_back_to_menu")
+    memoized = (time.process_time() - started) / iterations * 1e6
+    started = time.process_time()
+    for _ in range(iterations):
+        keyboards.catalogue_keyboard(list(PLANS), "select_plan_", "go_back_to_menu")
+    new_version = (time.process_time() - started) / iterations * 1e6
+    print(f"    {'catalogue_keyboard':<24} rebuilt={new_version:8.1f}  prebuilt={memoized:6.2f}")
+
+
+async def bench_handlers(iterations: int):
+    bot = ExtBot(TOKEN, request=InstantRequest(), get_updates_request=InstantRequest())
+    await bot.initialize()
+    catalogue.catalogue_cache.set("subscription-plans", PLANS, ttl=3600)
+    catalogue.catalogue_cache.set("payment-methods", METHODS, ttl=3600)
+
+    cases = [
+        ("go_back_to_menu", go_back_to_menu, "go_back_to_menu"),
+        ("support_faq", support_faq, "support"),
+        ("show_materials_menu", show_materials_menu, "materials"),
+        ("chatbots_menu", chatbots_menu, "chatbots"),
+        ("show_subscription_plans", show_subscription_plans, "select_plan"),
+        ("select_subscription_plan", select_subscription_plan, "select_plan_1"),
+    ]
+    print("handler CPU time per update, µs:")
+    for name, handler, data in cases:
+        raw = callback_update(data)
+        updates = [Update.de_json(copy.deepcopy(raw), bot) for _ in range(iterations)]
+        context = SimpleNamespace(bot=bot, user_data={}, chat_data={})
+        started = time.process_time()
+        for update in updates:
+            await handler(update, context)
+        elapsed = (time.process_time() - started) / iterations * 1e6
+        print(f"    {name:<26} {elapsed:8.1f}")
+    await bot.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    bench_keyboards(args.iterations)
+    asyncio.run(bench_handlers(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
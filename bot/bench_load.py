@@ -0,0 +1,374 @@
+# bench_load.py
+"""
+Нагрузочный прогон бота без настоящего Telegram: тысячи симулированных
+пользователей проходят реальные сценарии, бот (main.build_application) ходит
+в локальный Django-бэкенд, а вместо api.telegram.org работает FakeBotAPI.
+
+Сценарии каждого пользователя:
+  onboarding - /start -> "Начать" (регистрация) -> согласие -> меню подписки;
+  payment    - план -> способ оплаты -> номер карты -> главное меню;
+  card       - заполнение карты клиента (имя, возраст, цели, трудности);
+  support    - сессия поддержки -> FAQ -> сообщение в поддержку;
+  materials  - меню материалов -> методичка (отправка документа);
+  gift       - подарок подписки -> username получателя -> кнопки планов -> главное меню.
+
+Пользователь отправляет обновление (push_update) и ждёт, пока бот пришлёт или
+отредактирует сообщение с ожидаемой кнопкой или текстом. Время от постановки
+обновления до этого ответа - задержка обновления; по ней считаются p50/p99
+по каждому шагу и в целом, а также пропускная способность (обновлений в секунду).
+Ответ с "❌" или "Произошла ошибка" считается ошибкой шага.
+
+Перед прогоном запустите бэкенд и заполните справочники:
+    python manage.py seed_loadtest
+    python manage.py runserver
+
+Запуск (из папки bot/):
+    python bench_load.py --users 2000 --concurrency 200
+    python bench_load.py --users 500 --mode webhook --api-latency 0.05 --real-limits
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+import warnings
+
+import httpx
+from telegram.warnings import PTBUserWarning
+
+from fake_bot_api import BOT_USER, FakeBotAPI
+
+logger = logging.getLogger(__name__)
+
+FLOWS = ("payment", "card", "support", "materials", "gift")
+WEBHOOK_URL = "http://bot.local/telegram/webhook"
+WEBHOOK_SECRET = "load-secret"
+# Так начинаются сообщения бота об ошибке
+ERROR_MARKERS = ("❌", "Произошла ошибка")
+
+
+class StepFailed(Exception):
+    def __init__(self, reason: str, label: str = None):
+        super().__init__(reason)
+        self.label = label
+
+
+def expect_button(*prefixes):
+    """
+    Сообщение с кнопкой, callback_data которой начинается с одного из префиксов.
+    """
+    def predicate(message: dict) -> bool:
+        return any(data.startswith(prefixes) for data in buttons(message))
+    return predicate
+
+
+def expect_text(fragment: str):
+    def predicate(message: dict) -> bool:
+        return fragment in (message.get("text") or message.get("caption") or "")
+    return predicate
+
+
+def buttons(message: dict) -> list:
+    markup = message.get("reply_markup") or {}
+    return [button.get("callback_data", "") for row in markup.get("inline_keyboard", []) for button in row]
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.completed_users = 0
+
+    def report(self, elapsed: float):
+        total = [latency for values in self.latencies.values() for latency in values]
+        print(f"{'step':<24} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for label in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies[label]
+            print(f"{label:<24} {len(values):>7} {percentile(values, 50) * 1000:>9.1f} "
+                  f"{percentile(values, 99) * 1000:>9.1f} {self.errors[label]:>7}")
+        print(f"{'all updates':<24} {len(total):>7} {percentile(total, 50) * 1000:>9.1f} "
+              f"{percentile(total, 99) * 1000:>9.1f} {sum(self.errors.values()):>7}")
+        print(f"throughput: {len(total) / elapsed:,.1f} updates/s over {elapsed:.1f}s, "
+              f"users finished: {self.completed_users}")
+
+
+class ScriptedUser:
+    """
+    Один пользователь: видит сообщения бота в своём чате и нажимает кнопки.
+    """
+
+    _callback_ids = itertools.count(1)
+
+    def __init__(self, user_id: int, fake: FakeBotAPI, stats: LoadStats, step_timeout: float):
+        self.user = {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load_{user_id}"}
+        self.chat = {"id": user_id, "first_name": "Load", "username": f"load_{user_id}", "type": "private"}
+        self.fake = fake
+        self.stats = stats
+        self.step_timeout = step_timeout
+        self.messages = {}
+        self._message_ids = itertools.count(1)
+        self._waiter = None
+
+    # -------------------------------
+    # Сообщения бота
+    # -------------------------------
+
+    def on_message(self, method: str, message: dict):
+        self.messages[message["message_id"]] = message
+        if self._waiter is None or self._waiter[1].done():
+            return
+        predicate, future = self._waiter
+        text = message.get("text") or message.get("caption") or ""
+        if predicate(message):
+            future.set_result(time.perf_counter())
+        elif text.startswith(ERROR_MARKERS):
+            future.set_exception(StepFailed(text))
+
+    def keyboard_message(self) -> dict:
+        """
+        Последнее сообщение бота с inline-клавиатурой - на нём пользователь нажимает кнопки.
+        """
+        for message_id in sorted(self.messages, reverse=True):
+            if buttons(self.messages[message_id]):
+                return self.messages[message_id]
+        raise StepFailed("no keyboard to click")
+
+    def button(self, prefix: str) -> str:
+        for data in buttons(self.keyboard_message()):
+            if data.startswith(prefix):
+                return data
+        raise StepFailed(f"no button {prefix!r}")
+
+    # -------------------------------
+    # Действия пользователя
+    # -------------------------------
+
+    async def _step(self, label: str, update: dict, predicate):
+        future = asyncio.get_running_loop().create_future()
+        self._waiter = (predicate, future)
+        started = time.perf_counter()
+        self.fake.push_update(update)
+        try:
+            finished = await asyncio.wait_for(future, self.step_timeout)
+        except asyncio.TimeoutError:
+            raise StepFailed(f"no answer in {self.step_timeout}s", label)
+        except StepFailed as e:
+            raise StepFailed(str(e), label)
+        finally:
+            self._waiter = None
+        self.stats.latencies[label].append(finished - started)
+
+    async def send_text(self, label: str, text: str, predicate):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": self.user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        await self._step(label, {"message": message}, predicate)
+
+    async def click(self, label: str, data: str, predicate):
+        message = self.keyboard_message()
+        callback_query = {
+            "id": str(next(self._callback_ids)),
+            "from": self.user,
+            "chat_instance": str(self.chat["id"]),
+            "data": data,
+            "message": {
+                "message_id": message["message_id"],
+                "date": message["date"],
+                "chat": self.chat,
+                "from": BOT_USER,
+                "text": message.get("text", ""),
+                "reply_markup": message.get("reply_markup"),
+            },
+        }
+        await self._step(label, {"callback_query": callback_query}, predicate)
+
+    # -------------------------------
+    # Сценарии
+    # -------------------------------
+
+    async def onboarding(self):
+        await self.send_text("start", "/start", expect_button("register"))
+        # Повторный прогон: согласие уже дано, и бот сразу показывает меню подписки
+        await self.click("register", "register", expect_button("accept_user_agreement", "select_plan"))
+        if "accept_user_agreement" in buttons(self.keyboard_message()):
+            await self.click("consent", "accept_user_agreement", expect_button("select_plan"))
+
+    async def payment(self):
+        await self.click("plans", "select_plan", expect_button("select_plan_"))
+        await self.click("select_plan", self.button("select_plan_"), expect_button("select_method_"))
+        await self.click("select_method", self.button("select_method_"), expect_button("go_back_to_methods"))
+        # Номер карты уходит в transaction_id, который должен быть уникальным
+        card_number = str(random.randint(10 ** 15, 10 ** 16 - 1))
+        await self.send_text("pay", card_number, expect_button("fill_card"))
+
+    async def card(self):
+        await self.click("card_start", "fill_card", expect_text("введите ваше имя"))
+        await self.send_text("card_name", "Нагрузка", expect_text("возраст"))
+        await self.send_text("card_age", "30", expect_text("цели"))
+        await self.send_text("card_goals", "Проверить бота под нагрузкой", expect_text("трудности"))
+        await self.send_text("card_challenges", "Много пользователей", expect_button("fill_card"))
+
+    async def support(self):
+        await self.click("support", "support", expect_button("send_support_message"))
+        await self.click("faq_answer", "faq_0", expect_button("show_faq"))
+        await self.click("support_prompt", "send_support_message", expect_text("сообщение в поддержку"))
+        await self.send_text("support_message", "Вопрос от нагрузочного теста", expect_text("успешно отправлено"))
+        await self.click("support_exit", "go_back_to_menu", expect_button("fill_card"))
+
+    async def materials(self):
+        await self.click("materials", "materials", expect_button("material_"))
+        await self.click("material", "material_methodichka", expect_button("fill_card"))
+
+    async def gift(self):
+        await self.click("gift", "gift_subscription", expect_text("введите username"))
+        # После username бот показывает планы для подарка, иначе сценарий дальше не пройти
+        await self.send_text("gift_recipient", f"@{self.user['username']}", expect_button("select_gift_plan_"))
+        await self.click("gift_exit", "go_back_to_menu", expect_button("fill_card"))
+
+    async def run(self, flows: list, think_time: float):
+        flow = "onboarding"
+        try:
+            await self.onboarding()
+            for flow in flows:
+                if think_time:
+                    await asyncio.sleep(random.uniform(0, 2 * think_time))
+                await getattr(self, flow)()
+            self.stats.completed_users += 1
+        except StepFailed as e:
+            self.stats.errors[e.label or flow] += 1
+            logger.debug(f"User {self.user['id']} failed at {e.label or flow}: {e}")
+
+
+async def check_backend(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        for path, params in (("/subscription-plans/", None), ("/payment-methods/", None),
+                             ("/materials/", {"material_type": "methodichka"})):
+            response = await client.get(path, params=params)
+            response.raise_for_status()
+            if not response.json():
+                raise SystemExit(f"{base_url}{path} is empty: run `python manage.py seed_loadtest` first")
+
+
+async def run(args):
+    # main и config читают настройки при импорте, поэтому импортируются после настройки окружения
+    import main
+
+    await check_backend(os.environ["BACKEND_API_BASE_URL"])
+
+    limits = (30, 4) if args.real_limits else (10 ** 9, 10 ** 9)
+    fake = FakeBotAPI(global_per_second=limits[0], chat_per_second=limits[1], latency=args.api_latency,
+                      keep_sent=False)
+    application = main.build_application(
+        request=fake.request(main.InstrumentedHTTPXRequest),
+        get_updates_request=fake.request(connection_pool_size=1),
+    )
+    webhook_app = None
+    if args.mode == "webhook":
+        from webhook import WebhookApp
+        webhook_app = WebhookApp(application, secret_token=WEBHOOK_SECRET, path="/telegram/webhook",
+                                 webhook_url=WEBHOOK_URL)
+        fake.webhook_transport = httpx.ASGITransport(app=webhook_app)
+        await webhook_app.startup()
+    else:
+        await application.initialize()
+        await main.post_init(application)
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+        await application.start()
+
+    stats = LoadStats()
+    users = {}
+    fake.message_listeners.append(lambda method, message: users[message["chat"]["id"]].on_message(method, message))
+    flows = [flow for flow in args.flows.split(",") if flow]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_user(user_id: int):
+        async with semaphore:
+            user = users[user_id] = ScriptedUser(user_id, fake, stats, args.step_timeout)
+            await user.run(flows, args.think_time)
+            del users[user_id]
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_user(args.first_user_id + i) for i in range(args.users)))
+    finally:
+        elapsed = time.perf_counter() - started
+        if webhook_app is not None:
+            await webhook_app.shutdown()
+        else:
+            await application.updater.stop()
+            await application.stop()
+            await application.shutdown()
+            await main.post_shutdown(application)
+        await fake.close()
+
+    print(f"mode={args.mode} users={args.users} concurrency={args.concurrency} flows={','.join(flows)} "
+          f"api latency={args.api_latency * 1000:.0f}ms limits={'telegram' if args.real_limits else 'off'}")
+    stats.report(elapsed)
+    print(f"Bot API calls: {dict(fake.calls.most_common())}, 429 answers: {fake.rejected}")
+    if args.mode == "webhook":
+        print(f"webhook deliveries: {fake.webhook_deliveries}, redeliveries: {fake.webhook_redeliveries}")
+
+    failed = args.users - stats.completed_users
+    assert failed <= args.max_error_rate * args.users, f"{failed} of {args.users} users did not finish"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200, help="сколько пользователей активны одновременно")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="сценарии после onboarding, через запятую")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--backend", default=os.environ.get("BACKEND_API_BASE_URL", "http://localhost:8000/blog"))
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, сек")
+    parser.add_argument("--real-limits", action="store_true",
+                        help="лимиты Telegram (30 сообщений/с на бота) в боте и в FakeBotAPI")
+    parser.add_argument("--think-time", type=float, default=0.0, help="средняя пауза между сценариями, сек")
+    parser.add_argument("--step-timeout", type=float, default=30.0)
+    parser.add_argument("--first-user-id", type=int, default=None, help="telegram_id первого пользователя")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--metrics-port", type=int, default=0, help="порт /metrics бота во время прогона")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    for flow in args.flows.split(","):
+        if flow and flow not in FLOWS:
+            parser.error(f"unknown flow {flow!r}, expected one of {', '.join(FLOWS)}")
+    if args.first_user_id is None:
+        # Новые пользователи при каждом прогоне, чтобы onboarding шёл через регистрацию
+        args.first_user_id = random.randint(10 ** 8, 10 ** 9)
+
+    os.environ["BACKEND_API_BASE_URL"] = args.backend
+    os.environ["METRICS_PORT"] = str(args.metrics_port)
+    data_dir = tempfile.mkdtemp()
+    os.environ.setdefault("FILE_ID_DB_PATH", os.path.join(data_dir, "file_ids.sqlite3"))
+    os.environ.setdefault("SUPPORT_FEED_CURSOR_PATH", os.path.join(data_dir, "support_feed_cursor"))
+    os.environ.setdefault("BOT_STATE_DB_PATH", os.path.join(data_dir, "bot_state.sqlite3"))
+    if not args.real_limits:
+        for name in ("RATE_LIMIT_GLOBAL_PER_SECOND", "RATE_LIMIT_GLOBAL_BURST",
+                     "RATE_LIMIT_CHAT_PER_SECOND", "RATE_LIMIT_CHAT_BURST"):
+            os.environ[name] = "1000000"
+
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    import main as bot_main  # noqa: F401 - настраивает logging.basicConfig
+    logging.getLogger().setLevel(args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
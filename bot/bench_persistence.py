@@ -0,0 +1,266 @@
+# bench_persistence.py
+"""
+Запуск бота и запись состояния при --conversations сохранённых незавершённых
+разговорах: SQLitePersistence (ленивая подгрузка, отложенная запись пачками)
+против PicklePersistence из python-telegram-bot (весь файл читается при запуске
+и переписывается целиком при каждом изменении).
+
+1. В базу и в pickle-файл пишутся пользователи посреди карты клиента, оплаты
+   подписки и пополнения баланса.
+2. Запуск: Application.initialize() с каждой из persistence.
+3. --active пользователей делают следующий шаг и открывают меню (user_data не
+   меняется); раз в --batch обновлений состояние сбрасывается на диск, как по
+   update_interval. Выводятся строки и байты (wchar из /proc/self/io) на обновление.
+4. Перезапуск: те же пользователи продолжают с места, где остановились, - шаг,
+   сделанный до перезапуска, не потерян.
+
+Запуск (из папки bot/):
+    python bench_persistence.py --conversations 100000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import time
+import warnings
+
+USER_ID_BASE = 10 ** 8
+
+
+def written_bytes() -> int:
+    with open("/proc/self/io") as io:
+        for line in io:
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    return 0
+
+
+def stored_state(n: int):
+    """
+    (user_data, имя разговора, состояние) n-го сохранённого пользователя.
+    """
+    from client_card_handler import FILL_CARD_AGE
+    from other_handlers import RECHARGE_ENTER_AMOUNT
+    from subscription_handler import ENTER_PAYMENT_DETAILS
+
+    flow = n % 3
+    if flow == 0:
+        return {"client_card_name": f"Имя {n}"}, "client_card", FILL_CARD_AGE
+    if flow == 1:
+        return {"payment_method": 1}, "recharge_balance", RECHARGE_ENTER_AMOUNT
+    return {"selected_plan_id": 1, "selected_method_id": 2}, "subscription", ENTER_PAYMENT_DETAILS
+
+
+def seed(total: int, sqlite_path: str, pickle_path: str):
+    from telegram.ext import PicklePersistence, PersistenceInput
+    from persistence import SQLitePersistence, _encode_key, _dump
+
+    store = SQLitePersistence(sqlite_path)
+    users, conversations = {}, {}
+    for n in range(total):
+        user_id = USER_ID_BASE + n
+        data, name, state = stored_state(n)
+        users[user_id] = _dump(data)
+        conversations[user_id] = {(name, _encode_key((user_id, user_id))): _dump(state)}
+        if len(users) == 10_000:
+            store._write(users, conversations)
+            users, conversations = {}, {}
+    store._write(users, conversations)
+    store._connection.close()
+
+    pickled = PicklePersistence(pickle_path, store_data=PersistenceInput(bot_data=False, chat_data=False,
+                                                                          callback_data=False), on_flush=True)
+    pickled.user_data = {}
+    pickled.conversations = {}
+    for n in range(total):
+        user_id = USER_ID_BASE + n
+        data, name, state = stored_state(n)
+        pickled.user_data[user_id] = data
+        pickled.conversations.setdefault(name, {})[(user_id, user_id)] = state
+    pickled._dump_singlefile()
+    return os.path.getsize(sqlite_path), os.path.getsize(pickle_path)
+
+
+def next_step(n: int, phase: int):
+    """
+    Текст следующего шага n-го пользователя (phase 0 - до перезапуска, 1 - после).
+    """
+    if n % 3 == 0:
+        return ("34", "Мало времени")[phase]
+    return ("50000", f"tx-{n}")[phase]
+
+
+def forget_memory(application):
+    """
+    Хендлеры - объекты модулей и переживают Application; настоящий перезапуск
+    начинается с пустыми разговорами и без учёта активности.
+    """
+    import main
+    from telegram.ext import ConversationHandler
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                handler._conversations.clear()
+    main.user_state_janitor._last_seen.clear()
+
+
+async def start(persistence):
+    import main
+    from bench_handlers_cpu import InstantRequest
+
+    application = main.build_application(request=InstantRequest(), get_updates_request=InstantRequest(),
+                                         persistence=persistence)
+    started = time.perf_counter()
+    await application.initialize()
+    return application, time.perf_counter() - started
+
+
+async def drive(application, persistence, active: list, phase: int, batch: int, update_ids):
+    """
+    Следующий шаг и клик по меню для каждого пользователя из active. Возвращает
+    время первых и повторных обновлений пользователей и (строк, байт) записи.
+    """
+    from bench_user_state import make_update
+
+    first, repeat = [], []
+    rows_before, bytes_before = getattr(persistence, "rows_written", 0), written_bytes()
+    processed = 0
+    for n in active:
+        user_id = USER_ID_BASE + n
+        for kind, data, timings in (("text", next_step(n, phase), first), ("callback", "chatbots", repeat)):
+            update = make_update(next(update_ids), user_id, kind, data, application.bot)
+            started = time.perf_counter()
+            await application.process_update(update)
+            timings.append(time.perf_counter() - started)
+            processed += 1
+            if processed % batch == 0:
+                await application.update_persistence()
+                await persistence.flush()
+    await application.update_persistence()
+    await persistence.flush()
+    rows = getattr(persistence, "rows_written", 0) - rows_before
+    return first, repeat, rows, written_bytes() - bytes_before
+
+
+async def run(args):
+    import httpx
+    from telegram.ext import PicklePersistence, PersistenceInput
+
+    import backend_client
+    import catalogue
+    from bench_handlers_cpu import METHODS, PLANS
+    from bench_load import percentile
+    from client_card_handler import FILL_CARD_CHALLENGES
+    from persistence import SQLitePersistence
+
+    payments = {}
+
+    async def stub_backend(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        if scope["path"].startswith("/blog/make-payment/"):
+            payments[int(scope["path"].rstrip("/").rsplit("/", 1)[1])] = json.loads(body)
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    backend_client._client = backend_client.build_backend_client(
+        "http://backend/blog", transport=httpx.ASGITransport(app=stub_backend)
+    )
+    catalogue.catalogue_cache.set("subscription-plans", PLANS, ttl=3600)
+    catalogue.catalogue_cache.set("payment-methods", METHODS, ttl=3600)
+
+    directory = tempfile.mkdtemp()
+    sqlite_path = os.path.join(directory, "bot_state.sqlite3")
+    pickle_path = os.path.join(directory, "bot_state.pickle")
+    started = time.perf_counter()
+    sqlite_size, pickle_size = seed(args.conversations, sqlite_path, pickle_path)
+    print(f"seeded {args.conversations} users mid-flow in {time.perf_counter() - started:.1f}s: "
+          f"sqlite {sqlite_size / 1024 / 1024:.1f} MiB, pickle {pickle_size / 1024 / 1024:.1f} MiB")
+
+    # Активные - пользователи карты клиента и пополнения: у них следующий шаг - текст
+    active = [n for n in range(args.conversations) if n % 3 != 2][:args.active]
+    update_ids = itertools.count(1)
+
+    # Запуск
+    pickled = PicklePersistence(pickle_path, store_data=PersistenceInput(bot_data=False, chat_data=False,
+                                                                          callback_data=False))
+    application, pickle_startup = await start(pickled)
+    loaded = len(application.user_data)
+    _, _, _, pickle_bytes = await drive(application, pickled, active[:args.pickle_active], 0, args.batch,
+                                        update_ids)
+    await application.shutdown()
+    forget_memory(application)
+    pickle_updates = 2 * len(active[:args.pickle_active])
+
+    persistence = SQLitePersistence(sqlite_path, update_interval=3600)
+    application, sqlite_startup = await start(persistence)
+    print("startup (Application.initialize):")
+    print(f"    pickle: {pickle_startup * 1000:8.1f}ms, {loaded} users loaded into memory")
+    print(f"    sqlite: {sqlite_startup * 1000:8.1f}ms, {len(application.user_data)} users loaded into memory")
+    assert sqlite_startup < pickle_startup
+
+    # Шаг до перезапуска
+    first, repeat, rows, sqlite_bytes = await drive(application, persistence, active, 0, args.batch, update_ids)
+    updates = 2 * len(active)
+    print(f"{len(active)} users, {updates} updates, state flushed every {args.batch} updates:")
+    print(f"    first update of a user (loads its state): p50={percentile(first, 50) * 1e6:.0f}µs "
+          f"p99={percentile(first, 99) * 1e6:.0f}µs; menu click after it: p50={percentile(repeat, 50) * 1e6:.0f}µs")
+    print(f"    sqlite: {rows} rows written ({rows / updates:.2f} per update), {persistence.writes_skipped} unchanged "
+          f"user_data skipped, {sqlite_bytes / updates / 1024:.1f} KiB written per update")
+    print(f"    pickle: {pickle_bytes / pickle_updates / 1024:.1f} KiB written per update "
+          f"(measured on {pickle_updates} updates; the whole file is rewritten on each change)")
+    assert rows <= updates, "every update should write at most one row"
+    await application.shutdown()
+    forget_memory(application)
+
+    # Перезапуск: шаг, сделанный выше, должен сохраниться
+    persistence = SQLitePersistence(sqlite_path, update_interval=3600)
+    application, restart = await start(persistence)
+    first, _, _, _ = await drive(application, persistence, active, 1, args.batch, update_ids)
+    conversations = application._conversation_handler_conversations
+    for n in active:
+        user_id = USER_ID_BASE + n
+        if n % 3 == 0:
+            assert conversations["client_card"].get((user_id, user_id)) == FILL_CARD_CHALLENGES, n
+            assert application.user_data[user_id]["client_card_age"] == "34", n
+        else:
+            assert (user_id, user_id) not in conversations["recharge_balance"], n
+            assert payments[user_id] == {"payment_method": 1, "transaction_id": f"tx-{n}", "amount": "50000.00"}, n
+    print(f"restart: initialize {restart * 1000:.1f}ms, all {len(active)} users continued their flows "
+          f"(first update p50={statistics.median(first) * 1e6:.0f}µs)")
+    await application.shutdown()
+    await backend_client.close_backend_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--active", type=int, default=5000)
+    parser.add_argument("--pickle-active", type=int, default=100,
+                        help="пользователей для замера записи PicklePersistence (она медленная)")
+    parser.add_argument("--batch", type=int, default=500, help="обновлений между сбросами на диск")
+    args = parser.parse_args()
+
+    for name in ("RATE_LIMIT_GLOBAL_PER_SECOND", "RATE_LIMIT_GLOBAL_BURST",
+                 "RATE_LIMIT_CHAT_PER_SECOND", "RATE_LIMIT_CHAT_BURST"):
+        os.environ[name] = "1000000"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("BOT_STATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "bot_state.sqlite3"))
+    from telegram.warnings import PTBUserWarning
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    import main as bot_main  # noqa: F401 - настраивает logging.basicConfig
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
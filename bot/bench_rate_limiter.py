@@ -0,0 +1,91 @@
+# bench_rate_limiter.py
+"""
+Прогон PriorityRateLimiter против поддельного Bot API (fake_bot_api.py),
+который, как Telegram, отвечает 429 при превышении лимитов.
+
+Каждый симулированный пользователь получает три сообщения подряд, как в
+fill_card_challenges: два send_message и перерисовку меню (низкий приоритет).
+Каждый пятый вместо этого получает подтверждение оплаты (высокий приоритет).
+
+Сравниваются бот без планировщика (сообщения теряются с 429) и с ним
+(все сообщения доставлены, подтверждения оплаты обгоняют меню).
+
+Запуск (из папки bot/):
+    python bench_rate_limiter.py --users 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+
+from fake_bot_api import FakeBotAPI
+from rate_limiter import PriorityRateLimiter, send_priority, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+TOKEN = "123456:BENCH"
+TELEGRAM_GLOBAL_LIMIT = 30
+TELEGRAM_CHAT_LIMIT = 4
+
+
+async def simulate_user(bot: ExtBot, chat_id: int, latencies: dict, failures: list):
+    async def send(text: str, priority: int, kind: str):
+        started = time.perf_counter()
+        try:
+            with send_priority(priority):
+                await bot.send_message(chat_id, text)
+        except RetryAfter:
+            failures.append(kind)
+            return
+        latencies[kind].append(time.perf_counter() - started)
+
+    if chat_id % 5 == 0:
+        await send("✅ Оплата прошла успешно.", PRIORITY_HIGH, "payment")
+    else:
+        await send("Ваша карта успешно сохранена!", PRIORITY_NORMAL, "card")
+        await send("Ваша карта: ...", PRIORITY_NORMAL, "card")
+    await send("🏠 Главное меню", PRIORITY_LOW, "menu")
+
+
+async def run(users: int, with_limiter: bool) -> dict:
+    fake = FakeBotAPI(global_per_second=TELEGRAM_GLOBAL_LIMIT, chat_per_second=TELEGRAM_CHAT_LIMIT)
+    limiter = PriorityRateLimiter(global_rate=TELEGRAM_GLOBAL_LIMIT - 5, global_burst=5) if with_limiter else None
+    bot = ExtBot(TOKEN, base_url="http://fake-telegram/bot", request=fake.request(), rate_limiter=limiter)
+    await bot.initialize()
+
+    latencies = {"payment": [], "card": [], "menu": []}
+    failures = []
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate_user(bot, chat_id, latencies, failures) for chat_id in range(1, users + 1)))
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+    return {"elapsed": elapsed, "latencies": latencies, "failures": len(failures), "rejected": fake.rejected,
+            "delivered": len(fake.sent)}
+
+
+def report(title: str, result: dict):
+    print(f"{title}: delivered={result['delivered']} lost={result['failures']} "
+          f"429 responses={result['rejected']} wall={result['elapsed']:.1f}s")
+    for kind, values in result["latencies"].items():
+        if values:
+            print(f"    {kind:>7}: mean={statistics.mean(values):.2f}s max={max(values):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    without = asyncio.run(run(args.users, with_limiter=False))
+    report("without limiter", without)
+    limited = asyncio.run(run(args.users, with_limiter=True))
+    report("   with limiter", limited)
+
+    assert limited["failures"] == 0, "messages were lost despite the limiter"
+    assert statistics.mean(limited["latencies"]["payment"]) < statistics.mean(limited["latencies"]["menu"]), \
+        "payment confirmations should be delivered ahead of menu redraws"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+# bench_replay.py
+"""
+Воспроизведение записанных входящих обновлений (traffic_log.py) через настоящий
+Application из main.py: вместо api.telegram.org работает FakeBotAPI, бот ходит
+в локальный Django-бэкенд. Обновления подаются с исходными паузами (--speed 1),
+в несколько раз быстрее (--speed 10) или все сразу (--speed 0).
+
+По каждому хендлеру выводятся число вызовов, ошибки и p50/p90/p99 времени
+обработки (те же замеры, что bot_handler_duration_seconds в instrumentation.py).
+--revisions прогоняет лог на двух ревизиях (git worktree) и печатает разницу
+по хендлерам; --compare сравнивает два сохранённых отчёта (--output).
+
+Лог с прода пишется при UPDATE_RECORD_PATH (см. config.py). Для пробы можно
+записать нагрузочный прогон:
+    UPDATE_RECORD_PATH=/tmp/updates.jsonl.gz python bench_load.py --users 200
+
+Каждый прогон получает свои id пользователей и свои числа в тексте (номера
+карт, суммы): повторный прогон на том же бэкенде снова идёт через регистрацию
+и не упирается в занятый transaction_id. Ревизия должна уметь
+main.build_application(request=..., get_updates_request=...) (как для bench_load.py).
+
+Перед прогоном запустите бэкенд и заполните справочники:
+    python manage.py seed_loadtest
+    python manage.py runserver
+
+Запуск (из папки bot/):
+    python bench_replay.py --log /tmp/updates.jsonl.gz --speed 10
+    python bench_replay.py --log /tmp/updates.jsonl.gz --speed 0 --revisions HEAD~3 WORKTREE
+    python bench_replay.py --compare before.json after.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import collections
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+from telegram.warnings import PTBUserWarning
+
+from bench_load import check_backend, percentile
+from fake_bot_api import FakeBotAPI
+
+# Заголовок лога из traffic_log.py; сам модуль не импортируется - он тянет
+# config той ревизии, на которой идёт прогон
+LOG_FORMAT = "bot-updates/1"
+CHAT_TYPES = frozenset({"private", "group", "supergroup", "channel"})
+TEXT_FIELDS = frozenset({"text", "caption"})
+DIGITS = re.compile(r"[0-9]+")
+# Сдвиг id пользователей между прогонами; псевдонимы в логе меньше 2 * 10 ** 13
+RUN_ID_STEP = 2 * 10 ** 13
+# Специальная "ревизия": текущая рабочая копия со всеми незакоммиченными правками
+WORKTREE = "WORKTREE"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_log(path: str):
+    """
+    (заголовок, итератор по (t, обновление)) лога из traffic_log.UpdateRecorder.
+    """
+    log = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(log.readline() or "{}")
+    if header.get("format") != LOG_FORMAT:
+        log.close()
+        raise SystemExit(f"{path}: not an update log (expected format {LOG_FORMAT!r})")
+
+    def entries():
+        with log:
+            for line in log:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["t"], entry["u"]
+
+    return header, entries()
+
+
+class RunKey:
+    """
+    Делает обновления лога уникальными для прогона: id пользователей и чатов
+    сдвигаются на offset, числа в тексте заменяются другими той же длины.
+    """
+
+    def __init__(self, run: int, key: bytes):
+        self.offset = run * RUN_ID_STEP
+        self.key = key
+
+    def digits(self, run: str) -> str:
+        digest = hashlib.blake2b(run.encode(), key=self.key).hexdigest()
+        value = str(int(digest, 16))[-len(run):].rjust(len(run), "0")
+        if run[0] == "0":
+            return "0" + value[1:]
+        return str(int(value[0]) % 9 + 1) + value[1:]
+
+    def text(self, text: str) -> str:
+        command = ""
+        if text.startswith("/"):
+            command, _, text = text.partition(" ")
+            command += " " if text else ""
+        return command + DIGITS.sub(lambda match: self.digits(match.group()), text)
+
+    def apply(self, value):
+        if isinstance(value, list):
+            return [self.apply(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        person = (value.get("is_bot") is False
+                  or (value.get("type") in CHAT_TYPES and isinstance(value.get("id"), int)))
+        result = {}
+        for key, item in value.items():
+            if person and key == "id":
+                result[key] = item - self.offset if item < 0 else item + self.offset
+            elif person and key == "username":
+                result[key] = f"user{abs(value['id']) + self.offset}"
+            elif key in TEXT_FIELDS and isinstance(item, str):
+                result[key] = self.text(item)
+            else:
+                result[key] = self.apply(item)
+        return result
+
+
+class HandlerSamples:
+    """
+    Подменяет HANDLER_DURATION.observe: кроме гистограммы сохраняет сами замеры.
+    """
+
+    def __init__(self, histogram):
+        self.durations = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self._observe = histogram.observe
+        histogram.observe = self.observe
+
+    def observe(self, value: float, **labels):
+        self._observe(value, **labels)
+        self.durations[labels["handler"]].append(value)
+        if labels.get("outcome") != "ok":
+            self.errors[labels["handler"]] += 1
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['label']}: {report['updates']} updates in {report['elapsed']:.1f}s "
+          f"({report['updates'] / report['elapsed']:,.1f} updates/s), speed={report['speed']}")
+    print(f"{'handler':<46} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for name, stats in sorted(report["handlers"].items()):
+        print(f"{name:<46} {stats['count']:>7} {stats['errors']:>7} {stats['p50'] * 1000:>9.2f} "
+              f"{stats['p90'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f}")
+    print(f"Bot API calls: {report['bot_api_calls']}")
+
+
+def code_revision(code_dir: str) -> str:
+    result = subprocess.run(["git", "-C", code_dir, "describe", "--always", "--dirty"],
+                            capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+async def replay(args) -> dict:
+    # main и config читаются из --code-dir, поэтому импортируются после настройки окружения и sys.path
+    import main
+    import instrumentation
+    from telegram.request import HTTPXRequest
+
+    await check_backend(os.environ["BACKEND_API_BASE_URL"])
+    header, entries = read_log(args.log)
+    run_key = RunKey(args.run, os.urandom(16))
+
+    samples = HandlerSamples(instrumentation.HANDLER_DURATION)
+    fake = FakeBotAPI(global_per_second=10 ** 9, chat_per_second=10 ** 9, latency=args.api_latency,
+                      keep_sent=False)
+    application = main.build_application(
+        request=fake.request(getattr(main, "InstrumentedHTTPXRequest", HTTPXRequest)),
+        get_updates_request=fake.request(connection_pool_size=1),
+    )
+    await application.initialize()
+    await main.post_init(application)
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+    await application.start()
+
+    updates = 0
+    started = time.perf_counter()
+    try:
+        for offset, update in entries:
+            if args.limit and updates >= args.limit:
+                break
+            if args.speed:
+                delay = started + offset / args.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif updates % 100 == 0:
+                await asyncio.sleep(0)
+            fake.push_update(run_key.apply(update))
+            updates += 1
+
+        # Ждём, пока бот заберёт и обработает всё поставленное
+        deadline = time.perf_counter() + args.drain_timeout
+        while (fake.pending_update_count or application.update_queue.qsize()
+               or getattr(application.update_queue, "in_flight", 0)):
+            if time.perf_counter() > deadline:
+                raise SystemExit(f"updates still pending after {args.drain_timeout}s")
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await main.post_shutdown(application)
+        await fake.close()
+
+    handlers = {}
+    for name in set(samples.durations) | set(samples.errors):
+        handlers[name] = {**summarize(samples.durations[name]), "errors": samples.errors[name]}
+    return {
+        "label": args.label or code_revision(args.code_dir),
+        "log": os.path.abspath(args.log),
+        "recorded_at": header.get("started_at"),
+        "speed": args.speed,
+        "updates": updates,
+        "elapsed": elapsed,
+        "handlers": handlers,
+        "bot_api_calls": dict(fake.calls.most_common()),
+    }
+
+
+def compare(before: dict, after: dict, max_regression: float = None, min_count: int = 20) -> list:
+    """
+    Печатает разницу p50/p99 по хендлерам; возвращает хендлеры, где p50 вырос больше max_regression.
+    """
+    print(f"{before['label']} -> {after['label']}")
+    print(f"{'handler':<46} {'count':>13} {'p50 ms':>17} {'Δ p50':>7} {'p99 ms':>17} {'Δ p99':>7}")
+    regressions = []
+    for name in sorted(set(before["handlers"]) | set(after["handlers"])):
+        old, new = before["handlers"].get(name), after["handlers"].get(name)
+        if old is None or new is None:
+            only = "after" if old is None else "before"
+            stats = new or old
+            print(f"{name:<46} {stats['count']:>13} {'only ' + only:>17}")
+            continue
+        deltas = []
+        for q in ("p50", "p99"):
+            deltas.append(new[q] / old[q] - 1 if old[q] else 0.0)
+        marker = ""
+        if (max_regression is not None and deltas[0] > max_regression
+                and min(old["count"], new["count"]) >= min_count):
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(f"{name:<46} {old['count']:>6} {new['count']:>6} "
+              f"{old['p50'] * 1000:>8.2f} {new['p50'] * 1000:>8.2f} {deltas[0]:>+7.0%} "
+              f"{old['p99'] * 1000:>8.2f} {new['p99'] * 1000:>8.2f} {deltas[1]:>+7.0%}{marker}")
+        if old["errors"] != new["errors"]:
+            print(f"{'':<46} errors {old['errors']} -> {new['errors']}")
+    rates = [report["updates"] / report["elapsed"] for report in (before, after)]
+    print(f"throughput: {rates[0]:,.1f} -> {rates[1]:,.1f} updates/s ({rates[1] / rates[0] - 1:+.0%})")
+    return regressions
+
+
+def run_revisions(args, passthrough: list):
+    """
+    Прогоняет лог на каждой ревизии в отдельном процессе (свой импорт main и config) и сравнивает.
+    """
+    repo = subprocess.run(["git", "-C", HERE, "rev-parse", "--show-toplevel"],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    bot_path = os.path.relpath(HERE, repo)
+    directory = tempfile.mkdtemp()
+    reports = []
+    for run, revision in enumerate(args.revisions, start=args.run):
+        worktree = None
+        if revision == WORKTREE:
+            code_dir = HERE
+        else:
+            worktree = os.path.join(directory, f"rev{len(reports)}")
+            subprocess.run(["git", "-C", repo, "worktree", "add", "--detach", "--quiet", worktree, revision],
+                           check=True)
+            code_dir = os.path.join(worktree, bot_path)
+        output = os.path.join(directory, f"rev{len(reports)}.json")
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--log", os.path.abspath(args.log),
+                            "--code-dir", code_dir, "--output", output, "--run", str(run),
+                            "--label", revision if revision == WORKTREE else f"{revision} ({code_revision(code_dir)})",
+                            *passthrough], check=True)
+        finally:
+            if worktree is not None:
+                subprocess.run(["git", "-C", repo, "worktree", "remove", "--force", worktree], check=True)
+        with open(output) as report:
+            reports.append(json.load(report))
+    print()
+    return compare(reports[0], reports[-1], args.max_regression, args.min_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="лог обновлений (UPDATE_RECORD_PATH)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="во сколько раз быстрее записи; 0 - без пауз")
+    parser.add_argument("--limit", type=int, default=0, help="воспроизвести только первые N обновлений")
+    parser.add_argument("--backend", default=os.environ.get("BACKEND_API_BASE_URL", "http://localhost:8000/blog"))
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, сек")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="сохранить отчёт в JSON (для --compare)")
+    parser.add_argument("--revisions", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help=f"сравнить две ревизии git; {WORKTREE} - текущая рабочая копия")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE_JSON", "AFTER_JSON"))
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="код выхода 1, если p50 хендлера вырос больше чем на эту долю")
+    parser.add_argument("--min-count", type=int, default=20,
+                        help="хендлеры с меньшим числом вызовов не считаются регрессией")
+    parser.add_argument("--code-dir", default=HERE, help=argparse.SUPPRESS)
+    parser.add_argument("--label", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--run", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as report:
+                reports.append(json.load(report))
+        sys.exit(1 if compare(*reports, args.max_regression, args.min_count) else 0)
+    if not args.log:
+        parser.error("--log is required")
+    if args.run is None:
+        args.run = random.randint(1, 10 ** 5)
+    if args.revisions:
+        passthrough = ["--speed", str(args.speed), "--limit", str(args.limit), "--backend", args.backend,
+                       "--api-latency", str(args.api_latency), "--drain-timeout", str(args.drain_timeout),
+                       "--log-level", args.log_level]
+        sys.exit(1 if run_revisions(args, passthrough) else 0)
+
+    # Окружение прогона: свои файлы данных, без лимитов Telegram, фоновых задач и записи обновлений
+    os.environ["BACKEND_API_BASE_URL"] = args.backend
+    os.environ["METRICS_PORT"] = "0"
+    os.environ["UPDATE_RECORD_PATH"] = ""
+    os.environ["SUPPORT_FEED_ENABLED"] = "0"
+    os.environ["EXPIRY_REMINDER_ENABLED"] = "0"
+    data_dir = tempfile.mkdtemp()
+    os.environ["FILE_ID_DB_PATH"] = os.path.join(data_dir, "file_ids.sqlite3")
+    os.environ["SUPPORT_FEED_CURSOR_PATH"] = os.path.join(data_dir, "support_feed_cursor")
+    os.environ["BOT_STATE_DB_PATH"] = os.path.join(data_dir, "bot_state.sqlite3")
+    for name in ("RATE_LIMIT_GLOBAL_PER_SECOND", "RATE_LIMIT_GLOBAL_BURST",
+                 "RATE_LIMIT_CHAT_PER_SECOND", "RATE_LIMIT_CHAT_BURST"):
+        os.environ[name] = "1000000"
+    # Код бота - из --code-dir (ревизия из git worktree); bench_load и fake_bot_api уже импортированы отсюда
+    sys.path.insert(0, os.path.abspath(args.code_dir))
+
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    import main as bot_main  # noqa: F401 - настраивает logging.basicConfig
+    logging.getLogger().setLevel(args.log_level)
+    report = asyncio.run(replay(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# bench_resilience.py
+"""
+Проверка устойчивости клиента бэкенда (backend_client + resilience) против
+локальной заглушки, которая умеет отвечать медленно и с ошибками.
+
+Сценарии:
+  flaky    - 10% ответов 503: GET-запросы проходят за счёт повторов;
+  storm    - 60% ответов 503: повторов не больше, чем разрешает бюджет;
+  post     - POST при ошибке не повторяется, идемпотентный (idempotent=True) -
+             повторяется как GET;
+  outage   - бэкенд отвечает дольше таймаута: предохранитель размыкается,
+             дальше запросы отклоняются мгновенно, а справочники отдаются из
+             кэша (устаревшие данные вместо ошибки);
+  recovery - бэкенд снова здоров: после recovery_timeout пробный запрос
+             проходит и предохранитель замыкается;
+  etag     - 304 отдаётся хендлеру сохранённым 200-ответом, даже если запись
+             вытеснили из ValidatorCache, пока запрос был в пути.
+
+Запуск (из папки bot/):
+    python bench_resilience.py --requests 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import backend_client
+import catalogue
+from resilience import BackendUnavailable, CircuitBreaker, RetryBudget
+
+PLANS = [{"id": 1, "name": "Месяц"}, {"id": 2, "name": "Год"}]
+
+
+class StubState:
+    def __init__(self):
+        self.error_rate = 0.0
+        self.latency = 0.0
+        self.hits = {"GET": 0, "POST": 0}
+        # ETag ответов на GET (None - без ETag) и сколько ближайших GET ответить 304 без условия
+        self.etag = None
+        self.force_not_modified = 0
+        self.if_none_match = []
+        self.lock = threading.Lock()
+
+
+def start_stub_backend(state: StubState) -> ThreadingHTTPServer:
+    """
+    Заглушка бэкенда: задержка state.latency и 503 с вероятностью state.error_rate.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _respond(self, method: str):
+            with state.lock:
+                state.hits[method] += 1
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            if state.latency:
+                time.sleep(state.latency)
+            if method == "GET" and state.etag:
+                with state.lock:
+                    state.if_none_match.append(self.headers.get("If-None-Match"))
+                    forced = state.force_not_modified > 0
+                    state.force_not_modified -= forced
+            if random.random() < state.error_rate:
+                status, body = 503, {"error": "unavailable"}
+            elif method == "GET" and state.etag and (forced or self.headers.get("If-None-Match") == state.etag):
+                status, body = 304, None
+            else:
+                status, body = 200, PLANS
+            raw = json.dumps(body).encode() if body is not None else b""
+            try:
+                self.send_response(status)
+                if method == "GET" and state.etag:
+                    self.send_header("ETag", state.etag)
+                if body is not None:
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+            except OSError:
+                pass  # Клиент уже ушёл по таймауту
+
+        def do_GET(self):
+            self._respond("GET")
+
+        def do_POST(self):
+            self._respond("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def reset_policies(failure_threshold: int, recovery_timeout: float):
+    backend_client.breaker = CircuitBreaker("backend", failure_threshold=failure_threshold,
+                                            recovery_timeout=recovery_timeout)
+    backend_client.retry_budget = RetryBudget(ratio=0.2, min_per_second=1)
+
+
+async def flaky(state: StubState, requests: int):
+    reset_policies(failure_threshold=10, recovery_timeout=1)
+    state.error_rate, state.latency = 0.1, 0.0
+    state.hits["GET"] = 0
+    ok = 0
+    for _ in range(requests):
+        try:
+            await backend_client.backend_get("/subscription-plans/")
+            ok += 1
+        except Exception:
+            pass
+    print(f"flaky:    10% errors -> ok={ok}/{requests} backend hits={state.hits['GET']}")
+    assert ok / requests > 0.97, "retries should hide transient 503s"
+
+
+async def retry_storm(state: StubState, requests: int):
+    reset_policies(failure_threshold=10 ** 6, recovery_timeout=1)
+    state.error_rate, state.latency = 0.6, 0.0
+    state.hits["GET"] = 0
+    started = time.monotonic()
+    ok = 0
+    for _ in range(requests):
+        try:
+            await backend_client.backend_get("/subscription-plans/")
+            ok += 1
+        except Exception:
+            pass
+    elapsed = time.monotonic() - started
+    budget = backend_client.retry_budget
+    retries = state.hits["GET"] - requests
+    # Все запросы уложились в окно бюджета, поэтому лимит считается от общего числа
+    limit = budget.ratio * requests + budget.min_per_second * budget.ttl
+    print(f"storm:    60% errors -> ok={ok}/{requests} retries={retries} (budget {limit:.0f}) "
+          f"exhausted={budget.exhausted} in {elapsed:.1f}s")
+    assert elapsed < budget.ttl, "storm run is too slow to check the budget window"
+    assert retries <= limit, "retries exceeded the retry budget"
+
+
+async def post_not_retried(state: StubState):
+    reset_policies(failure_threshold=100, recovery_timeout=1)
+    state.error_rate, state.latency = 1.0, 0.0
+    state.hits["POST"] = 0
+    for _ in range(10):
+        try:
+            await backend_client.backend_post("/make-payment/1/", json={})
+        except Exception:
+            pass
+    print(f"post:     10 failing POSTs -> backend hits={state.hits['POST']}")
+    assert state.hits["POST"] == 10, "POST requests must not be retried"
+
+    state.hits["POST"] = 0
+    try:
+        await backend_client.backend_post("/make-payment/1/", json={}, idempotent=True)
+    except Exception:
+        pass
+    print(f"          1 failing idempotent POST -> backend hits={state.hits['POST']}")
+    assert state.hits["POST"] == 1 + backend_client.BACKEND_GET_RETRIES, "idempotent POSTs should be retried"
+
+
+async def outage(state: StubState):
+    reset_policies(failure_threshold=5, recovery_timeout=1)
+    state.error_rate, state.latency = 0.0, 0.0
+    catalogue.catalogue_cache.ttl = 0.05
+    catalogue.catalogue_cache.invalidate()
+    await catalogue.get_subscription_plans()  # Прогреваем кэш, пока бэкенд жив
+    await asyncio.sleep(0.1)  # ... и даём записи устареть
+
+    state.latency = 2.0
+    backend_client.BACKEND_ENDPOINT_TIMEOUTS = {"/subscription-plans/": 0.2}
+    timings = []
+    for _ in range(8):
+        was_open = backend_client.breaker.state == CircuitBreaker.OPEN
+        started = time.perf_counter()
+        try:
+            await backend_client.backend_get("/subscription-plans/")
+        except BackendUnavailable:
+            timings.append(("rejected", time.perf_counter() - started))
+        except Exception:
+            timings.append(("timeout", time.perf_counter() - started))
+        assert not was_open or timings[-1][0] == "rejected", "an open breaker should reject without a request"
+    stats = backend_client.breaker.stats()
+    rejected = [elapsed for kind, elapsed in timings if kind == "rejected"]
+    print(f"outage:   results={[kind for kind, _ in timings]} breaker={stats['state']} "
+          f"fail-fast max={max(rejected) * 1000 if rejected else 0:.2f}ms")
+    assert stats["state"] == "open", "breaker should open after repeated timeouts"
+    assert rejected and max(rejected) < 0.01, "an open breaker should fail fast"
+
+    started = time.perf_counter()
+    plans = await catalogue.get_subscription_plans()
+    elapsed = time.perf_counter() - started
+    print(f"          catalogue served {len(plans)} stale plans in {elapsed * 1000:.2f}ms "
+          f"(stale hits={catalogue.catalogue_cache.stale_hits})")
+    assert plans == PLANS, "catalogue should fall back to stale data while the breaker is open"
+
+
+async def recovery(state: StubState):
+    state.error_rate, state.latency = 0.0, 0.0
+    await asyncio.sleep(backend_client.breaker.recovery_timeout + 0.1)
+    await backend_client.backend_get("/subscription-plans/")
+    stats = backend_client.breaker.stats()
+    print(f"recovery: breaker={stats['state']} opened={stats['opened']} rejected={stats['rejected']}")
+    assert stats["state"] == "closed", "a successful probe should close the breaker"
+
+
+async def etag(state: StubState):
+    reset_policies(failure_threshold=100, recovery_timeout=1)
+    state.error_rate, state.latency = 0.0, 0.1
+    state.etag, state.if_none_match = '"v1"', []
+    validators = backend_client.validators
+    validators.clear()
+    first = await backend_client.backend_get("/subscription-plans/")
+    assert first.status_code == 200 and first.json() == PLANS
+
+    # Запись вытесняют, пока условный запрос в пути: 304 всё равно становится 200 с телом
+    request = asyncio.create_task(backend_client.backend_get("/subscription-plans/"))
+    await asyncio.sleep(0.05)
+    validators.clear()
+    second = await request
+    assert state.if_none_match[-1] == '"v1"', "the second GET should be conditional"
+    assert second.status_code == 200 and second.json() == PLANS, "an evicted entry leaked a raw 304"
+
+    # 304 на запрос без If-None-Match: один повтор без условия
+    validators.clear()
+    state.force_not_modified, state.if_none_match = 1, []
+    third = await backend_client.backend_get("/subscription-plans/")
+    assert state.if_none_match == [None, None], state.if_none_match
+    assert third.status_code == 200 and third.json() == PLANS
+    print(f"etag:     evicted in flight -> {second.status_code}, unconditional 304 -> "
+          f"{len(state.if_none_match)} requests -> {third.status_code} (not modified={validators.not_modified})")
+    state.etag, state.latency = None, 0.0
+
+
+async def run(requests: int):
+    state = StubState()
+    server = start_stub_backend(state)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    backend_client._client = backend_client.build_backend_client(base_url)
+    backend_client.BACKEND_RETRY_BACKOFF = 0.01
+    try:
+        await flaky(state, requests)
+        await retry_storm(state, requests)
+        await post_not_retried(state)
+        await outage(state)
+        await recovery(state)
+        await etag(state)
+    finally:
+        await backend_client.close_backend_client()
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# bench_support_batching.py
+"""
+Сообщения поддержки: по запросу на сообщение (POST /support/send-message/)
+против пачек через SupportMessageBatcher (POST /support/send-messages/).
+
+Заглушка бэкенда тратит request_cost на запрос (поиск сессии, транзакция) и
+row_cost на каждое сохранённое сообщение, и обрабатывает один запрос за раз -
+как бэкенд, упирающийся в запись в БД. Пользователи присылают сообщения
+одновременно; считается число запросов к бэкенду, общее время и задержка до
+подтверждения пользователю.
+
+Проверяет, что каждое подтверждение приходит только после сохранения
+сообщения и что сообщение в закрытую сессию отклоняется.
+
+Запуск (из папки bot/):
+    python bench_support_batching.py --messages 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import backend_client
+from bench_load import percentile
+from support_batcher import SupportMessageBatcher, SupportMessageRejected
+
+ACTIVE_SESSION = 1
+CLOSED_SESSION = 2
+
+
+class StubBackend:
+    def __init__(self, request_cost: float, row_cost: float):
+        self.request_cost = request_cost
+        self.row_cost = row_cost
+        self.requests = 0
+        self.stored = set()
+        self.lock = threading.Lock()
+
+    def store(self, messages: list) -> list:
+        # Один запрос за раз, как запись в одну таблицу
+        with self.lock:
+            self.requests += 1
+            time.sleep(self.request_cost + self.row_cost * len(messages))
+            results = []
+            for message in messages:
+                if message.get("session_id") == ACTIVE_SESSION:
+                    self.stored.add(message["message_text"])
+                    results.append({"status": "ok"})
+                else:
+                    results.append({"status": "error", "error": "Сессия не найдена или завершена."})
+            return results
+
+
+def start_stub(backend: StubBackend) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            if self.path.endswith("/support/send-messages/"):
+                status, payload = 201, {"results": backend.store(body["messages"])}
+            else:
+                result = backend.store([body])[0]
+                status, payload = (201, {}) if result["status"] == "ok" else (404, {"error": result["error"]})
+            raw = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_users(send, messages: int, concurrency: int, backend: StubBackend) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def user(i: int):
+        text = f"message {i}"
+        async with semaphore:
+            started = time.perf_counter()
+            await send(text)
+            latencies.append(time.perf_counter() - started)
+            assert text in backend.stored, "user was acknowledged before the message was stored"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(messages)))
+    return time.perf_counter() - started, latencies
+
+
+async def run(args):
+    backend = StubBackend(args.request_cost, args.row_cost)
+    server = start_stub(backend)
+    backend_client._client = backend_client.build_backend_client(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        async def send_one(text: str):
+            await backend_client.backend_post("/support/send-message/", json={
+                "session_id": ACTIVE_SESSION, "sender": "user", "message_text": text,
+            })
+
+        batcher = SupportMessageBatcher(delay=args.delay, max_size=args.max_size)
+
+        async def send_batched(text: str):
+            await batcher.submit(ACTIVE_SESSION, "user", text)
+
+        print(f"{args.messages} messages, {args.concurrency} users at once, backend: "
+              f"{args.request_cost * 1000:.1f}ms per request + {args.row_cost * 1000:.2f}ms per message")
+        results = {}
+        for name, send in (("per message", send_one), ("batched", send_batched)):
+            backend.requests = 0
+            backend.stored.clear()
+            elapsed, latencies = await run_users(send, args.messages, args.concurrency, backend)
+            results[name] = elapsed
+            print(f"    {name:<12} backend requests={backend.requests:>6}  {args.messages / elapsed:8.0f} msg/s  "
+                  f"ack p50={percentile(latencies, 50) * 1000:7.1f}ms p99={percentile(latencies, 99) * 1000:7.1f}ms")
+        print(f"    batches: {batcher.batches}, mean size {batcher.messages / batcher.batches:.1f}")
+        assert results["batched"] < results["per message"], "batching should be faster"
+
+        try:
+            await batcher.submit(CLOSED_SESSION, "user", "late message")
+            raise AssertionError("a message to a closed session must be rejected")
+        except SupportMessageRejected as e:
+            print(f"closed session: rejected ({e})")
+        await batcher.close()
+    finally:
+        await backend_client.close_backend_client()
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--request-cost", type=float, default=0.002, help="стоимость запроса в бэкенде, сек")
+    parser.add_argument("--row-cost", type=float, default=0.00005, help="стоимость сохранения сообщения, сек")
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--max-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
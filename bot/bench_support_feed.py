@@ -0,0 +1,183 @@
+# bench_support_feed.py
+"""
+Доставка ответов операторов через одну long-poll ленту (SupportReplyFeed).
+
+Заглушка бэкенда (ASGI, без сети) отдаёт /support/changes/ так же, как Django:
+новые ответы после cursor, а если их нет - ждёт до timeout секунд. Операторы
+отвечают в случайные из --sessions открытых сессий с темпом --rate ответов в
+секунду, бот рассылает ответы через FakeBotAPI. Для сравнения выводится, сколько
+запросов понадобилось бы, если бы бот опрашивал каждую сессию отдельно.
+
+Проверяет, что каждый ответ доставлен ровно один раз и по порядку внутри чата,
+и что после перезапуска бот продолжает с сохранённого cursor, не теряя ответы,
+пришедшие, пока он был остановлен.
+
+Запуск (из папки bot/):
+    python bench_support_feed.py --sessions 5000 --rate 200 --duration 10
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+from urllib.parse import parse_qsl
+
+import httpx
+from telegram.ext import ExtBot
+
+import backend_client
+from bench_load import percentile
+from config import TOKEN
+from fake_bot_api import FakeBotAPI
+from rate_limiter import PriorityRateLimiter
+from support_feed import SupportReplyFeed
+
+
+class StubChangesBackend:
+    """
+    ASGI-заглушка GET /support/changes/ с long-poll.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.requests = 0
+        self._changed = asyncio.Condition()
+
+    async def add_reply(self, telegram_id: int, text: str):
+        self.replies.append({
+            "id": len(self.replies) + 1,
+            "session_id": telegram_id,
+            "telegram_id": str(telegram_id),
+            "sender": "operator",
+            "message_text": text,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "stored_at": time.perf_counter(),
+        })
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _changes(self, params: dict) -> dict:
+        self.requests += 1
+        if "after" not in params:
+            return {"messages": [], "cursor": len(self.replies)}
+        after = int(params["after"])
+        limit = int(params.get("limit", 100))
+        try:
+            async with self._changed:
+                await asyncio.wait_for(self._changed.wait_for(lambda: len(self.replies) > after),
+                                       float(params.get("timeout", 0)))
+        except asyncio.TimeoutError:
+            pass
+        messages = self.replies[after:after + limit]
+        return {"messages": messages, "cursor": messages[-1]["id"] if messages else after}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        params = dict(parse_qsl(scope["query_string"].decode()))
+        body = json.dumps(await self._changes(params)).encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+async def operators(backend: StubChangesBackend, sessions: int, rate: float, duration: float, rnd: random.Random):
+    """
+    Ответы операторов с темпом rate в секунду в случайные сессии.
+    """
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < duration:
+        due = int((time.perf_counter() - started) * rate)
+        while sent < due:
+            chat_id = 10 ** 6 + rnd.randrange(sessions)
+            await backend.add_reply(chat_id, f"reply {sent} to {chat_id}")
+            sent += 1
+        await asyncio.sleep(0.01)
+    return sent
+
+
+async def run(args):
+    backend = StubChangesBackend()
+    backend_client._client = backend_client.build_backend_client(
+        "http://backend/blog", transport=httpx.ASGITransport(app=backend)
+    )
+    fake = FakeBotAPI(global_per_second=10 ** 9, chat_per_second=10 ** 9, latency=args.api_latency)
+    bot = ExtBot(TOKEN, base_url="http://fake-telegram/bot", request=fake.request(),
+                 rate_limiter=PriorityRateLimiter(global_rate=1e6, global_burst=1e6, chat_rate=1e6, chat_burst=1e6))
+    await bot.initialize()
+
+    received = {}
+    lags = []
+
+    def on_message(method, message):
+        chat_id = message["chat"]["id"]
+        received.setdefault(chat_id, []).append(message["text"])
+        number = int(message["text"].rsplit("reply ", 1)[1].split(" ")[0])
+        lags.append(time.perf_counter() - backend.replies[number]["stored_at"])
+
+    fake.message_listeners.append(on_message)
+    cursor_path = os.path.join(tempfile.mkdtemp(), "support_feed_cursor")
+    rnd = random.Random(1)
+
+    try:
+        feed = SupportReplyFeed(timeout=args.timeout, cursor_path=cursor_path)
+        task = asyncio.create_task(feed.run(bot))
+        while feed.cursor is None:
+            await asyncio.sleep(0.01)
+
+        total = await operators(backend, args.sessions, args.rate, args.duration, rnd)
+        deadline = time.perf_counter() + 10
+        while feed.delivered < total and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        chats = len(received)
+        print(f"{args.sessions} open sessions, {total} operator replies to {chats} chats in {args.duration:.0f}s")
+        print(f"    feed:          {backend.requests:>7} backend requests, delivered {feed.delivered}, failed {feed.failed}")
+        polling = int(args.sessions * args.duration / args.poll_interval)
+        print(f"    per-session polling every {args.poll_interval:.0f}s would need {polling:>7} requests")
+        print(f"    reply lag:     p50={percentile(lags, 50) * 1000:.1f}ms  p99={percentile(lags, 99) * 1000:.1f}ms")
+
+        assert feed.delivered == total and feed.failed == 0, "not every reply was delivered"
+        for chat_id, texts in received.items():
+            numbers = [int(text.rsplit("reply ", 1)[1].split(" ")[0]) for text in texts]
+            assert numbers == sorted(set(numbers)), f"replies to {chat_id} duplicated or out of order"
+        assert backend.requests < total, "the feed should fetch several replies per request"
+
+        # Ответы, пришедшие, пока бот остановлен, доставляются после перезапуска
+        down = [10 ** 6 + rnd.randrange(args.sessions) for _ in range(20)]
+        for i, chat_id in enumerate(down):
+            await backend.add_reply(chat_id, f"reply {total + i} to {chat_id}")
+        feed = SupportReplyFeed(timeout=args.timeout, cursor_path=cursor_path)
+        task = asyncio.create_task(feed.run(bot))
+        deadline = time.perf_counter() + 10
+        while feed.delivered < len(down) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert feed.delivered == len(down), f"after restart delivered {feed.delivered} of {len(down)}"
+        print(f"restart: {feed.delivered} replies stored while the bot was down delivered from cursor {total}")
+    finally:
+        await bot.shutdown()
+        await backend_client.close_backend_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=200, help="ответов операторов в секунду")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=25, help="сколько бэкенд держит long-poll запрос")
+    parser.add_argument("--poll-interval", type=float, default=5, help="период опроса для сравнения")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="задержка ответа FakeBotAPI, сек")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
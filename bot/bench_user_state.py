@@ -0,0 +1,217 @@
+# bench_user_state.py
+"""
+Память под состояние пользователей (user_data, chat_data, разговоры
+ConversationHandler и учёт активности UserStateJanitor) на N пользователях.
+
+Обновления идут через настоящий Application (main.build_application), сеть
+заменена мгновенными ответами. Пользователи проходят сценарии и чаще всего
+бросают их на середине:
+    card      - карта клиента, брошена после возраста
+    payment   - оплата подписки, брошена на вводе карты
+    recharge  - пополнение баланса, брошено на вводе суммы
+    card_done - карта клиента заполнена до конца
+
+Выводит байты на активного пользователя, что остаётся после очистки
+простаивающих и сколько занимает состояние при ограничении max_users.
+
+Запуск (из папки bot/):
+    python bench_user_state.py --users 100000
+"""
+import argparse
+import asyncio
+import collections
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+USER_ID_BASE = 10 ** 8
+
+
+def deep_sizeof(root) -> int:
+    """
+    Размер объекта вместе со всем, на что он ссылается (словари, UserDict, списки, кортежи, строки).
+    """
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, collections.UserDict):
+            # TrackingDict постоянных ConversationHandler
+            stack.append(obj.data)
+    return total
+
+
+def flow_steps(flow: str):
+    """
+    (тип обновления, данные) по шагам сценария.
+    """
+    if flow == "card":
+        return [("callback", "fill_card"), ("text", "Анна"), ("text", "34")]
+    if flow == "card_done":
+        return [("callback", "fill_card"), ("text", "Анна"), ("text", "34"),
+                ("text", "Снизить тревожность"), ("text", "Мало времени")]
+    if flow == "payment":
+        return [("callback", "select_plan"), ("callback", "select_plan_1"), ("callback", "select_method_1")]
+    if flow == "recharge":
+        return [("callback", "recharge_balance"), ("callback", "payment_method_1")]
+    raise ValueError(flow)
+
+
+FLOWS = ("card", "payment", "recharge", "card_done")
+
+
+def make_update(update_id: int, user_id: int, kind: str, data: str, bot):
+    from telegram import Update
+    from fake_bot_api import BOT_USER
+
+    user = {"id": user_id, "is_bot": False, "first_name": "User", "username": f"user{user_id}"}
+    chat = {"id": user_id, "type": "private", "first_name": "User"}
+    if kind == "callback":
+        raw = {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": "1", "data": data,
+            "message": {"message_id": 1, "date": 0, "chat": chat, "from": BOT_USER, "text": "menu"},
+        }}
+    else:
+        raw = {"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "chat": chat, "from": user, "text": data,
+        }}
+    return Update.de_json(raw, bot)
+
+
+def state_sizes(application, janitor) -> dict:
+    conversations = [handler._conversations for handler in janitor._conversations]
+    return {
+        "user_data": deep_sizeof(application._user_data),
+        "chat_data": deep_sizeof(application._chat_data),
+        "conversations": sum(deep_sizeof(conversation) for conversation in conversations),
+        "activity": deep_sizeof(janitor._last_seen),
+    }
+
+
+def report(title: str, sizes: dict, users: int, application, janitor):
+    total = sum(sizes.values())
+    per_user = total / users if users else 0
+    conversations = sum(len(handler._conversations) for handler in janitor._conversations)
+    print(f"{title}:")
+    print(f"    total {total / 1024 / 1024:8.2f} MiB  ({per_user:.0f} bytes per user over {users} users)")
+    print(f"    " + "  ".join(f"{name}={size / 1024 / 1024:.2f}MiB" for name, size in sizes.items()))
+    print(f"    user_data entries={len(application.user_data)}  chat_data entries={len(application.chat_data)}  "
+          f"open conversations={conversations}  tracked={janitor.tracked_users}")
+    return total
+
+
+async def simulate(application, users: int, first_user_id: int, update_ids) -> float:
+    started = time.perf_counter()
+    for n in range(users):
+        user_id = first_user_id + n
+        for kind, data in flow_steps(FLOWS[n % len(FLOWS)]):
+            await application.process_update(make_update(next(update_ids), user_id, kind, data, application.bot))
+    return time.perf_counter() - started
+
+
+async def run(args):
+    import itertools
+
+    import httpx
+
+    import backend_client
+    import catalogue
+    import main
+    from bench_handlers_cpu import InstantRequest, METHODS, PLANS
+
+    async def stub_backend(scope, receive, send):
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    backend_client._client = backend_client.build_backend_client(
+        "http://backend/blog", transport=httpx.ASGITransport(app=stub_backend)
+    )
+    catalogue.catalogue_cache.set("subscription-plans", PLANS, ttl=3600)
+    catalogue.catalogue_cache.set("payment-methods", METHODS, ttl=3600)
+
+    clock = [0.0]
+    janitor = main.user_state_janitor
+    janitor.clock = lambda: clock[0]
+    janitor.idle_timeout = args.idle_timeout
+    janitor.max_users = args.users * 10
+
+    application = main.build_application(request=InstantRequest(), get_updates_request=InstantRequest())
+    await application.initialize()
+    update_ids = itertools.count(1)
+    try:
+        empty = state_sizes(application, janitor)
+        elapsed = await simulate(application, args.users, USER_ID_BASE, update_ids)
+        updates = sum(len(flow_steps(FLOWS[n % len(FLOWS)])) for n in range(args.users))
+        print(f"{args.users} users, {updates} updates in {elapsed:.1f}s ({elapsed / updates * 1e6:.0f}µs per update)")
+        flows = collections.Counter(FLOWS[n % len(FLOWS)] for n in range(args.users))
+        print("    flows: " + ", ".join(f"{flow}={count}" for flow, count in flows.items()))
+
+        sizes = state_sizes(application, janitor)
+        active = report("all users active", {k: sizes[k] - empty[k] for k in sizes}, args.users, application, janitor)
+        completed = [application.user_data.get(USER_ID_BASE + n) for n in range(args.users)
+                     if FLOWS[n % len(FLOWS)] == "card_done"]
+        assert all(not data for data in completed), "a finished flow left its keys in user_data"
+
+        # Все замолчали дольше idle_timeout
+        clock[0] += args.idle_timeout + 1
+        started = time.perf_counter()
+        evicted = janitor.sweep()
+        sweep_time = time.perf_counter() - started
+        sizes = state_sizes(application, janitor)
+        idle = report(f"after idle sweep ({evicted} users evicted in {sweep_time * 1000:.0f}ms)",
+                      {k: sizes[k] - empty[k] for k in sizes}, args.users, application, janitor)
+        # Остаток - ёмкость опустевших словарей: Python не уменьшает их при удалении,
+        # место переиспользуется следующими пользователями
+        print(f"    left: {idle / active:.0%} of the active state, all of it empty dict capacity")
+        assert evicted == args.users and not application.user_data and janitor.tracked_users == 0, \
+            "idle users kept their state"
+        assert not any(handler._conversations for handler in janitor._conversations)
+
+        # Новая волна пользователей при ограничении max_users
+        janitor.max_users = args.max_users
+        await simulate(application, args.users, USER_ID_BASE + args.users, update_ids)
+        sizes = state_sizes(application, janitor)
+        capped = report(f"another {args.users} users with max_users={args.max_users}",
+                        {k: sizes[k] - empty[k] for k in sizes}, args.max_users, application, janitor)
+        assert janitor.tracked_users <= args.max_users and len(application.user_data) <= args.max_users
+        print(f"    evicted by LRU: {janitor.evicted_lru}; state is {capped / active:.0%} of the uncapped run")
+    finally:
+        await application.shutdown()
+        await backend_client.close_backend_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--max-users", type=int, default=10000)
+    parser.add_argument("--idle-timeout", type=float, default=1800)
+    args = parser.parse_args()
+
+    # Без лимитов Telegram и фоновых задач: меряется только состояние
+    for name in ("RATE_LIMIT_GLOBAL_PER_SECOND", "RATE_LIMIT_GLOBAL_BURST",
+                 "RATE_LIMIT_CHAT_PER_SECOND", "RATE_LIMIT_CHAT_BURST"):
+        os.environ[name] = "1000000"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("BOT_STATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "bot_state.sqlite3"))
+    from telegram.warnings import PTBUserWarning
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+    import main as bot_main  # noqa: F401 - настраивает logging.basicConfig
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
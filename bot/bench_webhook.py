@@ -0,0 +1,111 @@
+# bench_webhook.py
+"""
+Локальная проверка webhook-эндпоинта: отправляет записанные обновления из
+fixtures/updates.jsonl в WebhookApp (через httpx.ASGITransport, без сети) и
+измеряет пропускную способность приёма в обновлениях в секунду.
+
+Также проверяет, что запрос без секретного токена отклоняется (403), а при
+переполненной очереди эндпоинт отвечает 503.
+
+Запуск (из папки bot/):
+    python bench_webhook.py --updates 20000 --concurrency 40
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+from telegram.ext import Application
+
+from update_processor import InFlightBoundedQueue
+from webhook import WebhookApp
+
+FIXTURES = Path(__file__).parent / "fixtures" / "updates.jsonl"
+SECRET = "bench-secret"
+PATH = "/telegram/webhook"
+
+
+def load_updates() -> list:
+    with open(FIXTURES, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_app(queue_maxsize: int, enqueue_timeout: float) -> WebhookApp:
+    application = (
+        Application.builder()
+        .token("123456:BENCH")
+        .update_queue(InFlightBoundedQueue(queue_maxsize))
+        .build()
+    )
+    return WebhookApp(application, secret_token=SECRET, path=PATH, webhook_url="",
+                      enqueue_timeout=enqueue_timeout)
+
+
+async def drain(queue: asyncio.Queue, counter: list):
+    while True:
+        await queue.get()
+        counter[0] += 1
+        queue.task_done()
+
+
+async def bench_throughput(total: int, concurrency: int) -> float:
+    app = build_app(queue_maxsize=1000, enqueue_timeout=5)
+    recorded = load_updates()
+    consumed = [0]
+    consumer = asyncio.create_task(drain(app.application.update_queue, consumed))
+
+    payloads = []
+    for i in range(total):
+        update = dict(recorded[i % len(recorded)])
+        update["update_id"] = i + 1
+        payloads.append(json.dumps(update).encode())
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://webhook") as client:
+        async def worker(offset: int):
+            for i in range(offset, total, concurrency):
+                response = await client.post(PATH, content=payloads[i], headers=headers)
+                assert response.status_code == 200, response.status_code
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        await app.application.update_queue.join()
+        elapsed = time.perf_counter() - started
+
+    consumer.cancel()
+    assert consumed[0] == total, (consumed[0], total)
+    return total / elapsed
+
+
+async def check_rejections():
+    app = build_app(queue_maxsize=1, enqueue_timeout=0.05)
+    body = json.dumps(load_updates()[0]).encode()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://webhook") as client:
+        response = await client.post(PATH, content=body, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        assert response.status_code == 403, response.status_code
+
+        headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+        first = await client.post(PATH, content=body, headers=headers)
+        second = await client.post(PATH, content=body, headers=headers)
+        assert first.status_code == 200, first.status_code
+        assert second.status_code == 503, second.status_code
+    print("secret token check: ok (403), backpressure check: ok (503 when queue is full)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=40, help="параллельных соединений, как max_connections")
+    args = parser.parse_args()
+
+    asyncio.run(check_rejections())
+    rate = asyncio.run(bench_throughput(args.updates, args.concurrency))
+    print(f"webhook ingestion: {args.updates} updates, concurrency={args.concurrency}: {rate:,.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# cache.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Все созданные кэши, для отчёта о hit ratio
+CACHES = {}
+
+
+class AsyncTTLCache:
+    """
+    Асинхронный кэш с TTL на ключ и LRU-вытеснением.
+
+    - Одновременные промахи по одному ключу разделяют один запрос к бэкенду
+      (single-flight): первый вызов загружает значение, остальные ждут его.
+    - Если загрузка упала, а в кэше есть просроченное значение не старше
+      stale_ttl, возвращается оно (бэкенд недоступен - показываем старые данные).
+    - Не больше maxsize ключей, вытесняются давно не использованные.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0, maxsize: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        # ключ -> (значение, годно до, можно отдавать устаревшим до)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.errors = 0
+        self.evictions = 0
+        CACHES[name] = self
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get_or_load(self, key, loader, ttl: float = None):
+        """
+        Возвращает значение из кэша или загружает его через await loader().
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            self.errors += 1
+            if entry is not None and entry[2] > time.monotonic():
+                self.stale_hits += 1
+                logger.warning(f"Cache {self.name}: serving stale {key!r} after load error: {e}")
+                future.set_result(entry[0])
+                return entry[0]
+            future.set_exception(e)
+            # Ожидающие получат исключение; помечаем его как полученное, чтобы asyncio не ругался
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def set(self, key, value, ttl: float = None):
+        now = time.monotonic()
+        expires = now + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires, expires + self.stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_hits": self.stale_hits,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+async def report_cache_stats(interval: float):
+    """
+    Периодически пишет в лог hit ratio всех кэшей.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for cache in CACHES.values():
+            stats = cache.stats()
+            logger.info(
+                f"Cache {stats['name']}: hit ratio {stats['hit_ratio']:.1%} "
+                f"(hits={stats['hits']}, misses={stats['misses']}, coalesced={stats['coalesced']}, "
+                f"stale={stats['stale_hits']}, errors={stats['errors']}, size={stats['size']})"
+            )
@@ -0,0 +1,75 @@
+# callback_router.py
+"""
+Маршрутизация нажатий inline-кнопок по callback_data без перебора регулярок.
+
+Обычный CallbackQueryHandler проверяет свою регулярку на каждом callback-обновлении,
+поэтому десятки отдельных хендлеров дают десятки проверок на одно нажатие.
+CallbackRouter - один хендлер, который разбирает callback_data один раз:
+
+    router = CallbackRouter()
+    router.route("my_account", my_account)              # точное совпадение
+    router.route_prefix("chatbot", send_chatbot_link)   # "chatbot_kpt" -> context.args == ["kpt"]
+
+Точные маршруты ищутся в словаре, префиксные - по границам "_" от самого
+длинного префикса к короткому, так что стоимость не зависит от числа кнопок.
+"""
+from telegram import Update
+from telegram.ext import BaseHandler
+
+
+class CallbackRouter(BaseHandler):
+    __slots__ = ("_routes", "_prefixes")
+
+    def __init__(self, block: bool = True):
+        super().__init__(None, block=block)
+        self._routes = {}
+        self._prefixes = {}
+
+    def route(self, data: str, callback):
+        """
+        Кнопка с callback_data, равным data.
+        """
+        self._routes[data] = callback
+        return callback
+
+    def route_prefix(self, namespace: str, callback):
+        """
+        Кнопки вида "<namespace>_<аргумент>"; аргумент передаётся в context.args[0].
+        """
+        self._prefixes[namespace] = callback
+        return callback
+
+    def resolve(self, data: str):
+        """
+        (callback, args) для callback_data или None, если маршрута нет.
+        """
+        callback = self._routes.get(data)
+        if callback is not None:
+            return callback, ()
+        end = data.rfind("_")
+        while end > 0:
+            callback = self._prefixes.get(data[:end])
+            if callback is not None:
+                return callback, (data[end + 1:],)
+            end = data.rfind("_", 0, end)
+        return None
+
+    def map_callbacks(self, func):
+        """
+        Заменяет каждый колбэк на func(callback) (например, обёртку с метриками).
+        """
+        self._routes = {data: func(callback) for data, callback in self._routes.items()}
+        self._prefixes = {namespace: func(callback) for namespace, callback in self._prefixes.items()}
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update) or not update.callback_query:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        return self.resolve(data)
+
+    async def handle_update(self, update, application, check_result, context):
+        callback, args = check_result
+        context.args = list(args)
+        return await callback(update, context)
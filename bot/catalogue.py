@@ -0,0 +1,49 @@
+# catalogue.py
+import logging
+
+from backend_client import backend_get
+from cache import AsyncTTLCache
+from config import CATALOGUE_CACHE_TTL, CATALOGUE_CACHE_STALE_TTL, CATALOGUE_CACHE_MAXSIZE
+
+logger = logging.getLogger(__name__)
+
+# Справочники меняются только через админку, поэтому их можно кэшировать
+catalogue_cache = AsyncTTLCache(
+    "catalogue",
+    ttl=CATALOGUE_CACHE_TTL,
+    stale_ttl=CATALOGUE_CACHE_STALE_TTL,
+    maxsize=CATALOGUE_CACHE_MAXSIZE,
+)
+
+
+async def _fetch_json(path: str, params=None):
+    response = await backend_get(path, params=params)
+    return response.json()
+
+
+async def get_subscription_plans() -> list:
+    """
+    Планы подписки (/subscription-plans/).
+    """
+    return await catalogue_cache.get_or_load(
+        "subscription-plans", lambda: _fetch_json("/subscription-plans/")
+    )
+
+
+async def get_payment_methods() -> list:
+    """
+    Способы оплаты (/payment-methods/).
+    """
+    return await catalogue_cache.get_or_load(
+        "payment-methods", lambda: _fetch_json("/payment-methods/")
+    )
+
+
+async def get_materials(material_type: str) -> list:
+    """
+    Материалы выбранного типа (/materials/?material_type=...).
+    """
+    return await catalogue_cache.get_or_load(
+        ("materials", material_type),
+        lambda: _fetch_json("/materials/", params={"material_type": material_type}),
+    )
@@ -1,8 +1,7 @@
 # client_card_handler.py
 import logging
-import requests
-from requests.exceptions import RequestException
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+import httpx
+from telegram import Update
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
@@ -15,8 +14,10 @@ from telegram.ext import (
 # Logging setup
 logger = logging.getLogger(__name__)
 
-# Backend API URL
-BACKEND_API_BASE_URL = "http://localhost:8000/blog"  # Adjust as needed
+from backend_client import backend_get, backend_post
+from keyboards import BACK_TO_MENU_KEYBOARD
+from other_handlers import show_main_menu, go_back_to_menu
+from user_state import FlowConversationHandler
 
 # States for client card flow
 FILL_CARD_NAME, FILL_CARD_AGE, FILL_CARD_GOALS, FILL_CARD_CHALLENGES = range(4)
@@ -37,11 +38,7 @@ async def fill_card_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     context.user_data["client_card_name"] = update.message.text
 
-    # Add "Назад" button
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await update.effective_chat.send_message("Пожалуйста, введите ваш возраст:", reply_markup=reply_markup)
+    await update.effective_chat.send_message("Пожалуйста, введите ваш возраст:", reply_markup=BACK_TO_MENU_KEYBOARD)
     return FILL_CARD_AGE
 
 async def fill_card_age(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -50,11 +47,7 @@ async def fill_card_age(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     context.user_data["client_card_age"] = update.message.text
 
-    # Add "Назад" button
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await update.effective_chat.send_message("Пожалуйста, опишите ваши цели:", reply_markup=reply_markup)
+    await update.effective_chat.send_message("Пожалуйста, опишите ваши цели:", reply_markup=BACK_TO_MENU_KEYBOARD)
     return FILL_CARD_GOALS
 
 async def fill_card_goals(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -63,11 +56,7 @@ async def fill_card_goals(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     context.user_data["client_card_goals"] = update.message.text
 
-    # Add "Назад" button
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await update.effective_chat.send_message("Пожалуйста, опишите ваши трудности:", reply_markup=reply_markup)
+    await update.effective_chat.send_message("Пожалуйста, опишите ваши трудности:", reply_markup=BACK_TO_MENU_KEYBOARD)
     return FILL_CARD_CHALLENGES
 
 async def fill_card_challenges(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -78,7 +67,6 @@ async def fill_card_challenges(update: Update, context: ContextTypes.DEFAULT_TYP
 
     # Prepare card data
     user = update.message.from_user
-    api_url = f"{BACKEND_API_BASE_URL}/client-cards/{user.id}/"
     data = {
         "name": context.user_data.get("client_card_name"),
         "age": context.user_data.get("client_card_age"),
@@ -87,8 +75,7 @@ async def fill_card_challenges(update: Update, context: ContextTypes.DEFAULT_TYP
     }
 
     try:
-        response = requests.post(api_url, json=data)
-        response.raise_for_status()
+        await backend_post(f"/client-cards/{user.id}/", json=data)
 
         # Display the saved card information
         card_info = (
@@ -106,7 +93,7 @@ async def fill_card_challenges(update: Update, context: ContextTypes.DEFAULT_TYP
 
         return ConversationHandler.END
 
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error saving client card: {e}")
         await update.effective_chat.send_message("Произошла ошибка при сохранении карты. Попробуйте позже.")
         return ConversationHandler.END
@@ -116,11 +103,8 @@ async def get_client_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Fetch and display the client's card information.
     """
     user = update.effective_user
-    api_url = f"{BACKEND_API_BASE_URL}/client-cards/{user.id}/"
-
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
+        response = await backend_get(f"/client-cards/{user.id}/")
         card_data = response.json()
 
         card_info = (
@@ -135,43 +119,12 @@ async def get_client_card(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Show main menu
         await show_main_menu(update, context)
 
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error fetching client card: {e}")
         await update.effective_chat.send_message("Произошла ошибка при получении карты. Попробуйте позже.")
 
-async def go_back_to_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """
-    Handle 'Назад' button to return to the main menu.
-    """
-    query = update.callback_query
-    await query.answer()
-    await show_main_menu(update, context)
-    return ConversationHandler.END
-
-async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """
-    Show the main menu.
-    """
-    keyboard = [
-        [InlineKeyboardButton("Заполнить карту", callback_data="fill_card")],
-        [InlineKeyboardButton("Пройти сеанс", callback_data="start_session")],
-        [InlineKeyboardButton("Материалы", callback_data="materials")],
-        [InlineKeyboardButton("Пополнить баланс", callback_data="recharge_balance")],
-        [InlineKeyboardButton("Подарить подписку", callback_data="gift_subscription")],
-        [InlineKeyboardButton("Мой аккаунт", callback_data="my_account")],
-        [InlineKeyboardButton("Обратная связь", callback_data="feedback")],
-        [InlineKeyboardButton("Поддержка", callback_data="support")],
-        [InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    if update.callback_query:
-        await update.callback_query.message.edit_text("Пожалуйста, выберите действие:", reply_markup=reply_markup)
-    else:
-        await update.message.reply_text("Пожалуйста, выберите действие:", reply_markup=reply_markup)
-
 # Conversation handler for filling client card
-client_card_conversation_handler = ConversationHandler(
+client_card_conversation_handler = FlowConversationHandler(
     entry_points=[CallbackQueryHandler(start_filling_card, pattern="^fill_card$")],
     states={
         FILL_CARD_NAME: [
@@ -192,6 +145,9 @@ client_card_conversation_handler = ConversationHandler(
         ],
     },
     fallbacks=[CallbackQueryHandler(go_back_to_menu, pattern="^go_back_to_menu$")],
+    name="client_card",
+    persistent=True,
+    flow_keys=("client_card_name", "client_card_age", "client_card_goals", "client_card_challenges"),
 )
 
 # Add handler to fetch client card
@@ -0,0 +1,190 @@
+# config.py
+import os
+
+# -------------------------------
+# Backend API
+# -------------------------------
+
+# Backend server URL (можно переопределить через переменные окружения)
+BACKEND_API_BASE_URL = os.environ.get("BACKEND_API_BASE_URL", "http://localhost:8000/blog")
+
+# Таймауты запросов к бэкенду, в секундах
+BACKEND_CONNECT_TIMEOUT = float(os.environ.get("BACKEND_CONNECT_TIMEOUT", "3"))
+BACKEND_TIMEOUT = float(os.environ.get("BACKEND_TIMEOUT", "10"))
+
+# Размер пула соединений общего клиента
+BACKEND_MAX_CONNECTIONS = int(os.environ.get("BACKEND_MAX_CONNECTIONS", "100"))
+BACKEND_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("BACKEND_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+# Таймауты отдельных эндпоинтов (префикс пути -> секунды), остальным - BACKEND_TIMEOUT.
+# Справочники должны отвечать быстро, оплата может занять дольше.
+BACKEND_ENDPOINT_TIMEOUTS = {
+    "/subscription-plans/": 3,
+    "/payment-methods/": 3,
+    "/materials/": 5,
+    "/consent-status/": 3,
+    "/bootstrap/": 5,
+    "/profile/": 5,
+    "/make-payment/": 20,
+    "/gift-subscription/": 20,
+}
+
+# Сколько раз повторять GET (и идемпотентный POST) после сетевой ошибки или 502/503/504
+BACKEND_GET_RETRIES = int(os.environ.get("BACKEND_GET_RETRIES", "2"))
+# Базовая пауза перед повтором, удваивается с каждой попыткой (со случайным разбросом)
+BACKEND_RETRY_BACKOFF = float(os.environ.get("BACKEND_RETRY_BACKOFF", "0.2"))
+# Повторов не больше этой доли от всех запросов за последние 10 секунд (плюс 1 повтор в секунду)
+BACKEND_RETRY_BUDGET_RATIO = float(os.environ.get("BACKEND_RETRY_BUDGET_RATIO", "0.2"))
+
+# Сколько последних GET-ответов с ETag хранить для условных запросов (If-None-Match -> 304)
+BACKEND_ETAG_CACHE_SIZE = int(os.environ.get("BACKEND_ETAG_CACHE_SIZE", "5000"))
+
+# Предохранитель: после стольких ошибок подряд запросы к бэкенду сразу отклоняются
+BACKEND_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BACKEND_BREAKER_FAILURE_THRESHOLD", "5"))
+# Через сколько секунд пропустить пробный запрос
+BACKEND_BREAKER_RECOVERY_TIMEOUT = float(os.environ.get("BACKEND_BREAKER_RECOVERY_TIMEOUT", "15"))
+
+# -------------------------------
+# Telegram
+# -------------------------------
+
+# Токен бота (в продакшене задавайте через переменную окружения)
+TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "7841284305:AAH3qeBWiTWXCwLmc2i9ulNGv_woLXO3WAo")
+
+# Режим получения обновлений: "polling" или "webhook"
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+
+# Максимум обновлений, принятых, но ещё не обработанных (в очереди и в работе).
+# Когда лимит достигнут, приём новых обновлений (webhook или getUpdates) ждёт.
+UPDATE_QUEUE_MAXSIZE = int(os.environ.get("UPDATE_QUEUE_MAXSIZE", "1000"))
+
+# Сколько обновлений разных чатов обрабатывается одновременно
+MAX_CONCURRENT_UPDATES = int(os.environ.get("MAX_CONCURRENT_UPDATES", "64"))
+
+# -------------------------------
+# Webhook
+# -------------------------------
+
+# Публичный URL, который регистрируется в Telegram через setWebhook
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+# Путь ASGI-эндпоинта, принимающего обновления
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram/webhook")
+# Значение заголовка X-Telegram-Bot-Api-Secret-Token. Если пусто, WebhookApp сам генерирует
+# секрет при регистрации вебхука; без WEBHOOK_URL секрет обязателен
+WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN", "")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+# Максимум параллельных соединений Telegram к вебхуку
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Сколько секунд ждать места в очереди, прежде чем ответить 503 (Telegram повторит доставку)
+WEBHOOK_ENQUEUE_TIMEOUT = float(os.environ.get("WEBHOOK_ENQUEUE_TIMEOUT", "5"))
+
+# -------------------------------
+# Ограничение исходящих запросов к Bot API
+# -------------------------------
+
+# Общий лимит сообщений в секунду для всего бота
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.environ.get("RATE_LIMIT_GLOBAL_PER_SECOND", "30"))
+# Допустимый всплеск сверх равномерного темпа
+RATE_LIMIT_GLOBAL_BURST = float(os.environ.get("RATE_LIMIT_GLOBAL_BURST", "5"))
+# Лимит для одного личного чата и допустимый всплеск
+RATE_LIMIT_CHAT_PER_SECOND = float(os.environ.get("RATE_LIMIT_CHAT_PER_SECOND", "1"))
+RATE_LIMIT_CHAT_BURST = float(os.environ.get("RATE_LIMIT_CHAT_BURST", "3"))
+# Лимит для группового чата, сообщений в минуту
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.environ.get("RATE_LIMIT_GROUP_PER_MINUTE", "20"))
+# Сколько раз повторять запрос после ответа 429 (retry_after)
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "3"))
+
+# -------------------------------
+# Кэш справочников (планы, способы оплаты, материалы)
+# -------------------------------
+
+# Сколько секунд данные считаются свежими
+CATALOGUE_CACHE_TTL = float(os.environ.get("CATALOGUE_CACHE_TTL", "60"))
+# Сколько ещё секунд можно отдавать устаревшие данные, если бэкенд недоступен
+CATALOGUE_CACHE_STALE_TTL = float(os.environ.get("CATALOGUE_CACHE_STALE_TTL", "3600"))
+CATALOGUE_CACHE_MAXSIZE = int(os.environ.get("CATALOGUE_CACHE_MAXSIZE", "256"))
+# Как часто писать в лог hit ratio кэшей и состояние предохранителя бэкенда, в секундах
+CACHE_STATS_INTERVAL = float(os.environ.get("CACHE_STATS_INTERVAL", "300"))
+
+# -------------------------------
+# Сообщения поддержки
+# -------------------------------
+
+# Сколько секунд копить сообщения поддержки перед отправкой одной пачкой
+SUPPORT_BATCH_DELAY = float(os.environ.get("SUPPORT_BATCH_DELAY", "0.005"))
+# Пачка отправляется сразу, как только наберётся столько сообщений
+SUPPORT_BATCH_MAX_SIZE = int(os.environ.get("SUPPORT_BATCH_MAX_SIZE", "100"))
+
+# Ответы операторов забирает одна фоновая задача через long-poll /support/changes/
+SUPPORT_FEED_ENABLED = os.environ.get("SUPPORT_FEED_ENABLED", "1") == "1"
+# Сколько секунд бэкенд держит запрос, если новых ответов нет
+SUPPORT_FEED_TIMEOUT = float(os.environ.get("SUPPORT_FEED_TIMEOUT", "25"))
+# Максимум ответов за один запрос
+SUPPORT_FEED_LIMIT = int(os.environ.get("SUPPORT_FEED_LIMIT", "100"))
+
+# -------------------------------
+# Напоминания об окончании подписки
+# -------------------------------
+
+EXPIRY_REMINDER_ENABLED = os.environ.get("EXPIRY_REMINDER_ENABLED", "1") == "1"
+# Как часто запускать рассылку, в секундах (первый запуск - при старте бота)
+EXPIRY_REMINDER_INTERVAL = float(os.environ.get("EXPIRY_REMINDER_INTERVAL", "3600"))
+# Сколько подписок забирать из бэкенда за один запрос
+EXPIRY_REMINDER_PAGE_SIZE = int(os.environ.get("EXPIRY_REMINDER_PAGE_SIZE", "500"))
+# Сколько напоминаний одновременно ждут своей очереди в PriorityRateLimiter
+EXPIRY_REMINDER_CONCURRENCY = int(os.environ.get("EXPIRY_REMINDER_CONCURRENCY", "20"))
+
+# -------------------------------
+# Состояние пользователей в памяти
+# -------------------------------
+
+# Через сколько секунд без обновлений от пользователя его user_data и
+# незавершённые разговоры удаляются
+USER_STATE_IDLE_TIMEOUT = float(os.environ.get("USER_STATE_IDLE_TIMEOUT", "1800"))
+# Максимум пользователей с состоянием в памяти; сверх него удаляются самые давно неактивные
+USER_STATE_MAX_USERS = int(os.environ.get("USER_STATE_MAX_USERS", "50000"))
+# Как часто искать простаивающих, в секундах
+USER_STATE_SWEEP_INTERVAL = float(os.environ.get("USER_STATE_SWEEP_INTERVAL", "60"))
+
+# -------------------------------
+# Запись входящих обновлений (для bench_replay.py)
+# -------------------------------
+
+# gzip JSONL, куда пишутся входящие обновления с обезличенными id; пусто - не писать
+UPDATE_RECORD_PATH = os.environ.get("UPDATE_RECORD_PATH", "")
+# Ключ для псевдонимов id; пусто - случайный на каждый запуск
+UPDATE_RECORD_SALT = os.environ.get("UPDATE_RECORD_SALT", "")
+# Доля чатов, чьи обновления пишутся (чат пишется целиком или не пишется вовсе)
+UPDATE_RECORD_SAMPLE = float(os.environ.get("UPDATE_RECORD_SAMPLE", "1"))
+# После стольких обновлений запись останавливается
+UPDATE_RECORD_MAX_UPDATES = int(os.environ.get("UPDATE_RECORD_MAX_UPDATES", "1000000"))
+# Маскировать текст сообщений (буквы -> x, цифры -> 7); команды и callback_data не меняются
+UPDATE_RECORD_REDACT_TEXT = os.environ.get("UPDATE_RECORD_REDACT_TEXT", "1") == "1"
+
+# -------------------------------
+# Метрики
+# -------------------------------
+
+# Порт HTTP-эндпоинта /metrics в формате Prometheus (0 - не запускать)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+# По умолчанию метрики доступны только локально
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+# Обновления, обработка которых (вместе с ожиданием в очереди) заняла дольше
+# стольких секунд, пишутся в лог с update_id и разбивкой по времени (0 - не писать)
+SLOW_UPDATE_THRESHOLD = float(os.environ.get("SLOW_UPDATE_THRESHOLD", "2"))
+
+# -------------------------------
+# Локальные данные бота
+# -------------------------------
+
+# Папка для файлов, которые бот хранит между перезапусками
+BOT_DATA_DIR = os.environ.get("BOT_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+# SQLite с file_id уже загруженных в Telegram материалов
+FILE_ID_DB_PATH = os.environ.get("FILE_ID_DB_PATH", os.path.join(BOT_DATA_DIR, "file_ids.sqlite3"))
+# Последний доставленный ответ оператора (cursor ленты /support/changes/)
+SUPPORT_FEED_CURSOR_PATH = os.environ.get("SUPPORT_FEED_CURSOR_PATH", os.path.join(BOT_DATA_DIR, "support_feed_cursor"))
+# SQLite с user_data и состояниями незавершённых разговоров
+BOT_STATE_DB_PATH = os.environ.get("BOT_STATE_DB_PATH", os.path.join(BOT_DATA_DIR, "bot_state.sqlite3"))
+# Как часто изменения состояния пишутся в базу, в секундах (столько теряется при аварийном падении)
+PERSISTENCE_UPDATE_INTERVAL = float(os.environ.get("PERSISTENCE_UPDATE_INTERVAL", "5"))
@@ -0,0 +1,110 @@
+# expiry_reminders.py
+"""
+Напоминания об окончании подписки.
+
+Раз в EXPIRY_REMINDER_INTERVAL секунд бот забирает из бэкенда подписки,
+которые заканчиваются в ближайшие дни (GET /subscriptions/expiring/, страницами
+с keyset-курсором), рассылает напоминания с самым низким приоритетом через
+PriorityRateLimiter и после каждой страницы отмечает отправленные
+(POST /subscriptions/expiry-reminders/). Бэкенд не отдаёт уже отмеченные
+подписки, поэтому повторный запуск (или перезапуск бота) никому не пишет дважды.
+Если бот упал между отправкой и отметкой, эта страница будет отправлена ещё раз.
+"""
+import asyncio
+import datetime
+import logging
+
+from telegram.error import BadRequest, Forbidden, TelegramError
+
+from backend_client import backend_get, backend_post
+from config import (
+    EXPIRY_REMINDER_CONCURRENCY,
+    EXPIRY_REMINDER_INTERVAL,
+    EXPIRY_REMINDER_PAGE_SIZE,
+)
+from keyboards import EXPIRY_REMINDER_KEYBOARD, EXPIRY_REMINDER_TEXT
+from rate_limiter import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+
+def _format_date(value) -> str:
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).strftime("%d.%m.%Y")
+    except ValueError:
+        return str(value)
+
+
+class ExpiryReminderJob:
+    def __init__(self, page_size: int = EXPIRY_REMINDER_PAGE_SIZE, concurrency: int = EXPIRY_REMINDER_CONCURRENCY):
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.sent = 0
+        self.undeliverable = 0
+        self.failed = 0
+
+    async def _remind(self, bot, subscription: dict, semaphore: asyncio.Semaphore):
+        """
+        Отметка для бэкенда или None, если напоминание стоит повторить при следующем запуске.
+        """
+        async with semaphore:
+            try:
+                await bot.send_message(
+                    chat_id=subscription["telegram_id"],
+                    text=EXPIRY_REMINDER_TEXT.format(plan=subscription["plan"],
+                                                     end_date=_format_date(subscription["end_date"])),
+                    reply_markup=EXPIRY_REMINDER_KEYBOARD,
+                    rate_limit_args={"priority": PRIORITY_BULK},
+                )
+            except (Forbidden, BadRequest) as e:
+                # Бот заблокирован или чат не найден - повтор не поможет
+                self.undeliverable += 1
+                logger.info(f"Expiry reminder for subscription {subscription['id']} not delivered: {e}")
+                return {"subscription_id": subscription["id"], "delivered": False}
+            except TelegramError as e:
+                self.failed += 1
+                logger.warning(f"Expiry reminder for subscription {subscription['id']} failed, will retry: {e}")
+                return None
+        self.sent += 1
+        return {"subscription_id": subscription["id"], "delivered": True}
+
+    async def run_once(self, bot) -> int:
+        """
+        Один проход по всем истекающим подпискам. Возвращает число отправленных напоминаний.
+        """
+        sent_before = self.sent
+        semaphore = asyncio.Semaphore(self.concurrency)
+        cursor = None
+        while True:
+            params = {"limit": self.page_size}
+            if cursor:
+                params["after"] = cursor
+            data = (await backend_get("/subscriptions/expiring/", params=params)).json()
+            subscriptions = data.get("subscriptions") or []
+            if subscriptions:
+                results = await asyncio.gather(*(self._remind(bot, subscription, semaphore)
+                                                 for subscription in subscriptions))
+                reminders = [result for result in results if result is not None]
+                if reminders:
+                    await backend_post("/subscriptions/expiry-reminders/", json={"reminders": reminders})
+            cursor = data.get("next")
+            if not cursor:
+                return self.sent - sent_before
+
+    async def run(self, bot, interval: float = EXPIRY_REMINDER_INTERVAL):
+        """
+        Фоновая задача: запускает рассылку сразу и затем каждые interval секунд.
+        """
+        while True:
+            started = asyncio.get_running_loop().time()
+            try:
+                sent = await self.run_once(bot)
+                if sent:
+                    logger.info(f"Sent {sent} subscription expiry reminders "
+                                f"in {asyncio.get_running_loop().time() - started:.1f}s")
+            except Exception as e:
+                logger.error(f"Subscription expiry reminders failed: {e!r}")
+            await asyncio.sleep(interval)
+
+
+expiry_reminder_job = ExpiryReminderJob()
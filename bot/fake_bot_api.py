@@ -0,0 +1,353 @@
+# fake_bot_api.py
+"""
+Поддельный Telegram Bot API для локальных тестов и нагрузочных прогонов.
+
+ASGI-приложение, которое понимает запросы python-telegram-bot
+(POST /bot<token>/<method>, form-urlencoded или JSON) и, как настоящий
+Telegram, отвечает 429 с retry_after при превышении лимитов: общего на бота
+и отдельного на каждый чат. Каждый ответ можно задержать на latency секунд.
+
+Обновления от "пользователей" кладутся через push_update(): бот получает их
+через getUpdates (long polling) или, после setWebhook, POST-запросом на URL
+вебхука. Подписчики из message_listeners видят каждое сообщение бота - так
+нагрузочный прогон (bench_load.py) понимает, что бот ответил.
+
+Подключение бота без сети:
+
+    fake = FakeBotAPI(global_per_second=30, chat_per_second=4)
+    bot = Bot(TOKEN, base_url="http://fake-telegram/bot",
+              request=fake.request(), get_updates_request=fake.request())
+"""
+import asyncio
+import collections
+import hashlib
+import itertools
+import json
+import logging
+import random
+import time
+from urllib.parse import parse_qsl
+
+import httpx
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 7841284305, "is_bot": True, "first_name": "Bot", "username": "bot"}
+
+INT_PARAMS = frozenset({"chat_id", "message_id", "offset", "limit", "timeout", "max_connections"})
+
+# Методы без лимитов на сообщения
+UNLIMITED_METHODS = frozenset({
+    "getMe", "answerCallbackQuery", "getUpdates", "setWebhook", "deleteWebhook", "getWebhookInfo",
+})
+
+
+class FakeBotAPI:
+    """
+    Лимиты проверяются скользящим окном в 1 секунду: не больше global_per_second
+    сообщений бота в целом и не больше chat_per_second сообщений в один чат
+    (Telegram допускает короткие всплески сверх 1 сообщения в секунду).
+
+    latency и latency_jitter задают задержку ответа на любой метод:
+    latency * uniform(1 - jitter, 1 + jitter) секунд. webhook_transport -
+    httpx-транспорт для доставки на вебхук (например, ASGITransport с
+    WebhookApp); по умолчанию обновления отправляются по сети.
+    """
+
+    def __init__(self, global_per_second: int = 30, chat_per_second: int = 4, retry_after: int = 1,
+                 latency: float = 0.0, latency_jitter: float = 0.5, webhook_transport=None,
+                 keep_sent: bool = True):
+        self.global_per_second = global_per_second
+        self.chat_per_second = chat_per_second
+        self.retry_after = retry_after
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.keep_sent = keep_sent
+        self._global_window = collections.deque()
+        self._chat_windows = collections.defaultdict(collections.deque)
+        self._message_ids = itertools.count(1)
+        self.sent = []
+        self.rejected = 0
+        self.calls = collections.Counter()
+        self.message_listeners = []
+
+        # Обновления, ещё не подтверждённые ботом (offset в getUpdates)
+        self._update_ids = itertools.count(1)
+        self._pending_updates = collections.deque()
+        self._updates_available = asyncio.Event()
+        self.webhook = None
+        self.webhook_transport = webhook_transport
+        self._webhook_client = None
+        self._webhook_workers = []
+        self.webhook_deliveries = 0
+        self.webhook_redeliveries = 0
+
+        self.methods = {
+            "getMe": self.get_me,
+            "getUpdates": self.get_updates,
+            "setWebhook": self.set_webhook,
+            "deleteWebhook": self.delete_webhook,
+            "getWebhookInfo": self.get_webhook_info,
+            "sendMessage": self.send_message,
+            "editMessageText": self.edit_message_text,
+            "answerCallbackQuery": self.answer_callback_query,
+            "sendPhoto": self.send_photo,
+            "sendDocument": self.send_document,
+        }
+
+    # -------------------------------
+    # Подключение
+    # -------------------------------
+
+    def request(self, request_class=HTTPXRequest, **kwargs) -> HTTPXRequest:
+        """
+        HTTPXRequest (или его подкласс), отправляющий запросы прямо в это приложение (без сокетов).
+        """
+        kwargs.setdefault("connection_pool_size", 256)
+        return request_class(httpx_kwargs={"transport": httpx.ASGITransport(app=self)}, **kwargs)
+
+    async def close(self):
+        """
+        Останавливает доставку на вебхук.
+        """
+        await self._stop_webhook_delivery()
+
+    # -------------------------------
+    # ASGI
+    # -------------------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        method = scope["path"].rstrip("/").rsplit("/", 1)[-1]
+        params = self._parse_params(dict(scope["headers"]).get(b"content-type", b""), body)
+        handler = self.methods.get(method)
+        if handler is None:
+            status, payload = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+        else:
+            status, payload = await self._call(method, handler, params)
+
+        raw = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(raw)).encode())],
+        })
+        await send({"type": "http.response.body", "body": raw})
+
+    @staticmethod
+    def _parse_params(content_type: bytes, body: bytes) -> dict:
+        if not body:
+            return {}
+        if content_type.startswith(b"application/json"):
+            return json.loads(body)
+        # PTB передаёт строки как есть, а остальные значения - в виде JSON
+        params = {}
+        for key, value in parse_qsl(body.decode()):
+            if key in INT_PARAMS:
+                params[key] = int(value)
+            elif value[:1] in ("{", "["):
+                params[key] = json.loads(value)
+            else:
+                params[key] = value
+        return params
+
+    async def _call(self, method: str, handler, params: dict):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(1 - self.latency_jitter, 1 + self.latency_jitter))
+        chat_id = params.get("chat_id")
+        if method not in UNLIMITED_METHODS:
+            if not self._allow(chat_id):
+                self.rejected += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+        result = handler(params)
+        if asyncio.iscoroutine(result):
+            result = await result
+        if isinstance(result, tuple):
+            return result  # Метод сам сформировал ошибку
+        return 200, {"ok": True, "result": result}
+
+    @staticmethod
+    def _error(status: int, description: str):
+        return status, {"ok": False, "error_code": status, "description": description}
+
+    def _allow(self, chat_id) -> bool:
+        now = time.monotonic()
+        windows = [(self._global_window, self.global_per_second)]
+        if chat_id is not None:
+            windows.append((self._chat_windows[chat_id], self.chat_per_second))
+        for window, limit in windows:
+            while window and now - window[0] >= 1:
+                window.popleft()
+            if len(window) >= limit:
+                return False
+        for window, _ in windows:
+            window.append(now)
+        return True
+
+    # -------------------------------
+    # Методы Bot API
+    # -------------------------------
+
+    def _message(self, method: str, params: dict, **extra) -> dict:
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": params.get("message_id") or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private" if int(chat_id) > 0 else "group"},
+            "from": BOT_USER,
+            **extra,
+        }
+        if params.get("reply_markup"):
+            message["reply_markup"] = params["reply_markup"]
+        if self.keep_sent:
+            self.sent.append({"time": time.monotonic(), "method": method, "chat_id": chat_id,
+                              "text": extra.get("text") or extra.get("caption")})
+        for listener in self.message_listeners:
+            listener(method, message)
+        return message
+
+    @staticmethod
+    def _file(source) -> dict:
+        digest = hashlib.sha1(str(source).encode()).hexdigest()
+        return {"file_id": f"fake-{digest}", "file_unique_id": digest[:16], "file_size": 1024}
+
+    def get_me(self, params):
+        return {**BOT_USER, "can_join_groups": True, "can_read_all_group_messages": False,
+                "supports_inline_queries": False}
+
+    def send_message(self, params):
+        return self._message("sendMessage", params, text=params.get("text", ""))
+
+    def edit_message_text(self, params):
+        return self._message("editMessageText", params, text=params.get("text", ""))
+
+    def answer_callback_query(self, params):
+        return True
+
+    def send_photo(self, params):
+        photo = params.get("photo")
+        return self._message("sendPhoto", params, caption=params.get("caption"),
+                             photo=[{**self._file(photo), "width": 800, "height": 600}])
+
+    def send_document(self, params):
+        document = params.get("document")
+        return self._message("sendDocument", params, caption=params.get("caption"), document=self._file(document))
+
+    # -------------------------------
+    # Получение обновлений
+    # -------------------------------
+
+    def push_update(self, update: dict) -> int:
+        """
+        Ставит обновление в очередь для бота и возвращает присвоенный update_id.
+        """
+        update_id = next(self._update_ids)
+        self._pending_updates.append({**update, "update_id": update_id})
+        self._updates_available.set()
+        return update_id
+
+    @property
+    def pending_update_count(self) -> int:
+        return len(self._pending_updates)
+
+    async def get_updates(self, params):
+        if self.webhook is not None:
+            return self._error(409, "Conflict: can't use getUpdates method while webhook is active; "
+                                    "use deleteWebhook to delete the webhook first")
+        offset = params.get("offset") or 0
+        limit = params.get("limit") or 100
+        timeout = params.get("timeout") or 0
+
+        # Всё, что меньше offset, бот уже получил
+        while self._pending_updates and self._pending_updates[0]["update_id"] < offset:
+            self._pending_updates.popleft()
+        if not self._pending_updates and timeout:
+            self._updates_available.clear()
+            try:
+                await asyncio.wait_for(self._updates_available.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._pending_updates, limit))
+
+    async def set_webhook(self, params):
+        url = params.get("url")
+        if not url:
+            return await self.delete_webhook(params)
+        await self._stop_webhook_delivery()
+        self.webhook = {
+            "url": url,
+            "secret_token": params.get("secret_token"),
+            "max_connections": params.get("max_connections") or 40,
+        }
+        self._webhook_client = httpx.AsyncClient(transport=self.webhook_transport)
+        self._webhook_workers = [
+            asyncio.create_task(self._deliver_webhook_updates()) for _ in range(self.webhook["max_connections"])
+        ]
+        return True
+
+    async def delete_webhook(self, params):
+        await self._stop_webhook_delivery()
+        self.webhook = None
+        if str(params.get("drop_pending_updates", "")).lower() == "true":
+            self._pending_updates.clear()
+        return True
+
+    def get_webhook_info(self, params):
+        return {
+            "url": self.webhook["url"] if self.webhook else "",
+            "has_custom_certificate": False,
+            "pending_update_count": self.pending_update_count,
+            "max_connections": self.webhook["max_connections"] if self.webhook else None,
+        }
+
+    async def _stop_webhook_delivery(self):
+        for task in self._webhook_workers:
+            task.cancel()
+        await asyncio.gather(*self._webhook_workers, return_exceptions=True)
+        self._webhook_workers = []
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+
+    async def _deliver_webhook_updates(self):
+        """
+        Один из max_connections "потоков" доставки: как и Telegram, повторяет
+        обновление, пока вебхук не ответит 2xx.
+        """
+        headers = {"Content-Type": "application/json"}
+        if self.webhook["secret_token"]:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook["secret_token"]
+        while True:
+            while not self._pending_updates:
+                self._updates_available.clear()
+                await self._updates_available.wait()
+            update = self._pending_updates.popleft()
+            delay = 0.05
+            while True:
+                try:
+                    response = await self._webhook_client.post(self.webhook["url"], content=json.dumps(update),
+                                                               headers=headers)
+                    if response.is_success:
+                        break
+                    logger.debug(f"Webhook answered {response.status_code} for update {update['update_id']}")
+                except httpx.HTTPError as e:
+                    logger.debug(f"Webhook delivery of update {update['update_id']} failed: {e}")
+                self.webhook_redeliveries += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2)
+            self.webhook_deliveries += 1
@@ -0,0 +1,93 @@
+# file_id_store.py
+import asyncio
+import logging
+import os
+import sqlite3
+
+from config import FILE_ID_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class FileIdStore:
+    """
+    Запоминает file_id, который Telegram вернул после первой отправки материала.
+
+    Ключ - id материала и хэш содержимого документа (document_hash из бэкенда).
+    Когда документ заменяют в админке, хэш меняется, старая запись перестаёт
+    подходить и перезаписывается после следующей загрузки.
+
+    Записей немного (по одной на материал), поэтому все они держатся в памяти,
+    а SQLite нужен только для того, чтобы пережить перезапуск бота. Читается
+    база один раз (ensure_loaded() в post_init) и в отдельном потоке.
+    """
+
+    def __init__(self, path: str = FILE_ID_DB_PATH):
+        self.path = path
+        self._entries = {}
+        self._loaded = False
+        self._loading = None
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS material_file_ids ("
+            " material_id INTEGER PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " file_id TEXT NOT NULL)"
+        )
+        return connection
+
+    def load(self):
+        with self._connect() as connection:
+            rows = connection.execute("SELECT material_id, content_hash, file_id FROM material_file_ids").fetchall()
+        self._entries = {material_id: (content_hash, file_id) for material_id, content_hash, file_id in rows}
+        self._loaded = True
+        logger.info(f"Loaded {len(self._entries)} cached Telegram file ids")
+
+    async def ensure_loaded(self):
+        """
+        Загружает записи в отдельном потоке; параллельные вызовы ждут одну загрузку.
+        """
+        if self._loaded:
+            return
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(asyncio.to_thread(self.load))
+        try:
+            await asyncio.shield(self._loading)
+        finally:
+            if self._loading is not None and self._loading.done():
+                # После ошибки следующий вызов попробует снова
+                self._loading = None
+
+    async def get(self, material_id: int, content_hash: str):
+        await self.ensure_loaded()
+        entry = self._entries.get(material_id)
+        if entry and entry[0] == content_hash:
+            return entry[1]
+        return None
+
+    async def set(self, material_id: int, content_hash: str, file_id: str):
+        self._entries[material_id] = (content_hash, file_id)
+        await asyncio.to_thread(self._write, material_id, content_hash, file_id)
+
+    async def forget(self, material_id: int):
+        self._entries.pop(material_id, None)
+        await asyncio.to_thread(self._delete, material_id)
+
+    def _write(self, material_id, content_hash, file_id):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO material_file_ids (material_id, content_hash, file_id) VALUES (?, ?, ?)",
+                (material_id, content_hash, file_id),
+            )
+
+    def _delete(self, material_id):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM material_file_ids WHERE material_id = ?", (material_id,))
+
+
+file_id_store = FileIdStore()
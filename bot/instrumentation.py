@@ -0,0 +1,241 @@
+# instrumentation.py
+"""
+Метрики обработки обновлений: сколько обновление ждало в очереди, сколько
+работал хендлер и сколько из этого ушло на бэкенд и на Bot API.
+
+Все гистограммы размечены именем хендлера и исходом. Время бэкенда и
+Telegram привязывается к хендлеру через contextvar, который
+PerChatUpdateProcessor выставляет на время обработки обновления.
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+from cache import CACHES
+from callback_router import CallbackRouter
+from metrics import COLLECTORS, Histogram, sample_lines
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = Histogram(
+    "bot_update_queue_wait_seconds",
+    "Time from receiving an update until its processing starts.",
+    ["handler", "outcome"],
+)
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds",
+    "Wall time of a handler callback.",
+    ["handler", "outcome"],
+)
+BACKEND_DURATION = Histogram(
+    "bot_backend_request_duration_seconds",
+    "Duration of a single request to the Django backend.",
+    ["handler", "endpoint", "outcome"],
+)
+TELEGRAM_DURATION = Histogram(
+    "bot_telegram_request_duration_seconds",
+    "Duration of a single Bot API request.",
+    ["handler", "method", "outcome"],
+)
+
+
+class UpdateTrace:
+    __slots__ = ("update_id", "queue_wait", "queue_wait_recorded", "handler", "outcome",
+                 "backend_time", "telegram_time")
+
+    def __init__(self, update_id, queue_wait: float):
+        self.update_id = update_id
+        self.queue_wait = queue_wait
+        self.queue_wait_recorded = False
+        self.handler = None
+        self.outcome = None
+        self.backend_time = 0.0
+        self.telegram_time = 0.0
+
+
+_current_trace = contextvars.ContextVar("update_trace", default=None)
+# Порог медленного обновления в секундах, 0 - не логировать
+slow_update_threshold = 0.0
+
+
+def current_handler() -> str:
+    trace = _current_trace.get()
+    if trace is None or trace.handler is None:
+        return "none"
+    return trace.handler
+
+
+@contextlib.contextmanager
+def trace_update(update, queue_wait: float):
+    """
+    Оборачивает обработку одного обновления (вызывается из PerChatUpdateProcessor).
+    """
+    trace = UpdateTrace(getattr(update, "update_id", None), queue_wait)
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        total = time.perf_counter() - started
+        if not trace.queue_wait_recorded:
+            QUEUE_WAIT.observe(queue_wait, handler="none", outcome="unhandled")
+        if slow_update_threshold and total + queue_wait >= slow_update_threshold:
+            logger.warning(
+                f"Slow update {trace.update_id}: handler={trace.handler or 'none'} "
+                f"outcome={trace.outcome or 'unhandled'} total={total:.3f}s queue={queue_wait:.3f}s "
+                f"backend={trace.backend_time:.3f}s telegram={trace.telegram_time:.3f}s"
+            )
+
+
+# -------------------------------
+# Хендлеры
+# -------------------------------
+
+def instrument_callback(name: str, callback):
+    if getattr(callback, "__instrumented__", False):
+        return callback
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        trace = _current_trace.get()
+        previous = trace.handler if trace else None
+        if trace is not None:
+            trace.handler = name
+        outcome = "ok"
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, handler=name, outcome=outcome)
+            if trace is not None:
+                if not trace.queue_wait_recorded:
+                    QUEUE_WAIT.observe(trace.queue_wait, handler=name, outcome=outcome)
+                    trace.queue_wait_recorded = True
+                # Хендлер, вызванный из другого хендлера, не перетирает внешний
+                if previous is not None:
+                    trace.handler = previous
+                else:
+                    trace.outcome = outcome
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _callback_name(callback) -> str:
+    return f"{callback.__module__}.{callback.__name__}"
+
+
+def _instrument_handler(handler):
+    if isinstance(handler, CallbackRouter):
+        handler.map_callbacks(lambda callback: instrument_callback(_callback_name(callback), callback))
+        return
+    if isinstance(handler, ConversationHandler):
+        for inner in handler.entry_points + handler.fallbacks:
+            _instrument_handler(inner)
+        for handlers in handler.states.values():
+            for inner in handlers:
+                _instrument_handler(inner)
+        return
+    callback = getattr(handler, "callback", None)
+    if callback is not None:
+        handler.callback = instrument_callback(_callback_name(callback), callback)
+
+
+def instrument_handlers(application):
+    """
+    Оборачивает колбэки всех зарегистрированных хендлеров (включая состояния ConversationHandler).
+    """
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+# -------------------------------
+# Бэкенд и Bot API
+# -------------------------------
+
+def record_backend_call(endpoint: str, outcome: str, elapsed: float):
+    BACKEND_DURATION.observe(elapsed, handler=current_handler(), endpoint=endpoint, outcome=outcome)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.backend_time += elapsed
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """
+    HTTPXRequest, замеряющий каждый запрос к Bot API.
+    """
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        outcome = "error"
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+            )
+            outcome = "ok" if code == 200 else str(code)
+            return code, payload
+        finally:
+            elapsed = time.perf_counter() - started
+            TELEGRAM_DURATION.observe(elapsed, handler=current_handler(), method=api_method, outcome=outcome)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.telegram_time += elapsed
+
+
+# -------------------------------
+# Состояние кэшей и предохранителя
+# -------------------------------
+
+def register_stats_collectors(breaker, retry_budget):
+    """
+    Добавляет в /metrics состояние предохранителя бэкенда, бюджета повторов и кэшей.
+    """
+    breaker_states = ("closed", "half_open", "open")
+
+    def collect():
+        stats = breaker.stats()
+        lines = sample_lines(
+            "bot_backend_breaker_state",
+            "Backend circuit breaker state (1 for the current state).",
+            [({"breaker": stats["name"], "state": state}, int(stats["state"] == state)) for state in breaker_states],
+        )
+        for field in ("opened", "rejected", "failures", "successes"):
+            lines += sample_lines(
+                f"bot_backend_breaker_{field}_total",
+                f"Backend circuit breaker {field} since start.",
+                [({"breaker": stats["name"]}, stats[field])],
+                kind="counter",
+            )
+        lines += sample_lines(
+            "bot_backend_retry_budget_exhausted_total",
+            "Retries refused by the retry budget.",
+            [({}, retry_budget.stats()["exhausted"])],
+            kind="counter",
+        )
+
+        cache_stats = [cache.stats() for cache in CACHES.values()]
+        for field in ("hits", "misses", "coalesced", "stale_hits", "errors", "evictions"):
+            lines += sample_lines(
+                f"bot_cache_{field}_total",
+                f"Cache {field} since start.",
+                [({"cache": stats["name"]}, stats[field]) for stats in cache_stats],
+                kind="counter",
+            )
+        lines += sample_lines("bot_cache_size", "Number of cached keys.",
+                              [({"cache": stats["name"]}, stats["size"]) for stats in cache_stats])
+        return lines
+
+    COLLECTORS.append(collect)
@@ -0,0 +1,187 @@
+# keyboards.py
+"""
+Клавиатуры и тексты меню.
+
+Статические клавиатуры собираются один раз при импорте модуля и
+используются всеми обработчиками. InlineKeyboardMarkup в python-telegram-bot
+неизменяемый, поэтому один объект можно безопасно отдавать во все чаты.
+
+Клавиатуры из данных бэкенда (планы, способы оплаты) строит
+catalogue_keyboard: результат запоминается, пока кэш справочников
+возвращает тот же список.
+"""
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+def _markup(*rows) -> InlineKeyboardMarkup:
+    """
+    Каждая строка - список пар (текст, callback_data).
+    """
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(text, callback_data=data) for text, data in row] for row in rows]
+    )
+
+# -------------------------------
+# Общие кнопки
+# -------------------------------
+
+BACK_TO_MENU_KEYBOARD = _markup([("Назад", "go_back_to_menu")])
+BACK_TO_MAIN_MENU_KEYBOARD = _markup([("🔙 Назад в главное меню", "go_back_to_menu")])
+BACK_TO_METHODS_KEYBOARD = _markup([("Назад", "go_back_to_methods")])
+BACK_TO_GIFT_METHODS_KEYBOARD = _markup([("Назад", "go_back_to_gift_methods")])
+
+# -------------------------------
+# Главное меню
+# -------------------------------
+
+MAIN_MENU_TEXT = "🏠 *Главное меню:*"
+MAIN_MENU_KEYBOARD = _markup(
+    [("📝 Заполнить карту", "fill_card")],
+    [("🧘 Пройти сеанс", "start_session")],
+    [("📚 Материалы", "materials")],
+    [("💳 Пополнить баланс", "recharge_balance")],
+    [("🎁 Подарить подписку", "gift_subscription")],
+    [("👤 Мой аккаунт", "my_account")],
+    [("✉️ Обратная связь", "feedback")],
+    [("🆘 Поддержка", "support")],
+    [("🤖 Чатботы", "chatbots")],
+)
+
+# -------------------------------
+# Регистрация
+# -------------------------------
+
+START_TEXT = "Добро пожаловать! Нажмите кнопку 'Начать' для продолжения."
+START_KEYBOARD = _markup([("Начать", "register")])
+
+AGREEMENT_TEXT = "Для продолжения необходимо принять пользовательское соглашение."
+AGREEMENT_KEYBOARD = _markup([("Принять", "accept_user_agreement"), ("Отказаться", "reject_user_agreement")])
+
+SUBSCRIPTION_MENU_TEXT = "Пожалуйста, выберите одно из следующих действий:"
+SUBSCRIPTION_MENU_KEYBOARD = _markup(
+    [("Приобрести подписку", "select_plan"), ("Подарить подписку", "gift_subscription")],
+    [("Поддержка", "support")],
+)
+
+EXPIRY_REMINDER_TEXT = (
+    "⏳ Ваша подписка «{plan}» заканчивается {end_date}.\n"
+    "Продлите её, чтобы не потерять доступ к материалам."
+)
+EXPIRY_REMINDER_KEYBOARD = _markup([("Продлить подписку", "select_plan")])
+
+# -------------------------------
+# Материалы
+# -------------------------------
+
+MATERIALS_MENU_TEXT = "📚 *Материалы:*\nВыберите нужный раздел:"
+MATERIALS_MENU_KEYBOARD = _markup(
+    [("📖 Методичка", "material_methodichka")],
+    [("📘 Рабочие тетради", "material_workbook")],
+    [("🔙 Назад", "go_back_to_menu")],
+)
+
+# -------------------------------
+# Поддержка и FAQ
+# -------------------------------
+
+FAQ_ITEMS = [
+    {
+        "question": "Как пополнить баланс?",
+        "answer": "Вы можете пополнить баланс, выбрав опцию 'Пополнить баланс' в главном меню и следуя инструкциям."
+    },
+    {
+        "question": "Как проверить свой аккаунт?",
+        "answer": "Перейдите в раздел 'Мой аккаунт', чтобы просмотреть информацию о вашем профиле."
+    },
+    # Вы можете добавить дополнительные FAQ пункты по необходимости
+]
+
+# Меню "Поддержка" из главного меню (other_handlers), вопросы нумеруются с 1
+SUPPORT_FAQ_TEXT = "ℹ️ *Часто задаваемые вопросы (FAQ):*\n\n" + "".join(
+    f"**{idx}. {item['question']}**\n\n" for idx, item in enumerate(FAQ_ITEMS, start=1)
+)
+SUPPORT_FAQ_KEYBOARD = _markup(
+    *[[(item['question'], f"faq_{idx}")] for idx, item in enumerate(FAQ_ITEMS, start=1)],
+    [("💬 Чат поддержки", "start_support_chat")],
+    [("🔙 Назад в главное меню", "go_back_to_menu")],
+)
+SUPPORT_FAQ_ANSWERS = [f"**{item['question']}**\n{item['answer']}" for item in FAQ_ITEMS]
+SUPPORT_NEXT_STEP_TEXT = "Что бы вы хотели сделать дальше?"
+SUPPORT_NEXT_STEP_KEYBOARD = _markup(
+    [("Другие вопросы", "show_faq")],
+    [("💬 Чат поддержки", "start_support_chat")],
+    [("🔙 Назад в главное меню", "go_back_to_menu")],
+)
+
+# FAQ в сессии поддержки (subscription_handler), вопросы нумеруются с 0
+FAQ_TEXT = "❓ *Часто задаваемые вопросы:*"
+FAQ_KEYBOARD = _markup(
+    *[[(item["question"], f"faq_{index}")] for index, item in enumerate(FAQ_ITEMS)],
+    [("Отправить сообщение в поддержку", "send_support_message")],
+    [("Назад", "go_back_to_menu")],
+)
+FAQ_ANSWERS = [f"**{item['question']}**\n\n{item['answer']}" for item in FAQ_ITEMS]
+FAQ_ANSWER_KEYBOARD = _markup(
+    [("Другой вопрос", "show_faq")],
+    [("Отправить сообщение в поддержку", "send_support_message")],
+    [("Назад", "go_back_to_menu")],
+)
+SUPPORT_MESSAGE_PROMPT_TEXT = "📝 *Отправьте ваше сообщение в поддержку:*"
+
+# -------------------------------
+# Чатботы
+# -------------------------------
+
+# Ключ (callback_data "chatbot_<ключ>") -> (название, ссылка на чатбот)
+CHATBOTS = {
+    "karta_klienta": ("📝 Карта клиента", "https://chatgpt.com/g/g-AAZLzsVUt-karta-"),
+    "psixoterapevt": ("🧠 Психотерапевт", "https://chatgpt.com/g/g-eyMvqlNiM-psikhoterapevt"),
+    "kpt": ("💡 КПТ", "https://chatgpt.com/g/g-cZG535IXC-final-kpt-klaud"),
+    "etpr": ("🔄 ЭТПР", "https://chatgpt.com/g/g-0JYTCDgTg-2ekspozitsionnaia-terapiia-s-predotvrashchen-etpr-erp"),
+    "tpo": ("🎯 ТПО", "https://chatgpt.com/g/g-VwRfjHabS-iact-2"),
+    "mkt": ("🔍 МКТ", "https://chatgpt.com/g/g-v10DeVqh6-metakognitivnaia-terapiia-mkt"),
+    "asoznonost": ("🌟 Осознание", "https://chatgpt.com/g/g-ugnxXY2jQ-2-midlness"),
+    "upravleniya_trevozhnostyu": ("😌 Управление тревожностью", "https://chatgpt.com/g/g-WVMzU9zuB-2-upravlenie-trevozhnostyu"),
+    "terapevticheskiy_pismo": ("✍️ Терапевтическое письмо", "https://chatgpt.com/g/g-Dw5eNVKOe-2-terapevticheskoe-pismo"),
+    "kft": ("❤️ КФТ", "https://chatgpt.com/g/g-Sc8zMP0vZ-2-kratkosrochnaia"),
+    "dpt": ("⚖️ ДПТ", "https://chatgpt.com/g/g-DwyXSdVET-2dpt"),
+    "sxemoterapiya": ("🧩 Схемотерапия", "https://chatgpt.com/g/g-OP639c1bE-2skhemoterapiya"),
+    "ipt": ("🤝 ИПТ", "https://chatgpt.com/g/g-qUGJ1Zfr0-2-interpersonalnaia"),
+    "narrativniya_terapiya": ("📖 Наративная терапия", "https://chatgpt.com/g/g-VtOyysCkq-2-narrativnaia"),
+}
+
+CHATBOTS_MENU_TEXT = "🤖 *Выберите чатбот:*"
+CHATBOTS_MENU_KEYBOARD = _markup(
+    *[[(title, f"chatbot_{key}")] for key, (title, _) in CHATBOTS.items()],
+    [("🔙 Назад", "go_back_to_menu")],
+)
+
+# -------------------------------
+# Клавиатуры из справочников
+# -------------------------------
+
+# (callback_prefix, back_text, back_callback) -> (список из кэша, клавиатура)
+_catalogue_keyboards = {}
+
+
+def catalogue_keyboard(items: list, callback_prefix: str, back_callback: str,
+                       back_text: str = "Назад", label: str = "name") -> InlineKeyboardMarkup:
+    """
+    Клавиатура "по кнопке на элемент справочника" плюс кнопка "Назад".
+
+    Кэш справочников (catalogue.py) возвращает один и тот же список, пока
+    данные не перезагружены, поэтому тот же объект списка означает ту же
+    версию данных и готовую клавиатуру можно переиспользовать.
+    """
+    key = (callback_prefix, back_text, back_callback)
+    cached = _catalogue_keyboards.get(key)
+    if cached is not None and cached[0] is items:
+        return cached[1]
+
+    reply_markup = _markup(
+        *[[(item[label], f"{callback_prefix}{item['id']}")] for item in items],
+        [(back_text, back_callback)],
+    )
+    # Храним ссылку на список, чтобы его id не достался другому объекту
+    _catalogue_keyboards[key] = (items, reply_markup)
+    return reply_markup
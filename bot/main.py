@@ -1,5 +1,6 @@
 # main.py
 
+import asyncio
 import logging
 from telegram.ext import (
     Application,
@@ -21,17 +22,43 @@ from start_handler import (
 from subscription_handler import subscription_conversation_handler
 from client_card_handler import (
     client_card_conversation_handler,
-    get_client_card_handler,
-    show_main_menu
+    get_client_card_handler
 )
+from backend_client import init_backend_client, close_backend_client, breaker, retry_budget
+from cache import report_cache_stats
+from resilience import report_backend_stats
+from file_id_store import file_id_store
+from support_batcher import support_message_batcher
+from support_feed import support_reply_feed
+from expiry_reminders import expiry_reminder_job
+from user_state import user_state_janitor
+from persistence import SQLitePersistence, bot_state_persistence
+from traffic_log import update_recorder
+from config import (
+    TOKEN,
+    BOT_MODE,
+    UPDATE_QUEUE_MAXSIZE,
+    MAX_CONCURRENT_UPDATES,
+    CACHE_STATS_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+    SLOW_UPDATE_THRESHOLD,
+    SUPPORT_FEED_ENABLED,
+    EXPIRY_REMINDER_ENABLED,
+    USER_STATE_SWEEP_INTERVAL,
+    UPDATE_RECORD_PATH,
+)
+import instrumentation
+from instrumentation import InstrumentedHTTPXRequest, instrument_handlers, register_stats_collectors
+from metrics import serve_metrics
+from update_processor import PerChatUpdateProcessor, InFlightBoundedQueue
+from rate_limiter import PriorityRateLimiter
 from other_handlers import (
-    send_material,
+    materials_conversation_handler,
     recharge_balance_conversation_handler,
-    gift_subscription,
-    my_account,
     feedback_conversation_handler,
     support_conversation_handler,
-    go_back_to_menu
+    menu_callback_router,
 )
 
 # Logging sozlash
@@ -40,12 +67,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Telegram bot tokenini o'zgartiring (bu yerda tokenni xavfsiz saqlash uchun .env faylidan foydalanishingiz tavsiya etiladi)
-TOKEN = "7841284305:AAH3qeBWiTWXCwLmc2i9ulNGv_woLXO3WAo"
+# Фоновые задачи и сервер метрик, живущие вместе с Application
+_background_tasks = []
+_metrics_server = None
 
-def main():
-    # Application yaratish
-    application = Application.builder().token(TOKEN).build()
+
+async def post_init(application: Application):
+    await init_backend_client(application)
+    await file_id_store.ensure_loaded()
+    _background_tasks.append(asyncio.create_task(report_cache_stats(CACHE_STATS_INTERVAL)))
+    _background_tasks.append(asyncio.create_task(report_backend_stats(CACHE_STATS_INTERVAL, breaker, retry_budget)))
+    _background_tasks.append(asyncio.create_task(user_state_janitor.run(USER_STATE_SWEEP_INTERVAL)))
+    if SUPPORT_FEED_ENABLED:
+        # Одна задача доставляет ответы операторов во все чаты
+        _background_tasks.append(asyncio.create_task(support_reply_feed.run(application.bot)))
+    if EXPIRY_REMINDER_ENABLED:
+        _background_tasks.append(asyncio.create_task(expiry_reminder_job.run(application.bot)))
+    if UPDATE_RECORD_PATH:
+        _background_tasks.append(asyncio.create_task(update_recorder.run()))
+    if METRICS_PORT:
+        global _metrics_server
+        _metrics_server = await serve_metrics(METRICS_HOST, METRICS_PORT)
+
+
+async def post_shutdown(application: Application):
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    if _metrics_server is not None:
+        _metrics_server.close()
+    if UPDATE_RECORD_PATH:
+        await update_recorder.close()
+    # Накопленные сообщения поддержки отправляются до закрытия клиента бэкенда
+    await support_message_batcher.close()
+    await close_backend_client(application)
+
+
+def build_application(request=None, get_updates_request=None, persistence=None) -> Application:
+    """
+    Application yaratadi va barcha handlerlarni ro'yxatdan o'tkazadi.
+    request / get_updates_request - boshqa Bot API uchun (masalan, bench_load.py dagi FakeBotAPI).
+    persistence - holat saqlanadigan joy (standart: bot_state_persistence).
+    """
+    # Общий пул соединений к бэкенду живёт столько же, сколько Application.
+    # Ограниченная очередь обновлений даёт backpressure и для polling, и для webhook.
+    # Обновления разных чатов обрабатываются параллельно, одного чата - по порядку.
+    # Все исходящие запросы проходят через планировщик с учётом лимитов Telegram.
+    # Время каждого запроса к Bot API идёт в метрики.
+    # user_data и незавершённые разговоры переживают перезапуск (SQLite, запись пачками).
+    persistence = persistence or bot_state_persistence
+    update_queue = InFlightBoundedQueue(UPDATE_QUEUE_MAXSIZE)
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .update_queue(update_queue)
+        .concurrent_updates(PerChatUpdateProcessor(MAX_CONCURRENT_UPDATES, UPDATE_QUEUE_MAXSIZE, update_queue))
+        .request(request or InstrumentedHTTPXRequest(connection_pool_size=256))
+        .rate_limiter(PriorityRateLimiter())
+        .persistence(persistence)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if UPDATE_RECORD_PATH:
+        # Входящие обновления пишутся для воспроизведения (bench_replay.py)
+        update_queue.recorder = update_recorder
+    if get_updates_request is not None:
+        builder = builder.get_updates_request(get_updates_request)
+    application = builder.build()
 
     # ConversationHandler uchun holatlarni belgilang
     START, AGREEMENTS = range(2)
@@ -71,22 +159,39 @@ def main():
 
     # Boshqa CallbackQueryHandlerlar
     # application.add_handler(CallbackQueryHandler(start_session, pattern="^start_session$"))
-    application.add_handler(CallbackQueryHandler(send_material, pattern="^materials$"))
+    application.add_handler(materials_conversation_handler)
     application.add_handler(recharge_balance_conversation_handler)
-    application.add_handler(CallbackQueryHandler(gift_subscription, pattern="^gift_subscription$"))
-    application.add_handler(CallbackQueryHandler(my_account, pattern="^my_account$"))
     application.add_handler(feedback_conversation_handler)
     application.add_handler(support_conversation_handler)
-    application.add_handler(CallbackQueryHandler(go_back_to_menu, pattern="^go_back_to_menu$"))
 
-    # Chatbots menu va individual chatbot handlerlari
-    from other_handlers import chatbots_menu, chatbot_handlers
-    application.add_handler(CallbackQueryHandler(chatbots_menu, pattern="^chatbots$"))
-    for handler in chatbot_handlers:
-        application.add_handler(handler)
+    # Chatbots menu, chatbot havolalari, gift_subscription, my_account va go_back_to_menu -
+    # bitta CallbackRouter orqali (callback_data bo'yicha lug'atdan qidiriladi)
+    application.add_handler(menu_callback_router)
+
+    # Метрики по каждому хендлеру и лог медленных обновлений
+    instrument_handlers(application)
+    register_stats_collectors(breaker, retry_budget)
+    instrumentation.slow_update_threshold = SLOW_UPDATE_THRESHOLD
+
+    # Состояние простаивающих пользователей и брошенные разговоры удаляются,
+    # число пользователей с состоянием в памяти ограничено
+    user_state_janitor.attach(application)
+    # Состояние пользователя подгружается из базы при его первом обновлении
+    if isinstance(persistence, SQLitePersistence):
+        persistence.attach(application)
+
+    return application
+
+
+def main():
+    application = build_application()
 
     # Botni ishga tushurish
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        from webhook import run_webhook
+        run_webhook(application)
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
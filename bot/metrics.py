@@ -0,0 +1,128 @@
+# metrics.py
+"""
+Минимальные метрики в текстовом формате Prometheus без внешних зависимостей.
+
+    HANDLER_DURATION = Histogram("bot_handler_duration_seconds", "...", ["handler", "outcome"])
+    HANDLER_DURATION.observe(0.12, handler="my_account", outcome="ok")
+
+serve_metrics() поднимает HTTP-эндпоинт /metrics для Prometheus.
+"""
+import asyncio
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Все метрики и функции, добавляющие строки при каждом сборе (например, состояние кэшей)
+REGISTRY = []
+COLLECTORS = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # значения меток -> [счётчики по корзинам, сумма, количество]
+        self._series = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+def sample_lines(name: str, documentation: str, samples, kind: str = "gauge") -> list:
+    """
+    Строки для готовых значений (gauge или counter); samples - пары (метки, значение).
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            logger.error(f"Metrics collector {collector!r} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Заголовки запроса не нужны, но их нужно дочитать
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", render_metrics().encode()
+        else:
+            status, body = "404 Not Found", b"Not Found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Запускает HTTP-сервер с GET /metrics в текущем event loop.
+    """
+    server = await asyncio.start_server(_handle_connection, host, port)
+    logger.info(f"Prometheus metrics on http://{host}:{port}/metrics")
+    return server
@@ -1,11 +1,10 @@
 # other_handlers.py
 
 import logging
-from functools import lru_cache
-import httpx
 from httpx import RequestError, HTTPStatusError
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CallbackQueryHandler,
@@ -16,10 +15,31 @@ from telegram.ext import (
     filters
 )
 
-logger = logging.getLogger(__name__)
+from backend_client import backend_get, backend_post
+import catalogue
+from callback_router import CallbackRouter
+from file_id_store import file_id_store
+from keyboards import (
+    BACK_TO_MAIN_MENU_KEYBOARD,
+    CHATBOTS,
+    CHATBOTS_MENU_KEYBOARD,
+    CHATBOTS_MENU_TEXT,
+    FAQ_ITEMS,
+    MAIN_MENU_KEYBOARD,
+    MAIN_MENU_TEXT,
+    MATERIALS_MENU_KEYBOARD,
+    MATERIALS_MENU_TEXT,
+    SUPPORT_FAQ_ANSWERS,
+    SUPPORT_FAQ_KEYBOARD,
+    SUPPORT_FAQ_TEXT,
+    SUPPORT_NEXT_STEP_KEYBOARD,
+    SUPPORT_NEXT_STEP_TEXT,
+    catalogue_keyboard,
+)
+from rate_limiter import send_priority, PRIORITY_HIGH, PRIORITY_LOW
+from user_state import FlowConversationHandler
 
-# To'g'ri API bazasi URL'sini belgilang
-BACKEND_API_BASE_URL = "http://localhost:8000/blog"
+logger = logging.getLogger(__name__)
 
 # -------------------------------
 # Konstanta Holatlarni Belgilash
@@ -51,18 +71,13 @@ def format_html_text(text: str) -> str:
 # To'lov Usullarini Olish
 # -------------------------------
 
-@lru_cache(maxsize=1)
 async def get_payment_methods():
     """
-    Backenddan to'lov usullarini oladi va keshlaydi.
+    Backenddan to'lov usullarini oladi (catalogue keshi orqali).
     """
-    api_url = f"{BACKEND_API_BASE_URL}/payment-methods/"
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url)
-            response.raise_for_status()
-            return response.json()
-    except RequestError as e:
+        return await catalogue.get_payment_methods()
+    except (RequestError, HTTPStatusError) as e:
         logger.error(f"To'lov usullarini olishda xato: {e}")
         return []
 
@@ -72,25 +87,14 @@ async def get_payment_methods():
 
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Asosiy menyuni ko'rsatadi.
-    """
-    keyboard = [
-        [InlineKeyboardButton("📝 Заполнить карту", callback_data="fill_card")],
-        [InlineKeyboardButton("🧘 Пройти сеанс", callback_data="start_session")],
-        [InlineKeyboardButton("📚 Материалы", callback_data="materials")],
-        [InlineKeyboardButton("💳 Пополнить баланс", callback_data="recharge_balance")],
-        [InlineKeyboardButton("🎁 Подарить подписку", callback_data="gift_subscription")],
-        [InlineKeyboardButton("👤 Мой аккаунт", callback_data="my_account")],
-        [InlineKeyboardButton("✉️ Обратная связь", callback_data="feedback")],
-        [InlineKeyboardButton("🆘 Поддержка", callback_data="support")],
-        [InlineKeyboardButton("🤖 Чатботы", callback_data="chatbots")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    if update.callback_query:
-        await update.callback_query.message.edit_text("🏠 *Главное меню:*", parse_mode='Markdown', reply_markup=reply_markup)
-    else:
-        await update.message.reply_text("🏠 *Главное меню:*", parse_mode='Markdown', reply_markup=reply_markup)
+    Asosiy menyuni ko'rsatadi. Barcha modullar shu funksiyadan foydalanadi.
+    """
+    # Перерисовка меню пропускает вперёд более важные сообщения
+    with send_priority(PRIORITY_LOW):
+        if update.callback_query:
+            await update.callback_query.message.edit_text(MAIN_MENU_TEXT, parse_mode='Markdown', reply_markup=MAIN_MENU_KEYBOARD)
+        else:
+            await update.message.reply_text(MAIN_MENU_TEXT, parse_mode='Markdown', reply_markup=MAIN_MENU_KEYBOARD)
 
 async def go_back_to_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -115,12 +119,7 @@ async def start_recharge_balance(update: Update, context: ContextTypes.DEFAULT_T
         await show_main_menu(update, context)
         return ConversationHandler.END
 
-    keyboard = [
-        [InlineKeyboardButton(pm['name'], callback_data=f"payment_method_{pm['id']}")]
-        for pm in payment_methods
-    ]
-    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="go_back_to_menu")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = catalogue_keyboard(payment_methods, "payment_method_", "go_back_to_menu", back_text="🔙 Назад")
 
     await query.message.reply_text("💳 Пожалуйста, выберите способ оплаты:", reply_markup=reply_markup)
     return RECHARGE_SELECT_PAYMENT_METHOD
@@ -181,25 +180,23 @@ async def enter_transaction_id(update: Update, context: ContextTypes.DEFAULT_TYP
     amount = context.user_data.get('amount')
     payment_method = context.user_data.get('payment_method')
 
-    api_url = f"{BACKEND_API_BASE_URL}/make-payment/{user.id}/"
     data = {
         "payment_method": payment_method,
         "transaction_id": transaction_id,
         "amount": f"{amount:.2f}"
     }
 
-    logger.debug(f"Sending POST request to {api_url} with data: {data}")
+    logger.debug(f"Sending balance top-up for {user.id} with data: {data}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(api_url, json=data)
-            response.raise_for_status()
+        await backend_post(f"/make-payment/{user.id}/", json=data, idempotent=True)
+        with send_priority(PRIORITY_HIGH):
             await update.message.reply_text("✅ Баланс успешно пополнен!")
-            logger.info("Balance successfully recharged.")
+        logger.info("Balance successfully recharged.")
     except HTTPStatusError as e:
         logger.error(f"API error during balance recharge: {e}")
         try:
-            error_message = response.json().get('error', "Произошла ошибка при пополнении баланса. Попробуйте позже.")
+            error_message = e.response.json().get('error', "Произошла ошибка при пополнении баланса. Попробуйте позже.")
         except:
             error_message = "Произошла ошибка при пополнении баланса. Попробуйте позже."
         await update.message.reply_text(f"❌ {error_message}")
@@ -213,7 +210,7 @@ async def enter_transaction_id(update: Update, context: ContextTypes.DEFAULT_TYP
 # -------------------------------
 # ConversationHandler for пополнение баланса
 # -------------------------------
-recharge_balance_conversation_handler = ConversationHandler(
+recharge_balance_conversation_handler = FlowConversationHandler(
     entry_points=[CallbackQueryHandler(start_recharge_balance, pattern="^recharge_balance$")],
     states={
         RECHARGE_SELECT_PAYMENT_METHOD: [
@@ -230,6 +227,9 @@ recharge_balance_conversation_handler = ConversationHandler(
     fallbacks=[
         CallbackQueryHandler(go_back_to_menu, pattern="^go_back_to_menu$")
     ],
+    name="recharge_balance",
+    persistent=True,
+    flow_keys=("payment_method", "amount"),
 )
 
 # -------------------------------
@@ -250,21 +250,18 @@ async def enter_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Обработка отправки отзыва.
     """
     feedback_text = update.message.text
-    api_url = f"{BACKEND_API_BASE_URL}/feedback/"
     data = {"content": feedback_text}
 
     logger.info(f"Sending feedback data to API: {data}")
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(api_url, json=data)
-            response.raise_for_status()
-            await update.message.reply_text("✅ Спасибо за ваш отзыв!")
-            logger.info("Feedback successfully sent.")
+        await backend_post("/feedback/", json=data)
+        await update.message.reply_text("✅ Спасибо за ваш отзыв!")
+        logger.info("Feedback successfully sent.")
     except HTTPStatusError as e:
         logger.error(f"Error sending feedback: {e}")
         try:
-            error_message = response.json().get('error', "Произошла ошибка при отправке отзыва. Попробуйте позже.")
+            error_message = e.response.json().get('error', "Произошла ошибка при отправке отзыва. Попробуйте позже.")
         except:
             error_message = "Произошла ошибка при отправке отзыва. Попробуйте позже."
         await update.message.reply_text(f"❌ {error_message}")
@@ -287,18 +284,6 @@ feedback_conversation_handler = ConversationHandler(
 # Поддержка (Support) с FAQ
 # -------------------------------
 
-FAQ_ITEMS = [
-    {
-        "question": "Как пополнить баланс?",
-        "answer": "Вы можете пополнить баланс, выбрав опцию 'Пополнить баланс' в главном меню и следуя инструкциям."
-    },
-    {
-        "question": "Как проверить свой аккаунт?",
-        "answer": "Перейдите в раздел 'Мой аккаунт', чтобы просмотреть информацию о вашем профиле."
-    },
-    # Вы можете добавить дополнительные FAQ пункты по необходимости
-]
-
 async def support_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     'Поддержка' tugmasi bosilganda FAQ ni ko'rsatadi.
@@ -312,22 +297,10 @@ async def support_faq(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    keyboard = [
-        [InlineKeyboardButton(item['question'], callback_data=f"faq_{idx+1}")]
-        for idx, item in enumerate(FAQ_ITEMS)
-    ]
-    keyboard.append([InlineKeyboardButton("💬 Чат поддержки", callback_data="start_support_chat")])
-    keyboard.append([InlineKeyboardButton("🔙 Назад в главное меню", callback_data="go_back_to_menu")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    faq_message = "ℹ️ *Часто задаваемые вопросы (FAQ):*\n\n"
-    for idx, item in enumerate(FAQ_ITEMS, start=1):
-        faq_message += f"**{idx}. {item['question']}**\n\n"
-
     await query.message.edit_text(
-        faq_message,
+        SUPPORT_FAQ_TEXT,
         parse_mode='Markdown',
-        reply_markup=reply_markup
+        reply_markup=SUPPORT_FAQ_KEYBOARD
     )
     return SUPPORT_DISPLAY_FAQ
 
@@ -343,21 +316,13 @@ async def handle_faq_selection(update: Update, context: ContextTypes.DEFAULT_TYP
         try:
             faq_index = int(data.split("_")[1]) - 1
             if 0 <= faq_index < len(FAQ_ITEMS):
-                selected_faq = FAQ_ITEMS[faq_index]
-                answer_message = f"**{selected_faq['question']}**\n{selected_faq['answer']}"
-                await query.message.reply_text(answer_message, parse_mode='Markdown')
-                logger.info(f"Sent FAQ answer: {selected_faq['question']}")
+                await query.message.reply_text(SUPPORT_FAQ_ANSWERS[faq_index], parse_mode='Markdown')
+                logger.info(f"Sent FAQ answer: {FAQ_ITEMS[faq_index]['question']}")
             else:
                 await query.message.reply_text("❌ Некорректный выбор вопроса.")
 
             # Qo'shimcha tanlovlar
-            keyboard = [
-                [InlineKeyboardButton("Другие вопросы", callback_data="show_faq")],
-                [InlineKeyboardButton("💬 Чат поддержки", callback_data="start_support_chat")],
-                [InlineKeyboardButton("🔙 Назад в главное меню", callback_data="go_back_to_menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.message.reply_text("Что бы вы хотели сделать дальше?", reply_markup=reply_markup)
+            await query.message.reply_text(SUPPORT_NEXT_STEP_TEXT, reply_markup=SUPPORT_NEXT_STEP_KEYBOARD)
             return SUPPORT_DISPLAY_FAQ
         except (IndexError, ValueError):
             await query.message.reply_text("❌ Некорректный выбор вопроса.")
@@ -366,9 +331,7 @@ async def handle_faq_selection(update: Update, context: ContextTypes.DEFAULT_TYP
         await support_faq(update, context)
         return SUPPORT_DISPLAY_FAQ
     else:
-        await query.message.reply_text("❌ Некорректный выбор.", reply_markup=InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔙 Назад в главное меню", callback_data="go_back_to_menu")]
-        ]))
+        await query.message.reply_text("❌ Некорректный выбор.", reply_markup=BACK_TO_MAIN_MENU_KEYBOARD)
         return SUPPORT_DISPLAY_FAQ
 
 async def start_support_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -408,20 +371,52 @@ async def show_materials_menu(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
 
-    keyboard = [
-        [InlineKeyboardButton("📖 Методичка", callback_data="material_methodichka")],
-        [InlineKeyboardButton("📘 Рабочие тетради", callback_data="material_workbook")],
-        [InlineKeyboardButton("🔙 Назад", callback_data="go_back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     await query.edit_message_text(
-        "📚 *Материалы:*\nВыберите нужный раздел:",
+        MATERIALS_MENU_TEXT,
         parse_mode='Markdown',
-        reply_markup=reply_markup
+        reply_markup=MATERIALS_MENU_KEYBOARD
     )
     return SEND_MATERIAL
 
+def _material_file_id(message) -> str:
+    if message.photo:
+        return message.photo[-1].file_id
+    if message.document:
+        return message.document.file_id
+    return None
+
+async def send_material_file(context: ContextTypes.DEFAULT_TYPE, chat_id: int, material: dict,
+                             document_url: str, title: str):
+    """
+    Отправляет файл материала. Файл загружается в Telegram по URL только один раз,
+    дальше используется сохранённый file_id (пока не поменялся document_hash).
+    """
+    is_photo = document_url.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))
+    send = context.bot.send_photo if is_photo else context.bot.send_document
+    field = 'photo' if is_photo else 'document'
+    caption = f"📄 *{title}*"
+
+    material_id = material.get('id')
+    content_hash = material.get('document_hash') or ''
+    file_id = await file_id_store.get(material_id, content_hash) if material_id is not None and content_hash else None
+
+    if file_id:
+        try:
+            await send(chat_id=chat_id, caption=caption, parse_mode='Markdown', **{field: file_id})
+            logger.info(f"Sent material {material_id} by cached file_id")
+            return
+        except BadRequest as e:
+            # file_id больше не действителен - загружаем файл заново
+            logger.warning(f"Cached file_id for material {material_id} rejected: {e}")
+            await file_id_store.forget(material_id)
+
+    message = await send(chat_id=chat_id, caption=caption, parse_mode='Markdown', **{field: document_url})
+    logger.info(f"Sent {field}: {document_url}")
+
+    new_file_id = _material_file_id(message)
+    if new_file_id and material_id is not None and content_hash:
+        await file_id_store.set(material_id, content_hash, new_file_id)
+
 async def send_material(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Отправляет выбранный материал пользователю.
@@ -438,52 +433,32 @@ async def send_material(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Backend API'dan hujjat URL sini olish
         try:
-            async with httpx.AsyncClient() as client:
-                api_url = f"{BACKEND_API_BASE_URL}/materials/"
-                params = {'material_type': material_type}
-                logger.info(f"Fetching materials with params: {params}")
-                response = await client.get(api_url, params=params)
-                response.raise_for_status()
-                materials = response.json()
-                logger.info(f"Received materials: {materials}")
-
-                if not materials:
-                    logger.warning("No materials found for the selected type.")
-                    await query.message.reply_text("❌ Этот материал не доступен.")
-                    return ConversationHandler.END
-
-                # Birinchi mavjud materialni tanlash
-                material = materials[0]
-                document_url = material.get('document')
-                title = material.get('title', 'Без названия')
-                logger.info(f"Selected material: {material}")
-
-                if not document_url:
-                    logger.warning("Document URL is missing in the selected material.")
-                    await query.message.reply_text("❌ Документ недоступен.")
-                    return ConversationHandler.END
-
-                # Foydalanuvchiga hujjat yuborish
-                if document_url.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                    await context.bot.send_photo(
-                        chat_id=query.from_user.id,
-                        photo=document_url,
-                        caption=f"📄 *{title}*",
-                        parse_mode='Markdown'
-                    )
-                    logger.info(f"Sent photo: {document_url}")
-                else:
-                    await context.bot.send_document(
-                        chat_id=query.from_user.id,
-                        document=document_url,
-                        caption=f"📄 *{title}*",
-                        parse_mode='Markdown'
-                    )
-                    logger.info(f"Sent document: {document_url}")
-
-                await show_main_menu(update, context)
+            logger.info(f"Fetching materials of type: {material_type}")
+            materials = await catalogue.get_materials(material_type)
+            logger.info(f"Received materials: {materials}")
+
+            if not materials:
+                logger.warning("No materials found for the selected type.")
+                await query.message.reply_text("❌ Этот материал не доступен.")
+                return ConversationHandler.END
+
+            # Birinchi mavjud materialni tanlash
+            material = materials[0]
+            document_url = material.get('document_url')
+            title = material.get('title', 'Без названия')
+            logger.info(f"Selected material: {material}")
+
+            if not document_url:
+                logger.warning("Document URL is missing in the selected material.")
+                await query.message.reply_text("❌ Документ недоступен.")
                 return ConversationHandler.END
 
+            # Foydalanuvchiga hujjat yuborish
+            await send_material_file(context, query.from_user.id, material, document_url, title)
+
+            await show_main_menu(update, context)
+            return ConversationHandler.END
+
         except HTTPStatusError as e:
             logger.error(f"API error while fetching material: {e.response.status_code} - {e.response.text}")
             await query.message.reply_text("❌ Ошибка при получении материала. Попробуйте позже.")
@@ -521,95 +496,24 @@ async def chatbots_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    keyboard = [
-        [InlineKeyboardButton("📝 Карта клиента", callback_data="chatbot_karta_klienta")],
-        [InlineKeyboardButton("🧠 Психотерапевт", callback_data="chatbot_psixoterapevt")],
-        [InlineKeyboardButton("💡 КПТ", callback_data="chatbot_kpt")],
-        [InlineKeyboardButton("🔄 ЭТПР", callback_data="chatbot_etpr")],
-        [InlineKeyboardButton("🎯 ТПО", callback_data="chatbot_tpo")],
-        [InlineKeyboardButton("🔍 МКТ", callback_data="chatbot_mkt")],
-        [InlineKeyboardButton("🌟 Осознание", callback_data="chatbot_asoznonost")],
-        [InlineKeyboardButton("😌 Управление тревожностью", callback_data="chatbot_upravleniya_trevozhnostyu")],
-        [InlineKeyboardButton("✍️ Терапевтическое письмо", callback_data="chatbot_terapevticheskiy_pismo")],
-        [InlineKeyboardButton("❤️ КФТ", callback_data="chatbot_kft")],
-        [InlineKeyboardButton("⚖️ ДПТ", callback_data="chatbot_dpt")],
-        [InlineKeyboardButton("🧩 Схемотерапия", callback_data="chatbot_sxemoterapiya")],
-        [InlineKeyboardButton("🤝 ИПТ", callback_data="chatbot_ipt")],
-        [InlineKeyboardButton("📖 Наративная терапия", callback_data="chatbot_narrativniya_terapiya")],
-        [InlineKeyboardButton("🔙 Назад", callback_data="go_back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.message.edit_text("🤖 *Выберите чатбот:*", parse_mode='Markdown', reply_markup=reply_markup)
+    await query.message.edit_text(CHATBOTS_MENU_TEXT, parse_mode='Markdown', reply_markup=CHATBOTS_MENU_KEYBOARD)
     return ConversationHandler.END
 
-# Individual chatbot handlerlari
-async def send_chatbot_link(update: Update, context: ContextTypes.DEFAULT_TYPE, link: str, name: str):
-    await update.callback_query.answer()
-    await update.callback_query.message.reply_text(f"{name}: {link}")
+async def send_chatbot_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Отправляет ссылку на чатбот из таблицы CHATBOTS (кнопка "chatbot_<ключ>").
+    """
+    query = update.callback_query
+    await query.answer()
+    chatbot = CHATBOTS.get(context.args[0]) if context.args else None
+    if chatbot is None:
+        logger.warning(f"Unknown chatbot button: {query.data}")
+    else:
+        name, link = chatbot
+        await query.message.reply_text(f"{name}: {link}")
     await show_main_menu(update, context)
     return ConversationHandler.END
 
-async def chatbot_karta_klienta(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-AAZLzsVUt-karta-", "📝 Карта клиента")
-
-async def chatbot_psixoterapevt(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-eyMvqlNiM-psikhoterapevt", "🧠 Психотерапевт")
-
-async def chatbot_kpt(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-cZG535IXC-final-kpt-klaud", "💡 КПТ")
-
-async def chatbot_etpr(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-0JYTCDgTg-2ekspozitsionnaia-terapiia-s-predotvrashchen-etpr-erp", "🔄 ЭТПР")
-
-async def chatbot_tpo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-VwRfjHabS-iact-2", "🎯 ТПО")
-
-async def chatbot_mkt(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-v10DeVqh6-metakognitivnaia-terapiia-mkt", "🔍 МКТ")
-
-async def chatbot_asoznonost(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-ugnxXY2jQ-2-midlness", "🌟 Осознание")
-
-async def chatbot_upravleniya_trevozhnostyu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-WVMzU9zuB-2-upravlenie-trevozhnostyu", "😌 Управление тревожностью")
-
-async def chatbot_terapevticheskiy_pismo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-Dw5eNVKOe-2-terapevticheskoe-pismo", "✍️ Терапевтическое письмо")
-
-async def chatbot_kft(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-Sc8zMP0vZ-2-kratkosrochnaia", "❤️ КФТ")
-
-async def chatbot_dpt(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-DwyXSdVET-2dpt", "⚖️ ДПТ")
-
-async def chatbot_sxemoterapiya(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-OP639c1bE-2skhemoterapiya", "🧩 Схемотерапия")
-
-async def chatbot_ipt(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-qUGJ1Zfr0-2-interpersonalnaia", "🤝 ИПТ")
-
-async def chatbot_narrativniya_terapiya(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_chatbot_link(update, context, "https://chatgpt.com/g/g-VtOyysCkq-2-narrativnaia", "📖 Наративная терапия")
-
-# Chatbotlar uchun handlerlar ro'yxati
-chatbot_handlers = [
-    CallbackQueryHandler(chatbot_karta_klienta, pattern="^chatbot_karta_klienta$"),
-    CallbackQueryHandler(chatbot_psixoterapevt, pattern="^chatbot_psixoterapevt$"),
-    CallbackQueryHandler(chatbot_kpt, pattern="^chatbot_kpt$"),
-    CallbackQueryHandler(chatbot_etpr, pattern="^chatbot_etpr$"),
-    CallbackQueryHandler(chatbot_tpo, pattern="^chatbot_tpo$"),
-    CallbackQueryHandler(chatbot_mkt, pattern="^chatbot_mkt$"),
-    CallbackQueryHandler(chatbot_asoznonost, pattern="^chatbot_asoznonost$"),
-    CallbackQueryHandler(chatbot_upravleniya_trevozhnostyu, pattern="^chatbot_upravleniya_trevozhnostyu$"),
-    CallbackQueryHandler(chatbot_terapevticheskiy_pismo, pattern="^chatbot_terapevticheskiy_pismo$"),
-    CallbackQueryHandler(chatbot_kft, pattern="^chatbot_kft$"),
-    CallbackQueryHandler(chatbot_dpt, pattern="^chatbot_dpt$"),
-    CallbackQueryHandler(chatbot_sxemoterapiya, pattern="^chatbot_sxemoterapiya$"),
-    CallbackQueryHandler(chatbot_ipt, pattern="^chatbot_ipt$"),
-    CallbackQueryHandler(chatbot_narrativniya_terapiya, pattern="^chatbot_narrativniya_terapiya$")
-]
-
 # -------------------------------
 # Мой Аккаунт (My Account)
 # -------------------------------
@@ -621,46 +525,43 @@ async def my_account(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user = query.from_user
-    api_url = f"{BACKEND_API_BASE_URL}/profile/{user.id}/"
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url)
-            response.raise_for_status()
-            user_data = response.json()
-
-            # Экранирование пользовательских данных для HTML
-            username = format_html_text(user_data.get('username', 'Неизвестно'))
-            created = format_html_text(user_data.get('created', 'Неизвестно'))
-
-            message = f"👤 <b>Ваш аккаунт:</b>\n"
-            message += f"Имя пользователя: <b>{username}</b>\n"
-            message += f"Дата регистрации: <b>{created}</b>\n"
-
-            current_subscription = user_data.get('current_subscription')
-            if current_subscription and isinstance(current_subscription, dict):
-                plan = current_subscription.get('plan')
-                if isinstance(plan, dict):
-                    plan_name = format_html_text(plan.get('name', 'Неизвестно'))
-                else:
-                    plan_name = 'Неизвестно'
-
-                end_date = format_html_text(current_subscription.get('end_date', 'Неизвестно'))
-
-                message += f"Текущая подписка: <b>{plan_name}</b>\n"
-                message += f"Подписка действует до: <b>{end_date}</b>\n"
+        response = await backend_get(f"/profile/{user.id}/")
+        user_data = response.json()
+
+        # Экранирование пользовательских данных для HTML
+        username = format_html_text(user_data.get('username', 'Неизвестно'))
+        created = format_html_text(user_data.get('created', 'Неизвестно'))
+
+        message = f"👤 <b>Ваш аккаунт:</b>\n"
+        message += f"Имя пользователя: <b>{username}</b>\n"
+        message += f"Дата регистрации: <b>{created}</b>\n"
+
+        current_subscription = user_data.get('current_subscription')
+        if current_subscription and isinstance(current_subscription, dict):
+            plan = current_subscription.get('plan')
+            if isinstance(plan, dict):
+                plan_name = format_html_text(plan.get('name', 'Неизвестно'))
             else:
-                message += "<b>Текущая подписка:</b> Отсутствует\n"
+                plan_name = 'Неизвестно'
 
-            total_payments = user_data.get('total_payments', 0)
-            balance = user_data.get('balance', 0)
+            end_date = format_html_text(current_subscription.get('end_date', 'Неизвестно'))
 
-            message += f"<b>Всего платежей:</b> {total_payments}\n"
-            message += f"<b>Баланс:</b> {balance} сум\n"
+            message += f"Текущая подписка: <b>{plan_name}</b>\n"
+            message += f"Подписка действует до: <b>{end_date}</b>\n"
+        else:
+            message += "<b>Текущая подписка:</b> Отсутствует\n"
 
-            await query.message.reply_text(message, parse_mode='HTML')
-            logger.info("Sent account information to user.")
-    except HTTPStatusError as e:
+        total_payments = user_data.get('total_payments', 0)
+        balance = user_data.get('balance', 0)
+
+        message += f"<b>Всего платежей:</b> {total_payments}\n"
+        message += f"<b>Баланс:</b> {balance} сум\n"
+
+        await query.message.reply_text(message, parse_mode='HTML')
+        logger.info("Sent account information to user.")
+    except (RequestError, HTTPStatusError) as e:
         logger.error(f"Ошибка при получении информации об аккаунте: {e}")
         await query.message.reply_text("❌ Произошла ошибка при получении информации об аккаунте. Попробуйте позже.")
     except (KeyError, TypeError) as e:
@@ -682,6 +583,19 @@ async def gift_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from subscription_handler import start_gifting_subscription
     await start_gifting_subscription(update, context)
 
+# -------------------------------
+# Кнопки меню вне диалогов
+# -------------------------------
+
+# Один хендлер на все кнопки ниже: callback_data ищется в словаре, а не
+# проверяется регуляркой каждого CallbackQueryHandler по очереди
+menu_callback_router = CallbackRouter()
+menu_callback_router.route("chatbots", chatbots_menu)
+menu_callback_router.route_prefix("chatbot", send_chatbot_link)
+menu_callback_router.route("gift_subscription", gift_subscription)
+menu_callback_router.route("my_account", my_account)
+menu_callback_router.route("go_back_to_menu", go_back_to_menu)
+
 # -------------------------------
 # Handlerlarni Qo‘shish
 # -------------------------------
@@ -702,18 +616,5 @@ def add_other_handlers(application: Application):
     # Поддержка ConversationHandler
     application.add_handler(support_conversation_handler)
 
-    # Чатботы ConversationHandler
-    application.add_handler(CallbackQueryHandler(chatbots_menu, pattern="^chatbots$"))
-
-    # Individual chatbot handlerlari
-    for handler in chatbot_handlers:
-        application.add_handler(handler)
-
-    # Подарить подписку handler
-    application.add_handler(CallbackQueryHandler(gift_subscription, pattern="^gift_subscription$"))
-
-    # Мой аккаунт handler
-    application.add_handler(CallbackQueryHandler(my_account, pattern="^my_account$"))
-
-    # Возврат в главное меню handler
-    application.add_handler(CallbackQueryHandler(go_back_to_menu, pattern="^go_back_to_menu$"))
+    # Чатботы, подарок подписки, мой аккаунт и возврат в главное меню
+    application.add_handler(menu_callback_router)
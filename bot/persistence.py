@@ -0,0 +1,400 @@
+# persistence.py
+"""
+user_data и состояния разговоров в SQLite, чтобы перезапуск бота не сбрасывал
+пользователей посреди оплаты подписки, подарка, пополнения баланса или карты клиента.
+
+- Запуск не читает базу целиком: get_user_data() и get_conversations() возвращают
+  пустые словари, а состояние пользователя подгружается одним обращением к базе
+  при его первом обновлении (хендлер в группе LOAD_STATE_HANDLER_GROUP, раньше всех).
+- С базой работает только поток записи: чтения тоже идут через него, не блокируя
+  цикл событий, и встают в очередь после уже отправленных записей.
+- Запись отложенная: Application раз в update_interval отдаёт изменившиеся записи,
+  они копятся и пишутся одной транзакцией в отдельном потоке. user_data, которая
+  не изменилась с прошлой записи, не пишется вовсе.
+- При штатной остановке Application вызывает flush(), и всё накопленное
+  записывается до выхода. При аварийном падении теряется не больше update_interval.
+
+    persistence = SQLitePersistence()
+    application = Application.builder()...persistence(persistence).build()
+    ...                            # хендлеры, в том числе ConversationHandler(name=..., persistent=True)
+    persistence.attach(application)
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import pickle
+import sqlite3
+
+from telegram import Update
+from telegram.ext import BasePersistence, ConversationHandler, PersistenceInput, TypeHandler
+
+from config import BOT_STATE_DB_PATH, PERSISTENCE_UPDATE_INTERVAL
+from metrics import COLLECTORS, sample_lines
+
+logger = logging.getLogger(__name__)
+
+# Группа хендлера, подгружающего состояние пользователя: раньше учёта активности и всех остальных
+LOAD_STATE_HANDLER_GROUP = -2
+
+
+def _encode_key(key) -> str:
+    return json.dumps(list(key))
+
+
+def _decode_key(text: str) -> tuple:
+    return tuple(json.loads(text))
+
+
+def _dump(value):
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранит только user_data и разговоры; chat_data, bot_data и callback_data боту не нужны.
+    """
+
+    def __init__(self, path: str = BOT_STATE_DB_PATH, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self._application = None
+        # Имена разговоров с per_user=True: их состояния подгружаются вместе с пользователем
+        self._per_user_conversations = set()
+        self._loaded_users = set()
+        # user_id -> задача подгрузки, которую ждут все обновления пользователя
+        self._loading = {}
+        # user_id -> hash последней записанной user_data (None - записи нет)
+        self._digests = {}
+        # Ещё не записанные изменения: user_id -> pickle или None (удалить) и
+        # user_id -> {(имя разговора, ключ): pickle или None}
+        self._pending_users = {}
+        self._pending_conversations = {}
+        # То же для пачки, которая пишется прямо сейчас
+        self._writing_users = {}
+        self._writing_conversations = {}
+        self._writing = None
+        self._timer = None
+        # Все обращения к базе идут через один поток с его собственным соединением
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot-state-writer")
+        self._connection = None
+        self.users_loaded = 0
+        self.rows_written = 0
+        self.writes_skipped = 0
+        self.batches = 0
+
+    def attach(self, application):
+        """
+        Подключает ленивую подгрузку состояния. Вызывать после добавления всех хендлеров.
+        """
+        self._application = application
+        self._loaded_users = set()
+        self._loading = {}
+        self._digests = {}
+        self._per_user_conversations = {
+            handler.name
+            for handlers in application.handlers.values()
+            for handler in handlers
+            if isinstance(handler, ConversationHandler) and handler.persistent
+            and handler.per_user and not handler.per_message
+        }
+        application.add_handler(TypeHandler(Update, self._load), group=LOAD_STATE_HANDLER_GROUP)
+        if self._collect not in COLLECTORS:
+            COLLECTORS.append(self._collect)
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS user_data ("
+            " user_id INTEGER PRIMARY KEY,"
+            " data BLOB NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " name TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " user_id INTEGER,"
+            " state BLOB NOT NULL,"
+            " PRIMARY KEY (name, key))"
+        )
+        # (user_id, name): и подгрузка пользователя, и get_conversations() без полного просмотра
+        connection.execute("CREATE INDEX IF NOT EXISTS conversations_user_id ON conversations (user_id, name)")
+        connection.commit()
+        return connection
+
+    def _thread_connection(self):
+        # Только из потока self._executor
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    async def _in_thread(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # -------------------------------
+    # Подгрузка
+    # -------------------------------
+
+    def _select_user(self, user_id: int):
+        """
+        Сохранённые user_data (pickle или None) и {(имя разговора, ключ): pickle} пользователя.
+        """
+        connection = self._thread_connection()
+        row = connection.execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        conversations = {
+            (name, key): state
+            for name, key, state in connection.execute(
+                "SELECT name, key, state FROM conversations WHERE user_id = ?", (user_id,)
+            )
+        }
+        return (row[0] if row else None), conversations
+
+    def _unsaved(self, user_id: int):
+        """
+        Ещё не записанные изменения пользователя: (user_data изменена?, user_data, разговоры).
+        """
+        changed, data, conversations = False, None, {}
+        for users, pending in ((self._writing_users, self._writing_conversations),
+                               (self._pending_users, self._pending_conversations)):
+            if user_id in users:
+                changed, data = True, users[user_id]
+            conversations.update(pending.get(user_id, {}))
+        return changed, data, conversations
+
+    async def _read_user(self, user_id: int):
+        """
+        user_data и разговоры пользователя из базы с учётом ещё не записанных изменений.
+        Изменения берутся и до чтения (пачка могла записаться, пока шло чтение), и после.
+        """
+        before = self._unsaved(user_id)
+        data, conversations = await self._in_thread(self._select_user, user_id)
+        for changed, unsaved_data, unsaved_conversations in (before, self._unsaved(user_id)):
+            if changed:
+                data = unsaved_data
+            conversations.update(unsaved_conversations)
+        return data, conversations
+
+    async def _load(self, update: Update, context):
+        user = update.effective_user
+        if user is None or user.id in self._loaded_users:
+            return
+        loading = self._loading.get(user.id)
+        if loading is None:
+            loading = self._loading[user.id] = asyncio.ensure_future(self._load_user(user.id))
+            loading.add_done_callback(lambda _, user_id=user.id: self._loading.pop(user_id, None))
+        # shield: отмена одного обновления не должна прерывать подгрузку для остальных
+        await asyncio.shield(loading)
+
+    async def _load_user(self, user_id: int):
+        data, conversations = await self._read_user(user_id)
+        self._loaded_users.add(user_id)
+        self._digests[user_id] = hash(data)
+        self.users_loaded += 1
+        user_data = self._application._user_data[user_id]
+        if data is not None and not user_data:
+            user_data.update(pickle.loads(data))
+        tracking = self._application._conversation_handler_conversations
+        for (name, key), state in conversations.items():
+            states = tracking.get(name)
+            key = _decode_key(key)
+            if states is not None and state is not None and key not in states:
+                # Без отметки об изменении: записывать загруженное обратно незачем
+                states.update_no_track({key: pickle.loads(state)})
+
+    def unload_user(self, user_id: int, conversations):
+        """
+        Убирает состояние пользователя из памяти, оставляя его в базе: при следующем
+        обновлении оно подгрузится снова. conversations - [(handler, ключ разговора)].
+        """
+        application = self._application
+        data = application._user_data.pop(user_id, None)
+        if user_id in application._user_ids_to_be_updated_in_persistence:
+            # Application ещё не отдал изменения: записываем сами, иначе он запишет пустой словарь
+            application._user_ids_to_be_updated_in_persistence.discard(user_id)
+            self._stage_user_data(user_id, data or {})
+        for handler, key in conversations:
+            states = handler._conversations
+            if not handler.persistent:
+                states.pop(key, None)
+                continue
+            state = states.data.pop(key, None)
+            if key in states._write_access_keys:
+                states._write_access_keys.discard(key)
+                self._stage_conversation(handler.name, key, state)
+        self._loaded_users.discard(user_id)
+        self._digests.pop(user_id, None)
+
+    # -------------------------------
+    # Отложенная запись
+    # -------------------------------
+
+    def _stage_user_data(self, user_id: int, data):
+        blob = _dump(data) if data else None
+        digest = hash(blob)
+        if user_id in self._digests and self._digests[user_id] == digest:
+            self.writes_skipped += 1
+            return
+        self._digests[user_id] = digest
+        self._pending_users[user_id] = blob
+        self._schedule()
+
+    def _stage_conversation(self, name: str, key, new_state):
+        user_id = key[-1] if name in self._per_user_conversations else None
+        blob = _dump(new_state) if new_state is not None else None
+        self._pending_conversations.setdefault(user_id, {})[(name, _encode_key(key))] = blob
+        self._schedule()
+
+    def _schedule(self):
+        # Всё, что Application отдал за один проход update_persistence, попадает в одну пачку
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._timer = None
+        if self._writing is not None or not (self._pending_users or self._pending_conversations):
+            return
+        self._writing_users, self._pending_users = self._pending_users, {}
+        self._writing_conversations, self._pending_conversations = self._pending_conversations, {}
+        self._writing = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._write, self._writing_users, self._writing_conversations
+        )
+        self._writing.add_done_callback(self._written)
+
+    def _written(self, future):
+        users, conversations = self._writing_users, self._writing_conversations
+        self._writing_users, self._writing_conversations = {}, {}
+        self._writing = None
+        error = future.exception() if not future.cancelled() else asyncio.CancelledError()
+        if error is not None:
+            logger.error(f"Failed to save state of {len(users)} users: {error}")
+            # Вернуть в очередь, не затирая более свежие изменения; повтор - со следующей пачкой
+            for user_id, blob in users.items():
+                self._pending_users.setdefault(user_id, blob)
+            for user_id, states in conversations.items():
+                pending = self._pending_conversations.setdefault(user_id, {})
+                for name_key, blob in states.items():
+                    pending.setdefault(name_key, blob)
+            for user_id in users:
+                self._digests.pop(user_id, None)
+            return
+        if self._pending_users or self._pending_conversations:
+            self._schedule()
+
+    def _write(self, users: dict, conversations: dict):
+        connection = self._thread_connection()
+        rows = [(name, key, user_id, state)
+                for user_id, states in conversations.items()
+                for (name, key), state in states.items()]
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)",
+                [(user_id, blob) for user_id, blob in users.items() if blob is not None],
+            )
+            connection.executemany(
+                "DELETE FROM user_data WHERE user_id = ?",
+                [(user_id,) for user_id, blob in users.items() if blob is None],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO conversations (name, key, user_id, state) VALUES (?, ?, ?, ?)",
+                [row for row in rows if row[3] is not None],
+            )
+            connection.executemany(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                [(name, key) for name, key, _, state in rows if state is None],
+            )
+        self.rows_written += len(users) + len(rows)
+        self.batches += 1
+
+    # -------------------------------
+    # BasePersistence
+    # -------------------------------
+
+    async def get_user_data(self) -> dict:
+        # Подгружается по пользователю в _load()
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        # Разговоры без per_user не привязаны к пользователю, их приходится читать сразу
+        rows = await self._in_thread(self._select_conversations, name)
+        return {_decode_key(key): pickle.loads(state) for key, state in rows}
+
+    def _select_conversations(self, name: str) -> list:
+        return self._thread_connection().execute(
+            "SELECT key, state FROM conversations WHERE name = ? AND user_id IS NULL", (name,)
+        ).fetchall()
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._stage_conversation(name, key, new_state)
+
+    async def update_user_data(self, user_id: int, data) -> None:
+        self._stage_user_data(user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data) -> None:
+        pass
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._digests[user_id] = hash(None)
+        self._pending_users[user_id] = None
+        self._loaded_users.discard(user_id)
+        self._schedule()
+
+    async def refresh_user_data(self, user_id: int, user_data) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """
+        Дописывает всё накопленное; Application вызывает при остановке.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._writing is not None:
+            await asyncio.wait([self._writing])
+        self._flush()
+        if self._writing is not None:
+            await asyncio.wait([self._writing])
+
+    def _collect(self) -> list:
+        lines = sample_lines("bot_state_users_loaded_total", "Users whose state was loaded from SQLite.",
+                             [({}, self.users_loaded)], kind="counter")
+        lines += sample_lines("bot_state_rows_written_total", "Rows of user_data and conversations written.",
+                              [({}, self.rows_written)], kind="counter")
+        lines += sample_lines("bot_state_writes_skipped_total", "Unchanged user_data not written again.",
+                              [({}, self.writes_skipped)], kind="counter")
+        return lines
+
+
+bot_state_persistence = SQLitePersistence()
@@ -0,0 +1,218 @@
+# rate_limiter.py
+import asyncio
+import contextlib
+import contextvars
+import datetime
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    RATE_LIMIT_GLOBAL_PER_SECOND,
+    RATE_LIMIT_GLOBAL_BURST,
+    RATE_LIMIT_CHAT_PER_SECOND,
+    RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_GROUP_PER_MINUTE,
+    RATE_LIMIT_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Приоритеты исходящих запросов
+# -------------------------------
+
+PRIORITY_HIGH = 0     # подтверждения оплаты и т.п.
+PRIORITY_NORMAL = 1   # обычные ответы
+PRIORITY_LOW = 2      # перерисовка меню
+PRIORITY_BULK = 3     # рассылки (напоминания об окончании подписки), не мешают ответам
+
+# Методы, которые не являются сообщениями и не должны ждать в очереди
+UNLIMITED_ENDPOINTS = frozenset({
+    "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo", "answerCallbackQuery", "getFile",
+})
+
+_send_priority = contextvars.ContextVar("send_priority", default=PRIORITY_NORMAL)
+
+
+@contextlib.contextmanager
+def send_priority(priority: int):
+    """
+    Задаёт приоритет для всех отправок внутри блока, включая shortcut-методы
+    вроде message.reply_text, которые не принимают rate_limit_args:
+
+        with send_priority(PRIORITY_HIGH):
+            await update.message.reply_text("✅ Оплата прошла успешно.")
+    """
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше capacity.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Через сколько секунд будет доступен токен (0 - уже доступен).
+        """
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """
+    Планировщик исходящих запросов к Bot API.
+
+    Все отправки бота проходят через общий token bucket (лимит Telegram на
+    сообщения в секунду) и через bucket конкретного чата (~1 сообщение в секунду
+    в личный чат, 20 в минуту в группу). Когда общий лимит исчерпан, запросы
+    ждут в очереди по приоритету, поэтому подтверждение оплаты уходит раньше
+    перерисовки меню. Ответ 429 с retry_after приостанавливает отправку на
+    указанное время, после чего запрос повторяется, но не более max_retries раз.
+
+    Приоритет задаётся через rate_limit_args={"priority": ...} при вызове
+    методов бота или контекстным менеджером send_priority().
+    """
+
+    def __init__(self, global_rate: float = RATE_LIMIT_GLOBAL_PER_SECOND,
+                 global_burst: float = RATE_LIMIT_GLOBAL_BURST,
+                 chat_rate: float = RATE_LIMIT_CHAT_PER_SECOND,
+                 chat_burst: float = RATE_LIMIT_CHAT_BURST,
+                 group_per_minute: float = RATE_LIMIT_GROUP_PER_MINUTE,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_per_minute / 60
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._waiters = []
+        self._counter = itertools.count()
+        self._dispatcher = None
+        self.retry_after_count = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._prune_chat_buckets()
+            # Отрицательные id - группы и каналы
+            if str(chat_id).startswith("-"):
+                bucket = TokenBucket(self.group_rate, self.group_rate * 60)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_chat_buckets(self):
+        """
+        Удаляет buckets чатов, которые давно не использовались и уже полностью восстановились.
+        """
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if bucket.delay(now) == 0 and bucket.tokens >= bucket.capacity:
+                del self._chat_buckets[chat_id]
+
+    async def _acquire_chat(self, chat_id):
+        bucket = self._chat_bucket(chat_id)
+        while True:
+            wait = bucket.delay(time.monotonic())
+            if wait <= 0:
+                bucket.take()
+                return
+            await asyncio.sleep(wait)
+
+    async def _acquire_global(self, priority: int):
+        if not self._waiters and self.global_bucket.delay(time.monotonic()) <= 0:
+            self.global_bucket.take()
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """
+        Выдаёт токены общего bucket ожидающим запросам в порядке приоритета.
+        """
+        while self._waiters:
+            wait = self.global_bucket.delay(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.global_bucket.take()
+                future.set_result(None)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        priority = (rate_limit_args or {}).get("priority", _send_priority.get())
+        chat_id = data.get("chat_id")
+
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                await self._acquire_chat(chat_id)
+            await self._acquire_global(priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.retry_after_count += 1
+                retry_after = e.retry_after
+                if isinstance(retry_after, datetime.timedelta):
+                    retry_after = retry_after.total_seconds()
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"{endpoint} hit flood control (chat {chat_id}), retrying in {retry_after}s")
+                # Из ответа не видно, какой лимит превышен, поэтому пауза
+                # применяется и к чату, и ко всем исходящим запросам
+                until = time.monotonic() + retry_after
+                self.global_bucket.block(until)
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).block(until)
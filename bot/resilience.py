@@ -0,0 +1,204 @@
+# resilience.py
+"""
+Защита бота от медленного или упавшего бэкенда.
+
+- CircuitBreaker: после серии ошибок подряд перестаёт ходить в бэкенд и сразу
+  бросает BackendUnavailable; через recovery_timeout пропускает пробный запрос.
+- RetryBudget: ограничивает долю повторных запросов, чтобы повторы не
+  умножали нагрузку на и так перегруженный бэкенд.
+- endpoint_name / endpoint_timeout: таймауты по эндпоинтам.
+
+BackendUnavailable наследует httpx.RequestError, поэтому хендлеры, которые уже
+ловят httpx.HTTPError, показывают свои сообщения об ошибке, а кэш справочников
+отдаёт устаревшие данные.
+"""
+import asyncio
+import collections
+import logging
+import re
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r"/(-?\d+)(?=/|$)")
+
+
+class BackendUnavailable(httpx.RequestError):
+    """
+    Запрос не отправлен: предохранитель разомкнут.
+    """
+
+
+def endpoint_name(path: str) -> str:
+    """
+    Путь без идентификаторов: "/profile/123/" -> "/profile/{id}/".
+    """
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+def endpoint_timeout(path: str, timeouts: dict, default: float) -> float:
+    """
+    Таймаут по самому длинному совпавшему префиксу из timeouts.
+    """
+    best = None
+    for prefix in timeouts:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return timeouts[best] if best is not None else default
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, BackendUnavailable):
+        return False
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in (502, 503, 504)
+    return False
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """
+    Ошибки, которые говорят о проблеме с бэкендом (а не с запросом): сеть, таймауты, 5xx.
+    """
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 15,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.consecutive_failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self.failures = 0
+        self.successes = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"Circuit breaker {self.name}: half-open, sending a probe request")
+        return self._state
+
+    def before_call(self):
+        """
+        Бросает BackendUnavailable, если запрос сейчас отправлять нельзя.
+        """
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._half_open_calls >= self.half_open_max_calls):
+            self.rejected += 1
+            raise BackendUnavailable(f"Circuit breaker {self.name} is open")
+        if state == self.HALF_OPEN:
+            self._half_open_calls += 1
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self._state != self.CLOSED:
+            logger.info(f"Circuit breaker {self.name}: closed")
+        self._state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self._open()
+
+    def release(self):
+        """
+        Запрос отменён, не дойдя до результата: освобождаем место пробного запроса.
+        """
+        if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        logger.warning(
+            f"Circuit breaker {self.name}: open after {self.consecutive_failures} failures, "
+            f"failing fast for {self.recovery_timeout:.0f}s"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "successes": self.successes,
+        }
+
+
+class RetryBudget:
+    """
+    Повтор разрешён, пока за последние ttl секунд повторов было меньше, чем
+    ratio от числа запросов плюс min_per_second * ttl.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1, ttl: float = 10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.ttl = ttl
+        self._requests = collections.deque()
+        self._retries = collections.deque()
+        self.exhausted = 0
+
+    def _prune(self, now: float):
+        for window in (self._requests, self._retries):
+            while window and now - window[0] > self.ttl:
+                window.popleft()
+
+    def record_request(self):
+        self._requests.append(time.monotonic())
+
+    def try_withdraw(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        allowed = self.min_per_second * self.ttl + self.ratio * len(self._requests)
+        if len(self._retries) + 1 > allowed:
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> dict:
+        self._prune(time.monotonic())
+        return {"requests": len(self._requests), "retries": len(self._retries), "exhausted": self.exhausted}
+
+
+async def report_backend_stats(interval: float, breaker: CircuitBreaker, budget: RetryBudget):
+    """
+    Периодически пишет в лог состояние предохранителя и бюджета повторов.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        stats = breaker.stats()
+        budget_stats = budget.stats()
+        logger.info(
+            f"Backend breaker {stats['name']}: {stats['state']} (opened={stats['opened']}, "
+            f"rejected={stats['rejected']}, failures={stats['failures']}, successes={stats['successes']}); "
+            f"retries {budget_stats['retries']}/{budget_stats['requests']} in window, "
+            f"budget exhausted={budget_stats['exhausted']}"
+        )
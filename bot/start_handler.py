@@ -1,16 +1,22 @@
 # start_handler.py
 import logging
-import requests
+import httpx
 import telegram
-from requests.exceptions import RequestException
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 # Logging setup
 logger = logging.getLogger(__name__)
 
-# Backend API URL
-BACKEND_API_BASE_URL = "http://localhost:8000/blog"  # Backend server URL (adjust as needed)
+from backend_client import backend_get, backend_post
+from keyboards import (
+    AGREEMENT_KEYBOARD,
+    AGREEMENT_TEXT,
+    START_KEYBOARD,
+    START_TEXT,
+    SUBSCRIPTION_MENU_KEYBOARD,
+    SUBSCRIPTION_MENU_TEXT,
+)
 
 # States
 START, AGREEMENTS = range(2)
@@ -20,34 +26,27 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Start command handler. Shows the 'Start' button for new users to register.
     """
     user = update.effective_user
-    keyboard = [[InlineKeyboardButton("Начать", callback_data="register")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await update.message.reply_text(
-        "Добро пожаловать! Нажмите кнопку 'Начать' для продолжения.",
-        reply_markup=reply_markup
-    )
+    await update.message.reply_text(START_TEXT, reply_markup=START_KEYBOARD)
     return START
 
 async def register_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Register the user by sending a request to the backend API.
+    Register the user and get their consent status in one request (/bootstrap/).
     """
     query = update.callback_query
     await query.answer()  # Acknowledge the button press
     user = query.from_user
-    api_url = f"{BACKEND_API_BASE_URL}/register/"
     data = {"telegram_id": user.id, "username": user.username}
 
     try:
-        response = requests.post(api_url, json=data)
-        response.raise_for_status()
+        response = await backend_post("/bootstrap/", json=data)
+        bootstrap = response.json()
         await safe_edit_message_text(
             query,
             "Пользователь успешно зарегистрирован."
         )
-        return await check_agreements(query, context)
-    except RequestException as e:
+        return await check_agreements(query, context, consent_given=bootstrap.get('consent_given', False))
+    except httpx.HTTPError as e:
         logger.error(f"Error registering user: {e}")
         await safe_edit_message_text(
             query,
@@ -55,18 +54,17 @@ async def register_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ConversationHandler.END
 
-async def check_agreements(query, context: ContextTypes.DEFAULT_TYPE):
+async def check_agreements(query, context: ContextTypes.DEFAULT_TYPE, consent_given: bool = None):
     """
     Check user agreements and guide to acceptance if needed.
+    If consent_given is already known (from /bootstrap/), the backend is not asked again.
     """
     user = query.from_user
-    api_url = f"{BACKEND_API_BASE_URL}/consent-status/{user.id}/"
-
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        consent_data = response.json()
-        if consent_data.get('consent_given', False):
+        if consent_given is None:
+            response = await backend_get(f"/consent-status/{user.id}/")
+            consent_given = response.json().get('consent_given', False)
+        if consent_given:
             await safe_edit_message_text(
                 query,
                 "Ваше согласие уже получено. Можете продолжить."
@@ -75,19 +73,9 @@ async def check_agreements(query, context: ContextTypes.DEFAULT_TYPE):
             await show_subscription_menu(query)
             return ConversationHandler.END
         else:
-            keyboard = [[
-                InlineKeyboardButton("Принять", callback_data="accept_user_agreement"),
-                InlineKeyboardButton("Отказаться", callback_data="reject_user_agreement")
-            ]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await safe_edit_message_text(
-                query,
-                "Для продолжения необходимо принять пользовательское соглашение.",
-                reply_markup=reply_markup
-            )
+            await safe_edit_message_text(query, AGREEMENT_TEXT, reply_markup=AGREEMENT_KEYBOARD)
             return AGREEMENTS
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error checking user agreements: {e}")
         await safe_edit_message_text(
             query,
@@ -102,18 +90,16 @@ async def handle_agreement_response(update: Update, context: ContextTypes.DEFAUL
 
     if action == "accept_user_agreement":
         user = query.from_user
-        api_url = f"{BACKEND_API_BASE_URL}/consent/{user.id}/"
         data = {"consent_given": True}
 
         try:
-            response = requests.post(api_url, json=data)
-            response.raise_for_status()
+            await backend_post(f"/consent/{user.id}/", json=data)
 
             # Rozilik berilganidan keyin yangi menyu chiqariladi
             await query.message.reply_text("Согласие принято. Спасибо!")
             await show_subscription_menu(query)
             return ConversationHandler.END
-        except RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error saving user agreement: {e}")
             await query.edit_message_text(
                 "Произошла ошибка при сохранении согласия. Попробуйте позже."
@@ -131,21 +117,7 @@ async def show_subscription_menu(query):
     """
     Show the subscription menu to the user.
     """
-    keyboard = [
-        [
-            InlineKeyboardButton("Приобрести подписку", callback_data="select_plan"),
-            InlineKeyboardButton("Подарить подписку", callback_data="gift_subscription"),
-        ],
-        [
-            InlineKeyboardButton("Поддержка", callback_data="support"),
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.message.reply_text(
-        "Пожалуйста, выберите одно из следующих действий:",
-        reply_markup=reply_markup
-    )
+    await query.message.reply_text(SUBSCRIPTION_MENU_TEXT, reply_markup=SUBSCRIPTION_MENU_KEYBOARD)
 
 async def safe_edit_message_text(query, new_text, reply_markup=None):
     """
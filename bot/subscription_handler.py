@@ -1,8 +1,6 @@
 # subscription_handler.py
 import logging
-import requests
-from requests.exceptions import RequestException
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Update
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
@@ -14,13 +12,26 @@ import httpx
 
 # Импорт необходимых функций из other_handlers.py
 from other_handlers import show_main_menu, go_back_to_menu
+from backend_client import backend_post
+from catalogue import get_subscription_plans, get_payment_methods
+from rate_limiter import send_priority, PRIORITY_HIGH
+from support_batcher import support_message_batcher, SupportMessageRejected
+from user_state import FlowConversationHandler
+from keyboards import (
+    BACK_TO_GIFT_METHODS_KEYBOARD,
+    BACK_TO_MENU_KEYBOARD,
+    BACK_TO_METHODS_KEYBOARD,
+    FAQ_ANSWER_KEYBOARD,
+    FAQ_ANSWERS,
+    FAQ_KEYBOARD,
+    FAQ_TEXT,
+    SUPPORT_MESSAGE_PROMPT_TEXT,
+    catalogue_keyboard,
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# URL API бэкенда
-BACKEND_API_BASE_URL = "http://localhost:8000/blog"  # Настройте при необходимости
-
 # -------------------------------
 # Определение состояний для ConversationHandler
 # -------------------------------
@@ -39,24 +50,16 @@ async def show_subscription_plans(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
 
-    api_url = f"{BACKEND_API_BASE_URL}/subscription-plans/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        plans = response.json()
+        plans = await get_subscription_plans()
 
-        keyboard = [
-            [InlineKeyboardButton(plan["name"], callback_data=f"select_plan_{plan['id']}")]
-            for plan in plans
-        ]
-        keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = catalogue_keyboard(plans, "select_plan_", "go_back_to_menu")
 
         await query.edit_message_text(
             "📋 Пожалуйста, выберите план подписки:", reply_markup=reply_markup
         )
         return SELECT_PLAN
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при получении планов подписки: {e}")
         await query.edit_message_text("❌ Произошла ошибка при получении планов подписки. Попробуйте позже.")
         return ConversationHandler.END
@@ -73,24 +76,16 @@ async def select_subscription_plan(update: Update, context: ContextTypes.DEFAULT
     plan_id = query.data.split("_")[-1]
     context.user_data["selected_plan_id"] = plan_id
 
-    api_url = f"{BACKEND_API_BASE_URL}/payment-methods/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        methods = response.json()
+        methods = await get_payment_methods()
 
-        keyboard = [
-            [InlineKeyboardButton(method["name"], callback_data=f"select_method_{method['id']}")]
-            for method in methods
-        ]
-        keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_plans")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = catalogue_keyboard(methods, "select_method_", "go_back_to_plans")
 
         await query.edit_message_text(
             "💳 Пожалуйста, выберите способ оплаты:", reply_markup=reply_markup
         )
         return SELECT_PAYMENT_METHOD
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при получении способов оплаты: {e}")
         await query.edit_message_text("❌ Произошла ошибка при получении способов оплаты. Попробуйте позже.")
         return ConversationHandler.END
@@ -107,11 +102,7 @@ async def select_payment_method(update: Update, context: ContextTypes.DEFAULT_TY
     method_id = query.data.split("_")[-1]
     context.user_data["selected_method_id"] = method_id
 
-    # Кнопка "Назад"
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="go_back_to_methods")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.edit_message_text("🔒 Пожалуйста, введите номер карты для оплаты:", reply_markup=reply_markup)
+    await query.edit_message_text("🔒 Пожалуйста, введите номер карты для оплаты:", reply_markup=BACK_TO_METHODS_KEYBOARD)
     return ENTER_PAYMENT_DETAILS
 
 
@@ -131,7 +122,6 @@ async def enter_payment_details(update: Update, context: ContextTypes.DEFAULT_TY
     plan_id = context.user_data.get("selected_plan_id")
     method_id = context.user_data.get("selected_method_id")
 
-    api_url = f"{BACKEND_API_BASE_URL}/make-payment/{user.id}/"
     data = {
         "subscription_plan": plan_id,
         "payment_method": method_id,
@@ -139,19 +129,13 @@ async def enter_payment_details(update: Update, context: ContextTypes.DEFAULT_TY
     }
 
     try:
-        response = requests.post(api_url, json=data)
-        response.raise_for_status()
+        await backend_post(f"/make-payment/{user.id}/", json=data, idempotent=True)
 
-        # Кнопка "Назад" после успешной оплаты
-        keyboard = [
-            [InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await update.message.reply_text("✅ Оплата прошла успешно. Спасибо за покупку подписки!", reply_markup=reply_markup)
+        with send_priority(PRIORITY_HIGH):
+            await update.message.reply_text("✅ Оплата прошла успешно. Спасибо за покупку подписки!", reply_markup=BACK_TO_MENU_KEYBOARD)
         await show_main_menu(update, context)
         return ConversationHandler.END
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при обработке оплаты: {e}")
         await update.message.reply_text("❌ Произошла ошибка при обработке оплаты. Попробуйте позже.")
         return ConversationHandler.END
@@ -185,25 +169,17 @@ async def select_gift_recipient(update: Update, context: ContextTypes.DEFAULT_TY
 
     context.user_data["recipient_username"] = recipient_username
 
-    api_url = f"{BACKEND_API_BASE_URL}/subscription-plans/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        plans = response.json()
+        plans = await get_subscription_plans()
 
-        keyboard = [
-            [InlineKeyboardButton(plan["name"], callback_data=f"select_gift_plan_{plan['id']}")]
-            for plan in plans
-        ]
-        keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = catalogue_keyboard(plans, "select_gift_plan_", "go_back_to_menu")
 
         await update.message.reply_text(
             "🎁 Пожалуйста, выберите план подписки, который вы хотите подарить:",
             reply_markup=reply_markup
         )
         return SELECT_GIFT_PLAN
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при получении планов подписки: {e}")
         await update.message.reply_text("❌ Произошла ошибка при получении планов подписки. Попробуйте позже.")
         return ConversationHandler.END
@@ -220,24 +196,16 @@ async def select_gift_plan(update: Update, context: ContextTypes.DEFAULT_TYPE):
     plan_id = query.data.split("_")[-1]
     context.user_data["selected_plan_id"] = plan_id
 
-    api_url = f"{BACKEND_API_BASE_URL}/payment-methods/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        methods = response.json()
+        methods = await get_payment_methods()
 
-        keyboard = [
-            [InlineKeyboardButton(method["name"], callback_data=f"select_gift_method_{method['id']}")]
-            for method in methods
-        ]
-        keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_gift_plans")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = catalogue_keyboard(methods, "select_gift_method_", "go_back_to_gift_plans")
 
         await query.edit_message_text(
             "💳 Пожалуйста, выберите способ оплаты:", reply_markup=reply_markup
         )
         return SELECT_GIFT_PAYMENT_METHOD
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при получении способов оплаты: {e}")
         await query.edit_message_text("❌ Произошла ошибка при получении способов оплаты. Попробуйте позже.")
         return ConversationHandler.END
@@ -254,11 +222,7 @@ async def select_gift_payment_method(update: Update, context: ContextTypes.DEFAU
     method_id = query.data.split("_")[-1]
     context.user_data["selected_method_id"] = method_id
 
-    # Кнопка "Назад"
-    keyboard = [[InlineKeyboardButton("Назад", callback_data="go_back_to_gift_methods")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.edit_message_text("🔒 Пожалуйста, введите номер карты для оплаты:", reply_markup=reply_markup)
+    await query.edit_message_text("🔒 Пожалуйста, введите номер карты для оплаты:", reply_markup=BACK_TO_GIFT_METHODS_KEYBOARD)
     return ENTER_GIFT_PAYMENT_DETAILS
 
 
@@ -278,31 +242,24 @@ async def enter_gift_payment_details(update: Update, context: ContextTypes.DEFAU
     recipient_username = context.user_data.get("recipient_username")
     plan_id = context.user_data.get("selected_plan_id")
     method_id = context.user_data.get("selected_method_id")
-    api_url = f"{BACKEND_API_BASE_URL}/gift-subscription/{user.id}/"
     data = {
-        "subscription_plan": plan_id,
+        "plan_id": plan_id,
         "payment_method": method_id,
         "recipient_username": recipient_username,
         "transaction_id": card_number  # Используем номер карты как временный ID транзакции
     }
 
     try:
-        response = requests.post(api_url, json=data)
-        response.raise_for_status()
-
-        # Кнопка "Назад" после успешного подарка
-        keyboard = [
-            [InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        await backend_post(f"/gift-subscription/{user.id}/", json=data, idempotent=True)
 
-        await update.message.reply_text(
-            f"🎁 Подписка успешно подарена пользователю {recipient_username}! Спасибо за использование нашего сервиса.",
-            reply_markup=reply_markup
-        )
+        with send_priority(PRIORITY_HIGH):
+            await update.message.reply_text(
+                f"🎁 Подписка успешно подарена пользователю {recipient_username}! Спасибо за использование нашего сервиса.",
+                reply_markup=BACK_TO_MENU_KEYBOARD
+            )
         await show_main_menu(update, context)
         return ConversationHandler.END
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при отправке подарка подписки: {e}")
         await update.message.reply_text("❌ Произошла ошибка при отправке подарка. Попробуйте позже.")
         return ConversationHandler.END
@@ -311,38 +268,14 @@ async def enter_gift_payment_details(update: Update, context: ContextTypes.DEFAU
 # Функции для поддержки
 # -------------------------------
 
-# Предполагается, что FAQ_ITEMS определены в other_handlers.py
-# Если они определены там, убедитесь, что можно импортировать их сюда
-# Для примера, определим их здесь
-
-FAQ_ITEMS = [
-    {
-        "question": "Как пополнить баланс?",
-        "answer": "Вы можете пополнить баланс, выбрав опцию 'Пополнить баланс' в главном меню и следуя инструкциям."
-    },
-    {
-        "question": "Как проверить свой аккаунт?",
-        "answer": "Перейдите в раздел 'Мой аккаунт', чтобы просмотреть информацию о вашем профиле."
-    },
-    # Вы можете добавить дополнительные FAQ пункты по необходимости
-]
-
 async def show_faq(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Показывает список часто задаваемых вопросов.
     """
-    keyboard = [
-        [InlineKeyboardButton(item["question"], callback_data=f"faq_{index}")]
-        for index, item in enumerate(FAQ_ITEMS)
-    ]
-    keyboard.append([InlineKeyboardButton("Отправить сообщение в поддержку", callback_data="send_support_message")])
-    keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_menu")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     if update.callback_query:
-        await update.callback_query.edit_message_text("❓ *Часто задаваемые вопросы:*", parse_mode='Markdown', reply_markup=reply_markup)
+        await update.callback_query.edit_message_text(FAQ_TEXT, parse_mode='Markdown', reply_markup=FAQ_KEYBOARD)
     else:
-        await update.message.reply_text("❓ *Часто задаваемые вопросы:*", parse_mode='Markdown', reply_markup=reply_markup)
+        await update.message.reply_text(FAQ_TEXT, parse_mode='Markdown', reply_markup=FAQ_KEYBOARD)
 
     return SHOW_FAQ
 
@@ -356,19 +289,11 @@ async def show_faq_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Извлекаем индекс вопроса из callback_data
     index = int(query.data.split("_")[-1])
-    faq_item = FAQ_ITEMS[index]
-
-    keyboard = [
-        [InlineKeyboardButton("Другой вопрос", callback_data="show_faq")],
-        [InlineKeyboardButton("Отправить сообщение в поддержку", callback_data="send_support_message")],
-        [InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
 
     await query.edit_message_text(
-        f"**{faq_item['question']}**\n\n{faq_item['answer']}",
+        FAQ_ANSWERS[index],
         parse_mode='Markdown',
-        reply_markup=reply_markup
+        reply_markup=FAQ_ANSWER_KEYBOARD
     )
     return SHOW_FAQ_ANSWER
 
@@ -393,22 +318,17 @@ async def show_support_message_prompt(update: Update, context: ContextTypes.DEFA
     """
     Показывает пользователю приглашение отправить сообщение в поддержку.
     """
-    keyboard = [
-        [InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     if update.callback_query:
         await update.callback_query.edit_message_text(
-            "📝 *Отправьте ваше сообщение в поддержку:*",
+            SUPPORT_MESSAGE_PROMPT_TEXT,
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=BACK_TO_MENU_KEYBOARD
         )
     else:
         await update.message.reply_text(
-            "📝 *Отправьте ваше сообщение в поддержку:*",
+            SUPPORT_MESSAGE_PROMPT_TEXT,
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=BACK_TO_MENU_KEYBOARD
         )
 
 
@@ -425,10 +345,7 @@ async def start_support_session(update: Update, context: ContextTypes.DEFAULT_TY
 
         logger.debug(f"Начало сессии поддержки для telegram_id: {telegram_id}")
 
-        api_url = f"{BACKEND_API_BASE_URL}/support/start-session/{telegram_id}/"
-
-        response = requests.post(api_url)
-        response.raise_for_status()
+        response = await backend_post(f"/support/start-session/{telegram_id}/")
         data = response.json()
         session_id = data.get("session_id")
 
@@ -445,7 +362,7 @@ async def start_support_session(update: Update, context: ContextTypes.DEFAULT_TY
         await show_faq(update, context)
         return SHOW_FAQ
 
-    except requests.HTTPError as e:
+    except httpx.HTTPError as e:
         logger.error(f"HTTP ошибка при начале сессии поддержки: {e}")
         await update.callback_query.message.reply_text("❌ Произошла ошибка при начале сессии поддержки. Попробуйте позже.")
         return ConversationHandler.END
@@ -474,41 +391,31 @@ async def process_support_message(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("❌ Сессия поддержки не найдена. Пожалуйста, начните новую сессию.")
         return ConversationHandler.END
 
-    api_url = f"{BACKEND_API_BASE_URL}/support/send-message/"
-    data = {
-        "session_id": session_id,
-        "sender": sender,
-        "message_text": message_text
-    }
+    try:
+        # Ответ пользователю - только после того, как бэкенд сохранил сообщение
+        await support_message_batcher.submit(session_id, sender, message_text)
 
-    async with httpx.AsyncClient() as client:
+        await update.message.reply_text(
+            "✅ Сообщение успешно отправлено. Если у вас есть дополнительные вопросы, пожалуйста, продолжайте.",
+            reply_markup=BACK_TO_MENU_KEYBOARD
+        )
+        return SEND_SUPPORT_MESSAGE
+    except SupportMessageRejected as e:
+        logger.error(f"Сообщение поддержки отклонено: {e}")
+        await update.message.reply_text(f"{e}")
+        return ConversationHandler.END
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP ошибка при отправке сообщения поддержки: {e}")
         try:
-            response = await client.post(api_url, json=data)
-            response.raise_for_status()
-
-            # Кнопка "Назад"
-            keyboard = [
-                [InlineKeyboardButton("Назад", callback_data="go_back_to_menu")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await update.message.reply_text(
-                "✅ Сообщение успешно отправлено. Если у вас есть дополнительные вопросы, пожалуйста, продолжайте.",
-                reply_markup=reply_markup
-            )
-            return SEND_SUPPORT_MESSAGE
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP ошибка при отправке сообщения поддержки: {e}")
-            try:
-                error_message = response.json().get('error', "❌ Произошла ошибка при отправке сообщения. Попробуйте позже.")
-            except:
-                error_message = "❌ Произошла ошибка при отправке сообщения. Попробуйте позже."
-            await update.message.reply_text(f"{error_message}")
-            return ConversationHandler.END
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка при отправке сообщения поддержки: {e}")
-            await update.message.reply_text("❌ Произошла непредвиденная ошибка. Попробуйте позже.")
-            return ConversationHandler.END
+            error_message = e.response.json().get('error', "❌ Произошла ошибка при отправке сообщения. Попробуйте позже.")
+        except:
+            error_message = "❌ Произошла ошибка при отправке сообщения. Попробуйте позже."
+        await update.message.reply_text(f"{error_message}")
+        return ConversationHandler.END
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при отправке сообщения поддержки: {e}")
+        await update.message.reply_text("❌ Произошла непредвиденная ошибка. Попробуйте позже.")
+        return ConversationHandler.END
 
 # -------------------------------
 # Обработчики "Назад"
@@ -531,24 +438,16 @@ async def go_back_to_methods(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
 
-    api_url = f"{BACKEND_API_BASE_URL}/payment-methods/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        methods = response.json()
+        methods = await get_payment_methods()
 
-        keyboard = [
-            [InlineKeyboardButton(method["name"], callback_data=f"select_method_{method['id']}")]
-            for method in methods
-        ]
-        keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_plans")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = catalogue_keyboard(methods, "select_method_", "go_back_to_plans")
 
         await query.edit_message_text(
             "💳 Пожалуйста, выберите способ оплаты:", reply_markup=reply_markup
         )
         return SELECT_PAYMENT_METHOD
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при получении способов оплаты: {e}")
         await query.edit_message_text("❌ Произошла ошибка при получении способов оплаты. Попробуйте позже.")
         return ConversationHandler.END
@@ -571,24 +470,16 @@ async def go_back_to_gift_methods(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
 
-    api_url = f"{BACKEND_API_BASE_URL}/payment-methods/"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        methods = response.json()
+        methods = await get_payment_methods()
 
-        keyboard = [
-            [InlineKeyboardButton(method["name"], callback_data=f"select_gift_method_{method['id']}")]
-            for method in methods
-        ]
-        keyboard.append([InlineKeyboardButton("Назад", callback_data="go_back_to_gift_plans")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = catalogue_keyboard(methods, "select_gift_method_", "go_back_to_gift_plans")
 
         await query.edit_message_text(
             "💳 Пожалуйста, выберите способ оплаты:", reply_markup=reply_markup
         )
         return SELECT_GIFT_PAYMENT_METHOD
-    except RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при получении способов оплаты: {e}")
         await query.edit_message_text("❌ Произошла ошибка при получении способов оплаты. Попробуйте позже.")
         return ConversationHandler.END
@@ -597,7 +488,7 @@ async def go_back_to_gift_methods(update: Update, context: ContextTypes.DEFAULT_
 # Conversation Handler для подписки и поддержки
 # -------------------------------
 
-subscription_conversation_handler = ConversationHandler(
+subscription_conversation_handler = FlowConversationHandler(
     entry_points=[
         CallbackQueryHandler(show_subscription_plans, pattern="^select_plan$"),
         CallbackQueryHandler(start_gifting_subscription, pattern="^gift_subscription$"),
@@ -658,4 +549,7 @@ subscription_conversation_handler = ConversationHandler(
         CallbackQueryHandler(go_back_to_gift_plans, pattern="^go_back_to_gift_plans$"),
         CallbackQueryHandler(go_back_to_gift_methods, pattern="^go_back_to_gift_methods$"),
     ],
+    name="subscription",
+    persistent=True,
+    flow_keys=("selected_plan_id", "selected_method_id", "recipient_username", "support_session_id"),
 )
@@ -0,0 +1,93 @@
+# support_batcher.py
+"""
+Сообщения поддержки уходят в бэкенд пачками (POST /support/send-messages/).
+
+Хендлер вызывает submit() и ждёт, пока бэкенд сохранит именно его сообщение:
+сообщения, пришедшие в течение delay секунд (или пока не наберётся max_size),
+отправляются одним запросом, и каждый ждущий получает свой результат из ответа.
+Пользователь видит "✅ отправлено" только после того, как сообщение записано в БД.
+"""
+import asyncio
+import logging
+
+from backend_client import backend_post
+from config import SUPPORT_BATCH_DELAY, SUPPORT_BATCH_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class SupportMessageRejected(Exception):
+    """
+    Бэкенд отклонил сообщение (например, сессия не найдена или завершена).
+    """
+
+
+class SupportMessageBatcher:
+    def __init__(self, delay: float = SUPPORT_BATCH_DELAY, max_size: int = SUPPORT_BATCH_MAX_SIZE,
+                 path: str = "/support/send-messages/"):
+        self.delay = delay
+        self.max_size = max_size
+        self.path = path
+        # (сообщение, future того, кто его ждёт)
+        self._pending = []
+        self._timer = None
+        self._inflight = set()
+        self.batches = 0
+        self.messages = 0
+
+    async def submit(self, session_id, sender: str, message_text: str):
+        """
+        Ставит сообщение в ближайшую пачку и ждёт, пока бэкенд его сохранит.
+        Бросает SupportMessageRejected или httpx.HTTPError.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(({"session_id": session_id, "sender": sender, "message_text": message_text}, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._flush)
+        # Отмена хендлера не отменяет уже поставленное в пачку сообщение
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: list):
+        self.batches += 1
+        self.messages += len(batch)
+        try:
+            response = await backend_post(self.path, json={"messages": [message for message, _ in batch]})
+            results = response.json()["results"]
+        except Exception as e:
+            logger.error(f"Failed to deliver {len(batch)} support messages: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if result.get("status") == "ok":
+                future.set_result(None)
+            else:
+                future.set_exception(SupportMessageRejected(result.get("error") or "Сообщение не сохранено."))
+
+    async def close(self):
+        """
+        Отправляет всё накопленное и ждёт завершения запросов (при остановке бота).
+        """
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+
+support_message_batcher = SupportMessageBatcher()
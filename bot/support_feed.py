@@ -0,0 +1,145 @@
+# support_feed.py
+"""
+Доставка ответов операторов поддержки пользователям.
+
+Одна фоновая задача держит long-poll запрос GET /support/changes/?after=<cursor>:
+бэкенд отвечает, как только появляются новые ответы (или по таймауту), и бот
+рассылает их по чатам. Число запросов к бэкенду не зависит от числа открытых
+сессий: тихие сессии ничего не стоят.
+
+Ответы одного чата отправляются по порядку, разных чатов - параллельно (через
+общий PriorityRateLimiter). Cursor сохраняется на диск после каждой пачки, так
+что после перезапуска бот продолжает с того же места; пачка, прерванная
+перезапуском, может быть доставлена повторно.
+"""
+import asyncio
+import datetime
+import logging
+import os
+
+from telegram.error import Forbidden, TelegramError
+
+from backend_client import backend_get
+from config import (
+    BACKEND_TIMEOUT,
+    SUPPORT_FEED_CURSOR_PATH,
+    SUPPORT_FEED_LIMIT,
+    SUPPORT_FEED_TIMEOUT,
+)
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+REPLY_LAG = Histogram(
+    "bot_support_reply_lag_seconds",
+    "Time from an operator reply being stored to it being sent to the user.",
+    ["outcome"],
+)
+
+SUPPORT_REPLY_TEXT = "💬 Ответ поддержки:\n\n{message_text}"
+
+
+def _lag(timestamp) -> float:
+    try:
+        stored = datetime.datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+        return max((datetime.datetime.now(datetime.timezone.utc) - stored).total_seconds(), 0.0)
+    except ValueError:
+        return 0.0
+
+
+class SupportReplyFeed:
+    def __init__(self, path: str = "/support/changes/", timeout: float = SUPPORT_FEED_TIMEOUT,
+                 limit: int = SUPPORT_FEED_LIMIT, cursor_path: str = SUPPORT_FEED_CURSOR_PATH,
+                 max_backoff: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self.limit = limit
+        self.cursor_path = cursor_path
+        self.max_backoff = max_backoff
+        self.cursor = None
+        self.polls = 0
+        self.delivered = 0
+        self.failed = 0
+
+    def _load_cursor(self):
+        try:
+            with open(self.cursor_path) as file:
+                return int(file.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _save_cursor(self, cursor: int):
+        directory = os.path.dirname(self.cursor_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(str(cursor))
+        os.replace(tmp_path, self.cursor_path)
+
+    async def _poll(self) -> dict:
+        params = {"timeout": self.timeout, "limit": self.limit}
+        if self.cursor is not None:
+            params["after"] = self.cursor
+        # Таймаут клиента больше, чем бэкенд держит запрос
+        response = await backend_get(self.path, params=params, timeout=self.timeout + BACKEND_TIMEOUT)
+        self.polls += 1
+        return response.json()
+
+    async def _send_to_chat(self, bot, chat_id, messages: list):
+        for index, message in enumerate(messages):
+            try:
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=SUPPORT_REPLY_TEXT.format(message_text=message["message_text"]),
+                )
+                self.delivered += 1
+                REPLY_LAG.observe(_lag(message.get("timestamp")), outcome="sent")
+            except Forbidden as e:
+                # Пользователь заблокировал бота - остальные ответы этому чату тоже не дойдут
+                self.failed += len(messages) - index
+                logger.warning(f"Support replies to {chat_id} dropped, bot is blocked: {e}")
+                return
+            except TelegramError as e:
+                self.failed += 1
+                REPLY_LAG.observe(_lag(message.get("timestamp")), outcome="failed")
+                logger.error(f"Failed to deliver support reply {message['id']} to {chat_id}: {e}")
+
+    async def deliver(self, bot, messages: list):
+        """
+        Рассылает пачку ответов: по порядку внутри чата, параллельно между чатами.
+        """
+        by_chat = {}
+        for message in messages:
+            by_chat.setdefault(message["telegram_id"], []).append(message)
+        await asyncio.gather(*(self._send_to_chat(bot, chat_id, chat_messages)
+                               for chat_id, chat_messages in by_chat.items()))
+
+    async def run(self, bot):
+        """
+        Фоновая задача: забирает новые ответы и рассылает их, пока её не отменят.
+        """
+        self.cursor = await asyncio.to_thread(self._load_cursor)
+        logger.info(f"Support reply feed started from cursor {self.cursor}")
+        failures = 0
+        while True:
+            try:
+                data = await self._poll()
+            except Exception as e:
+                failures += 1
+                delay = min(2 ** failures, self.max_backoff)
+                logger.error(f"Support reply feed request failed, retrying in {delay:.0f}s: {e!r}")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+
+            messages = data.get("messages") or []
+            if messages:
+                await self.deliver(bot, messages)
+            cursor = data.get("cursor")
+            if cursor is not None and cursor != self.cursor:
+                self.cursor = cursor
+                await asyncio.to_thread(self._save_cursor, cursor)
+
+
+support_reply_feed = SupportReplyFeed()
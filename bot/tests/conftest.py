@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# Модули бота импортируют друг друга по плоским именам (как при запуске из bot/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
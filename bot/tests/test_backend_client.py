@@ -0,0 +1,79 @@
+# test_backend_client.py
+import asyncio
+
+import httpx
+import pytest
+
+import backend_client
+
+BODY = b'{"plans": []}'
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """
+    Подменяет общий клиент бэкенда на MockTransport; handler теста отвечает на запросы.
+    """
+    requests = []
+    state = {}
+
+    def dispatch(request):
+        requests.append(request)
+        return state["handler"](request)
+
+    client = httpx.AsyncClient(base_url="http://backend.test/blog", transport=httpx.MockTransport(dispatch))
+    monkeypatch.setattr(backend_client, "_client", client)
+    backend_client.validators.clear()
+    yield state, requests
+    backend_client.validators.clear()
+    asyncio.run(client.aclose())
+
+
+def test_not_modified_uses_stored_response(backend):
+    state, requests = backend
+    state["handler"] = lambda request: httpx.Response(200, content=BODY, headers={"ETag": '"v1"'})
+    asyncio.run(backend_client.backend_get("/subscription-plans/"))
+
+    state["handler"] = lambda request: httpx.Response(304, headers={"ETag": '"v1"'})
+    response = asyncio.run(backend_client.backend_get("/subscription-plans/"))
+
+    assert requests[-1].headers["If-None-Match"] == '"v1"'
+    assert (response.status_code, response.content) == (200, BODY)
+
+
+def test_entry_evicted_between_send_and_304(backend):
+    state, requests = backend
+    state["handler"] = lambda request: httpx.Response(200, content=BODY, headers={"ETag": '"v1"'})
+    asyncio.run(backend_client.backend_get("/subscription-plans/"))
+
+    def evict_then_not_modified(request):
+        # Параллельные запросы вытеснили запись, пока этот ждал ответа
+        backend_client.validators.clear()
+        return httpx.Response(304, headers={"ETag": '"v1"'})
+
+    state["handler"] = evict_then_not_modified
+    response = asyncio.run(backend_client.backend_get("/subscription-plans/"))
+
+    assert (response.status_code, response.content) == (200, BODY)
+    assert response.json() == {"plans": []}
+    assert len(requests) == 2
+
+
+def test_unconditional_not_modified_is_retried_once(backend):
+    state, requests = backend
+    replies = iter([httpx.Response(304), httpx.Response(200, content=BODY, headers={"ETag": '"v2"'})])
+    state["handler"] = lambda request: next(replies)
+
+    response = asyncio.run(backend_client.backend_get("/subscription-plans/"))
+
+    assert (response.status_code, response.content) == (200, BODY)
+    assert ["If-None-Match" in request.headers for request in requests] == [False, False]
+
+
+def test_repeated_unconditional_not_modified_raises(backend):
+    state, requests = backend
+    state["handler"] = lambda request: httpx.Response(304)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(backend_client.backend_get("/subscription-plans/"))
+    assert len(requests) == 2
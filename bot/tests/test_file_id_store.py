@@ -0,0 +1,26 @@
+# test_file_id_store.py
+import asyncio
+import threading
+
+from file_id_store import FileIdStore
+
+
+def test_entries_are_loaded_once_in_a_thread(tmp_path):
+    path = str(tmp_path / "file_ids.sqlite3")
+    asyncio.run(FileIdStore(path).set(7, "hash-1", "file-1"))
+
+    store = FileIdStore(path)
+    load = store.load
+    threads = []
+
+    def recording_load():
+        threads.append(threading.current_thread())
+        load()
+
+    store.load = recording_load
+
+    async def scenario():
+        return await asyncio.gather(store.get(7, "hash-1"), store.get(7, "hash-2"), store.get(8, "hash-1"))
+
+    assert asyncio.run(scenario()) == ["file-1", None, None]
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
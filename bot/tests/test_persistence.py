@@ -0,0 +1,47 @@
+# test_persistence.py
+import asyncio
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+
+from persistence import SQLitePersistence, _dump
+
+
+def make_store(tmp_path):
+    store = SQLitePersistence(str(tmp_path / "state.sqlite3"))
+    store._application = SimpleNamespace(_user_data=defaultdict(dict), _conversation_handler_conversations={})
+    asyncio.run(store._in_thread(store._write, {1: _dump({"plan": 1})}, {}))
+    return store
+
+
+def user_update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id))
+
+
+def test_user_is_read_in_the_state_thread_once(tmp_path):
+    store = make_store(tmp_path)
+    select_user = store._select_user
+    threads = []
+
+    def recording_select(user_id):
+        threads.append(threading.current_thread().name)
+        return select_user(user_id)
+
+    store._select_user = recording_select
+
+    async def scenario():
+        await asyncio.gather(store._load(user_update(1), None), store._load(user_update(1), None))
+
+    asyncio.run(scenario())
+    assert store._application._user_data[1] == {"plan": 1}
+    assert len(threads) == 1 and threads[0].startswith("bot-state-writer")
+    assert threading.current_thread().name not in threads
+
+
+def test_unsaved_changes_win_over_the_database(tmp_path):
+    store = make_store(tmp_path)
+    store._pending_users[1] = _dump({"plan": 2})
+
+    asyncio.run(store._load(user_update(1), None))
+
+    assert store._application._user_data[1] == {"plan": 2}
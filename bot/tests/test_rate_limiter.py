@@ -0,0 +1,71 @@
+# test_rate_limiter.py
+import asyncio
+import datetime
+import time
+
+from telegram.error import RetryAfter
+
+from rate_limiter import PRIORITY_BULK, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, PriorityRateLimiter
+
+
+def send(limiter, chat_id, callback, priority=None):
+    rate_limit_args = {"priority": priority} if priority is not None else None
+    return limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": chat_id}, rate_limit_args)
+
+
+def test_retry_after_pauses_the_buckets():
+    limiter = PriorityRateLimiter(global_rate=1000, global_burst=1000, chat_rate=1000, chat_burst=1000,
+                                  max_retries=2)
+    calls = []
+
+    async def flood_once():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryAfter(datetime.timedelta(seconds=0.2))
+        return "sent"
+
+    async def other_chat():
+        return time.monotonic()
+
+    async def scenario():
+        first = asyncio.create_task(send(limiter, 1, flood_once))
+        while not calls:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        # Пауза после 429 действует и на чат, и на все исходящие запросы
+        assert limiter._chat_buckets[1].delay(time.monotonic()) > 0.1
+        other_sent_at = await send(limiter, 2, other_chat)
+        return await first, other_sent_at
+
+    result, other_sent_at = asyncio.run(scenario())
+    assert result == "sent"
+    assert limiter.retry_after_count == 1
+    assert calls[1] - calls[0] >= 0.19
+    assert other_sent_at - calls[0] >= 0.19
+
+
+def test_priority_traffic_is_served_before_bulk():
+    limiter = PriorityRateLimiter(global_rate=50, global_burst=1, chat_rate=1000, chat_burst=1000)
+    order = []
+
+    def callback(name):
+        async def sent():
+            order.append(name)
+        return sent
+
+    async def scenario():
+        # Первый запрос забирает единственный токен, остальные ждут в очереди
+        await send(limiter, 0, callback("first"))
+        waiting = [
+            asyncio.create_task(send(limiter, chat_id, callback(name), priority))
+            for chat_id, (name, priority) in enumerate([
+                ("bulk", PRIORITY_BULK), ("low", PRIORITY_LOW), ("normal", PRIORITY_NORMAL),
+                ("bulk-2", PRIORITY_BULK), ("high", PRIORITY_HIGH),
+            ], start=1)
+        ]
+        await asyncio.sleep(0)
+        assert limiter.queued == 5
+        await asyncio.gather(*waiting)
+
+    asyncio.run(scenario())
+    assert order == ["first", "high", "normal", "low", "bulk", "bulk-2"]
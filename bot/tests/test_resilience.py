@@ -0,0 +1,116 @@
+# test_resilience.py
+import asyncio
+
+import httpx
+import pytest
+
+import backend_client
+import resilience
+from resilience import BackendUnavailable, CircuitBreaker, RetryBudget
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_closed_open_half_open_closed(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
+
+    clock[0] += 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    # Пока пробный запрос не завершился, остальные отклоняются
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    assert (breaker.opened, breaker.rejected) == (1, 2)
+
+
+def test_failed_probe_opens_the_breaker_again(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 9
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
+
+
+def test_retry_budget_is_exhausted_and_refills(clock):
+    budget = RetryBudget(ratio=0.5, min_per_second=0, ttl=10)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_withdraw() for _ in range(3)] == [True, True, False]
+    assert budget.exhausted == 1
+
+    clock[0] += 11
+    for _ in range(2):
+        budget.record_request()
+    assert budget.try_withdraw() is True
+
+
+@pytest.fixture
+def failing_backend(monkeypatch):
+    """
+    Бэкенд, отвечающий 503 на всё; свои предохранитель и бюджет повторов без пауз между повторами.
+    """
+    requests = []
+
+    def unavailable(request):
+        requests.append(request)
+        return httpx.Response(503)
+
+    client = httpx.AsyncClient(base_url="http://backend.test/blog", transport=httpx.MockTransport(unavailable))
+    monkeypatch.setattr(backend_client, "_client", client)
+    monkeypatch.setattr(backend_client, "BACKEND_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(backend_client, "BACKEND_GET_RETRIES", 2)
+    monkeypatch.setattr(backend_client, "breaker", CircuitBreaker("test", failure_threshold=100))
+    backend_client.validators.clear()
+    yield requests
+    asyncio.run(client.aclose())
+
+
+def test_retries_stop_when_budget_is_exhausted(failing_backend, monkeypatch):
+    budget = RetryBudget(ratio=0, min_per_second=0.1, ttl=10)
+    monkeypatch.setattr(backend_client, "retry_budget", budget)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(backend_client.backend_get("/subscription-plans/"))
+    # Бюджет - один повтор на окно: первый GET повторён один раз из двух возможных
+    assert len(failing_backend) == 2
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(backend_client.backend_get("/subscription-plans/"))
+    # Второй GET уже не повторяется вовсе
+    assert len(failing_backend) == 3
+    assert budget.exhausted == 2
+
+
+def test_open_breaker_refuses_without_a_request(failing_backend, monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60)
+    monkeypatch.setattr(backend_client, "breaker", breaker)
+    monkeypatch.setattr(backend_client, "retry_budget", RetryBudget())
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(backend_client.backend_get("/subscription-plans/"))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(BackendUnavailable):
+        asyncio.run(backend_client.backend_post("/make-payment/1/", json={}))
+    assert len(failing_backend) == 1
@@ -0,0 +1,40 @@
+# test_subscription_handler.py
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import subscription_handler
+
+PLANS = [
+    {"id": 1, "name": "Месяц", "price": "99000.00"},
+    {"id": 2, "name": "Год", "price": "990000.00"},
+]
+
+
+def make_update(text):
+    return SimpleNamespace(message=SimpleNamespace(text=text, reply_text=AsyncMock()))
+
+
+def test_gift_recipient_shows_plan_keyboard(monkeypatch):
+    monkeypatch.setattr(subscription_handler, "get_subscription_plans", AsyncMock(return_value=PLANS))
+    update = make_update("@friend")
+    context = SimpleNamespace(user_data={})
+
+    state = asyncio.run(subscription_handler.select_gift_recipient(update, context))
+
+    assert state == subscription_handler.SELECT_GIFT_PLAN
+    assert context.user_data["recipient_username"] == "@friend"
+    reply_markup = update.message.reply_text.await_args.kwargs["reply_markup"]
+    callbacks = [button.callback_data for row in reply_markup.inline_keyboard for button in row]
+    assert callbacks == ["select_gift_plan_1", "select_gift_plan_2", "go_back_to_menu"]
+
+
+def test_gift_recipient_rejects_bad_username(monkeypatch):
+    plans = AsyncMock(return_value=PLANS)
+    monkeypatch.setattr(subscription_handler, "get_subscription_plans", plans)
+    update = make_update("friend")
+
+    state = asyncio.run(subscription_handler.select_gift_recipient(update, SimpleNamespace(user_data={})))
+
+    assert state == subscription_handler.SELECT_GIFT_RECIPIENT
+    plans.assert_not_awaited()
@@ -0,0 +1,95 @@
+# test_update_processor.py
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+from telegram import Chat, Message, Update
+
+from update_processor import InFlightBoundedQueue, PerChatUpdateProcessor
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=datetime.datetime.now(datetime.timezone.utc), chat=chat, text="x")
+    return Update(update_id=update_id, message=message)
+
+
+async def process_all(processor, updates, durations):
+    """
+    Запускает обновления в порядке списка; возвращает порядок завершения и
+    наибольшее число одновременно выполнявшихся обработчиков (всего и по чатам).
+    """
+    finished, running, peak = [], {}, {"all": 0}
+
+    async def handler(update):
+        chat_id = update.effective_chat.id
+        running[chat_id] = running.get(chat_id, 0) + 1
+        peak[chat_id] = max(peak.get(chat_id, 0), running[chat_id])
+        peak["all"] = max(peak["all"], sum(running.values()))
+        await asyncio.sleep(durations[update.update_id])
+        running[chat_id] -= 1
+        finished.append(update.update_id)
+
+    await asyncio.gather(*[
+        asyncio.create_task(processor.process_update(update, handler(update))) for update in updates
+    ])
+    return finished, peak
+
+
+def test_same_chat_updates_run_in_order():
+    processor = PerChatUpdateProcessor(max_running_updates=8, max_pending_updates=32)
+    # Первое обновление самое долгое: без порядка внутри чата оно закончилось бы последним
+    updates = [make_update(n, 100) for n in range(1, 5)]
+    durations = {1: 0.04, 2: 0.03, 3: 0.02, 4: 0.01}
+
+    finished, peak = asyncio.run(process_all(processor, updates, durations))
+
+    assert finished == [1, 2, 3, 4]
+    assert peak[100] == 1
+    assert processor.active_chats == 0
+
+
+def test_different_chats_overlap():
+    processor = PerChatUpdateProcessor(max_running_updates=8, max_pending_updates=32)
+    updates = [make_update(1, 100), make_update(2, 200), make_update(3, 100), make_update(4, 300)]
+    durations = {1: 0.05, 2: 0.01, 3: 0.01, 4: 0.01}
+
+    finished, peak = asyncio.run(process_all(processor, updates, durations))
+
+    # Чаты 200 и 300 не ждут долгое обновление чата 100, а его второе - ждёт
+    assert finished.index(2) < finished.index(1) and finished.index(4) < finished.index(1)
+    assert finished.index(1) < finished.index(3)
+    assert peak["all"] == 3
+    assert peak[100] == 1
+
+
+def test_running_updates_are_capped():
+    processor = PerChatUpdateProcessor(max_running_updates=2, max_pending_updates=32)
+    updates = [make_update(n, 100 + n) for n in range(1, 7)]
+
+    finished, peak = asyncio.run(process_all(processor, updates, dict.fromkeys(range(1, 7), 0.01)))
+
+    assert sorted(finished) == [1, 2, 3, 4, 5, 6]
+    assert peak["all"] == 2
+
+
+def test_update_is_recorded_only_after_it_gets_a_slot():
+    recorded = []
+    queue = InFlightBoundedQueue(limit=1)
+    queue.recorder = SimpleNamespace(record=recorded.append)
+
+    async def scenario():
+        await queue.put("first")
+        # Как вебхук: места нет, через таймаут клиент получит 503
+        try:
+            await asyncio.wait_for(queue.put("second"), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        assert recorded == ["first"]
+        queue.get_nowait()
+        queue.task_done()
+        await queue.put("second")
+
+    asyncio.run(scenario())
+    assert recorded == ["first", "second"]
+    assert queue.in_flight == 1
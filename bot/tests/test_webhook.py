@@ -0,0 +1,56 @@
+# test_webhook.py
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from webhook import WebhookApp
+
+UPDATE = b'{"update_id": 1}'
+
+
+def make_application():
+    return SimpleNamespace(
+        initialize=AsyncMock(), start=AsyncMock(), post_init=None,
+        bot=SimpleNamespace(set_webhook=AsyncMock()), update_queue=asyncio.Queue(),
+    )
+
+
+async def post(app, headers):
+    scope = {"type": "http", "path": "/telegram/webhook", "method": "POST", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": UPDATE, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+
+def test_secret_is_required_without_webhook_url():
+    with pytest.raises(ValueError):
+        WebhookApp(make_application(), secret_token="", webhook_url="")
+
+
+def test_generated_secret_is_registered_and_checked():
+    application = make_application()
+    app = WebhookApp(application, secret_token="", webhook_url="https://bot.example/telegram/webhook")
+
+    async def scenario():
+        await app.startup()
+        secret = application.bot.set_webhook.await_args.kwargs["secret_token"]
+        statuses = [
+            await post(app, []),
+            await post(app, [(b"x-telegram-bot-api-secret-token", b"wrong")]),
+            await post(app, [(b"x-telegram-bot-api-secret-token", secret.encode())]),
+        ]
+        return secret, statuses
+
+    secret, statuses = asyncio.run(scenario())
+    assert len(secret) >= 32
+    assert statuses == [403, 403, 200]
+    assert application.update_queue.qsize() == 1
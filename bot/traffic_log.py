@@ -0,0 +1,184 @@
+# traffic_log.py
+"""
+Запись входящих обновлений для воспроизведения (bench_replay.py).
+
+Лог - gzip JSONL: первая строка - заголовок, дальше по строке на обновление
+{"t": секунды от начала записи, "u": обновление}. id пользователей и чатов
+заменяются псевдонимами (HMAC с ключом UPDATE_RECORD_SALT), имена убираются,
+а текст сообщений по умолчанию маскируется с сохранением длины: буквы - "x",
+числа - псевдослучайные цифры того же ключа (одинаковые номера карт и суммы
+остаются одинаковыми, разные - разными, ведущий ноль сохраняется). Команды и
+callback_data остаются как есть, поэтому обновления попадают в те же хендлеры,
+что и в проде.
+
+Запись включается UPDATE_RECORD_PATH и идёт из очереди обновлений
+(InFlightBoundedQueue.put) - одинаково для polling и webhook. Чаты отбираются
+целиком (UPDATE_RECORD_SAMPLE), чтобы сценарии не рвались посередине.
+"""
+import asyncio
+import datetime
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+
+from telegram import Update
+
+from config import (
+    UPDATE_RECORD_MAX_UPDATES,
+    UPDATE_RECORD_PATH,
+    UPDATE_RECORD_REDACT_TEXT,
+    UPDATE_RECORD_SALT,
+    UPDATE_RECORD_SAMPLE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Читается в bench_replay.py (без импорта этого модуля)
+LOG_FORMAT = "bot-updates/1"
+CHAT_TYPES = frozenset({"private", "group", "supergroup", "channel"})
+TEXT_FIELDS = frozenset({"text", "caption"})
+# Псевдонимы не пересекаются с настоящими id пользователей и чатов
+PSEUDONYM_BASE = 10 ** 13
+
+
+DIGITS = re.compile(r"[0-9]+")
+
+
+def redact_text(text: str, digits=lambda run: "7" * len(run)) -> str:
+    """
+    Буквы -> "x", числа -> digits(число); длина (и смещения entities) не меняется. Команда остаётся.
+    """
+    command = ""
+    if text.startswith("/"):
+        command, _, text = text.partition(" ")
+        command += " " if text else ""
+    text = DIGITS.sub(lambda match: digits(match.group()), text)
+    return command + "".join(
+        "x" if char.isalpha() and char <= "\uffff" else char
+        for char in text
+    )
+
+
+class UpdateAnonymiser:
+    def __init__(self, salt: bytes, redact: bool = True):
+        self.salt = salt
+        self.redact = redact
+
+    def pseudonym(self, value: int) -> int:
+        digest = hmac.new(self.salt, str(abs(value)).encode(), hashlib.sha256).digest()
+        pseudonym = PSEUDONYM_BASE + int.from_bytes(digest[:5], "big")
+        return -pseudonym if value < 0 else pseudonym
+
+    def digits(self, run: str) -> str:
+        """
+        Псевдослучайное число той же длины; ноль в начале остаётся нулём, не ноль - не нулём.
+        """
+        digest = hmac.new(self.salt, run.encode(), hashlib.sha256).hexdigest()
+        value = str(int(digest, 16))[-len(run):].rjust(len(run), "0")
+        if run[0] == "0":
+            return "0" + value[1:]
+        return str(int(value[0]) % 9 + 1) + value[1:]
+
+    def anonymise(self, value):
+        if isinstance(value, list):
+            return [self.anonymise(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        # Сам бот (is_bot) не персональные данные, его id нужен как есть
+        person = (value.get("is_bot") is False
+                  or (value.get("type") in CHAT_TYPES and isinstance(value.get("id"), int)))
+        if person:
+            pseudonym = self.pseudonym(value["id"])
+        result = {}
+        for key, item in value.items():
+            if person and key == "id":
+                result[key] = pseudonym
+            elif person and key == "username":
+                result[key] = f"user{pseudonym}"
+            elif person and key == "first_name":
+                result[key] = "User"
+            elif person and key == "title":
+                result[key] = "Chat"
+            elif person and key in ("last_name", "bio", "description"):
+                continue
+            elif key == "phone_number" and isinstance(item, str):
+                result[key] = "+" + "7" * (len(item) - 1)
+            elif key in TEXT_FIELDS and self.redact and isinstance(item, str):
+                result[key] = redact_text(item, self.digits)
+            else:
+                result[key] = self.anonymise(item)
+        return result
+
+
+class UpdateRecorder:
+    def __init__(self, path: str = UPDATE_RECORD_PATH, salt: str = UPDATE_RECORD_SALT,
+                 sample: float = UPDATE_RECORD_SAMPLE, max_updates: int = UPDATE_RECORD_MAX_UPDATES,
+                 redact: bool = UPDATE_RECORD_REDACT_TEXT, clock=time.monotonic):
+        self.path = path
+        # Без ключа псевдонимы случайны для каждого запуска и не связываются между записями
+        self.anonymiser = UpdateAnonymiser(salt.encode() if salt else os.urandom(32), redact)
+        self.sample = sample
+        self.max_updates = max_updates
+        self.clock = clock
+        self._started = None
+        self._lines = []
+        self.recorded = 0
+
+    def record(self, update):
+        """
+        Добавляет обновление в буфер; на диск он пишется в run()/close().
+        """
+        if not isinstance(update, Update) or self.recorded >= self.max_updates:
+            return
+        chat = update.effective_chat or update.effective_user
+        if chat is not None and self.sample < 1:
+            if abs(self.anonymiser.pseudonym(chat.id)) % 10000 >= self.sample * 10000:
+                return
+        now = self.clock()
+        if self._started is None:
+            self._started = now
+            self._lines.append(json.dumps({
+                "format": LOG_FORMAT,
+                "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "redacted_text": self.anonymiser.redact,
+            }))
+        entry = {"t": round(now - self._started, 3), "u": self.anonymiser.anonymise(update.to_dict())}
+        self._lines.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        self.recorded += 1
+        if self.recorded == self.max_updates:
+            logger.info(f"Recorded {self.recorded} updates to {self.path}, recording stopped")
+
+    def _write(self, lines: list):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Каждая запись - отдельный gzip-член; gzip.open читает такой файл целиком
+        with gzip.open(self.path, "at", encoding="utf-8") as log:
+            log.write("\n".join(lines) + "\n")
+
+    async def flush(self):
+        lines, self._lines = self._lines, []
+        if lines:
+            await asyncio.to_thread(self._write, lines)
+
+    async def run(self, interval: float = 5.0):
+        """
+        Фоновая задача: раз в interval секунд дописывает накопленное в файл.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                logger.error(f"Failed to write recorded updates to {self.path}: {e}")
+
+    async def close(self):
+        await self.flush()
+
+
+update_recorder = UpdateRecorder()
@@ -0,0 +1,139 @@
+# update_processor.py
+import asyncio
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from instrumentation import trace_update
+
+logger = logging.getLogger(__name__)
+
+
+def ordering_key(update):
+    """
+    Ключ, в пределах которого обновления должны обрабатываться строго по порядку.
+    Используется чат (для личных чатов он совпадает с пользователем), иначе пользователь.
+    """
+    if isinstance(update, Update):
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка обновлений с сохранением порядка внутри одного чата.
+
+    Обновления разных чатов обрабатываются одновременно, но не более
+    max_running_updates за раз. Обновления одного чата выполняются строго в
+    порядке поступления, поэтому состояния ConversationHandler (подписка,
+    пополнение, карта клиента, поддержка) остаются согласованными.
+
+    Обновление, ожидающее свою очередь в чате, не занимает слот
+    max_running_updates - медленный пользователь не блокирует остальных.
+    max_pending_updates ограничивает общее число принятых обновлений и должен
+    быть не меньше размера очереди обновлений, иначе порядок не гарантируется.
+
+    Если передана update_queue (InFlightBoundedQueue), время ожидания
+    обновления от попадания в очередь до начала обработки идёт в метрики.
+    """
+
+    def __init__(self, max_running_updates: int, max_pending_updates: int, update_queue=None):
+        if max_pending_updates < max_running_updates:
+            raise ValueError("max_pending_updates must not be smaller than max_running_updates")
+        super().__init__(max_pending_updates)
+        self.max_running_updates = max_running_updates
+        self._running = asyncio.BoundedSemaphore(max_running_updates)
+        self.update_queue = update_queue
+        # ключ -> [asyncio.Lock, число обновлений этого ключа в обработке]
+        self._chat_locks = {}
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._chat_locks)
+
+    async def _run(self, update, coroutine):
+        enqueued_at = self.update_queue.pop_enqueued_at(update) if self.update_queue is not None else None
+        queue_wait = time.monotonic() - enqueued_at if enqueued_at is not None else 0.0
+        with trace_update(update, queue_wait):
+            await coroutine
+
+    async def do_process_update(self, update, coroutine):
+        key = ordering_key(update)
+        if key is None:
+            async with self._running:
+                await self._run(update, coroutine)
+            return
+
+        # Блокировка берётся без переключения контекста в порядке создания задач,
+        # а asyncio.Lock будит ожидающих по FIFO - порядок внутри чата сохраняется.
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._running:
+                    await self._run(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class InFlightBoundedQueue(asyncio.Queue):
+    """
+    Очередь обновлений, ограничивающая не только ожидающие, но и уже
+    обрабатываемые обновления.
+
+    При параллельной обработке Application сразу забирает обновления из очереди
+    и создаёт задачи, поэтому обычный maxsize перестаёт давать backpressure.
+    Здесь put() ждёт, пока число обновлений, для которых ещё не вызван
+    task_done(), не станет меньше limit.
+
+    recorder (traffic_log.UpdateRecorder) получает обновление, когда оно заняло слот.
+    Обновление, не дождавшееся места (вебхук ответил 503), не записывается: Telegram
+    доставит его снова, и в журнале оно появится один раз.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self._in_flight = 0
+        self._slots = asyncio.Semaphore(limit)
+        # id(элемента) -> время постановки в очередь, для метрики ожидания
+        self._enqueued_at = {}
+        self.recorder = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def put(self, item):
+        received_at = time.monotonic()
+        await self._slots.acquire()
+        if self.recorder is not None:
+            self.recorder.record(item)
+        self._in_flight += 1
+        self._enqueued_at[id(item)] = received_at
+        self.put_nowait(item)
+
+    def pop_enqueued_at(self, item):
+        return self._enqueued_at.pop(id(item), None)
+
+    def task_done(self):
+        super().task_done()
+        # Элементы, добавленные напрямую через put_nowait, слот не занимали
+        if self._in_flight > 0:
+            self._in_flight -= 1
+            self._slots.release()
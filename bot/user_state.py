@@ -0,0 +1,166 @@
+# user_state.py
+"""
+Ограничение памяти под состояние пользователей.
+
+Application хранит context.user_data и состояния разговоров для каждого, кто
+когда-либо писал боту. Без очистки это растёт вечно: брошенный на середине
+сценарий (карта клиента, оплата, пополнение) остаётся в памяти навсегда.
+
+FlowConversationHandler убирает ключи user_data своего сценария, как только
+разговор заканчивается. UserStateJanitor следит за активностью пользователей
+(в порядке LRU) и освобождает всё состояние тех, кто молчит дольше idle_timeout,
+а при превышении max_users - самых давно неактивных (с SQLitePersistence их
+состояние только выгружается из памяти и остаётся в базе):
+
+    janitor = UserStateJanitor(idle_timeout=1800, max_users=50000)
+    janitor.attach(application)          # после регистрации всех хендлеров
+    asyncio.create_task(janitor.run(60))  # периодическая очистка простаивающих
+
+Штатный conversation_timeout ConversationHandler требует JobQueue (APScheduler)
+и заводит по задаче на каждый разговор, поэтому здесь не используется.
+"""
+import asyncio
+import collections
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import ConversationHandler, TypeHandler
+
+from config import USER_STATE_IDLE_TIMEOUT, USER_STATE_MAX_USERS
+from metrics import COLLECTORS, sample_lines
+from persistence import SQLitePersistence
+
+logger = logging.getLogger(__name__)
+
+# Группа хендлера, отмечающего активность: раньше всех остальных
+ACTIVITY_HANDLER_GROUP = -1
+
+
+class FlowConversationHandler(ConversationHandler):
+    """
+    ConversationHandler, который удаляет flow_keys из user_data, когда разговор
+    заканчивается - успешно, кнопкой "Назад" или из-за ошибки.
+    """
+    __slots__ = ("flow_keys",)
+
+    def __init__(self, *args, flow_keys=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flow_keys = tuple(flow_keys)
+
+    async def handle_update(self, update, application, check_result, context):
+        try:
+            return await super().handle_update(update, application, check_result, context)
+        finally:
+            conversation_key = check_result[1]
+            if conversation_key not in self._conversations and context.user_data is not None:
+                for key in self.flow_keys:
+                    context.user_data.pop(key, None)
+
+
+class UserStateJanitor:
+    def __init__(self, idle_timeout: float = USER_STATE_IDLE_TIMEOUT, max_users: int = USER_STATE_MAX_USERS,
+                 clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.max_users = max_users
+        self.clock = clock
+        # user_id -> (время последнего обновления, chat_id); самые давние - в начале
+        self._last_seen = collections.OrderedDict()
+        self._application = None
+        self._conversations = []
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    @property
+    def tracked_users(self) -> int:
+        return len(self._last_seen)
+
+    def attach(self, application):
+        """
+        Подключает учёт активности к Application. Вызывать после добавления всех хендлеров.
+        """
+        self._application = application
+        self._conversations = [
+            handler
+            for handlers in application.handlers.values()
+            for handler in handlers
+            if isinstance(handler, ConversationHandler) and not handler.per_message
+        ]
+        application.add_handler(TypeHandler(Update, self._track), group=ACTIVITY_HANDLER_GROUP)
+        if self._collect not in COLLECTORS:
+            COLLECTORS.append(self._collect)
+
+    async def _track(self, update: Update, context):
+        user = update.effective_user
+        if user is not None:
+            chat = update.effective_chat
+            self.touch(user.id, chat.id if chat else user.id)
+
+    def touch(self, user_id: int, chat_id: int):
+        self._last_seen[user_id] = (self.clock(), chat_id)
+        self._last_seen.move_to_end(user_id)
+        while len(self._last_seen) > self.max_users:
+            self.evict(next(iter(self._last_seen)), forget=False)
+            self.evicted_lru += 1
+
+    def evict(self, user_id: int, forget: bool = True):
+        """
+        Удаляет user_data пользователя, chat_data его личного чата и незавершённые разговоры.
+        forget=False (вытеснение по max_users) при SQLitePersistence только выгружает
+        состояние из памяти: в базе оно остаётся и подгрузится при следующем обновлении.
+        """
+        _, chat_id = self._last_seen.pop(user_id, (None, user_id))
+        application = self._application
+        if chat_id == user_id:
+            application.drop_chat_data(chat_id)
+        conversations = []
+        for handler in self._conversations:
+            key = []
+            if handler.per_chat:
+                key.append(chat_id)
+            if handler.per_user:
+                key.append(user_id)
+            conversations.append((handler, tuple(key)))
+        if not forget and isinstance(application.persistence, SQLitePersistence):
+            application.persistence.unload_user(user_id, conversations)
+            return
+        application.drop_user_data(user_id)
+        for handler, key in conversations:
+            # Публичного способа завершить чужой разговор нет, поэтому словарь состояний правится напрямую
+            handler._conversations.pop(key, None)
+
+    def sweep(self) -> int:
+        """
+        Освобождает состояние всех, кто неактивен дольше idle_timeout. Возвращает их число.
+        """
+        deadline = self.clock() - self.idle_timeout
+        evicted = 0
+        while self._last_seen:
+            user_id, (last_seen, _) = next(iter(self._last_seen.items()))
+            if last_seen > deadline:
+                break
+            self.evict(user_id)
+            evicted += 1
+        self.evicted_idle += evicted
+        return evicted
+
+    async def run(self, interval: float):
+        """
+        Фоновая задача: sweep() каждые interval секунд.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.sweep()
+            if evicted:
+                logger.info(f"Dropped state of {evicted} idle users, {self.tracked_users} still tracked")
+
+    def _collect(self) -> list:
+        lines = sample_lines("bot_user_state_tracked_users", "Users whose bot state is kept in memory.",
+                             [({}, self.tracked_users)])
+        lines += sample_lines("bot_user_state_evicted_total", "Users whose bot state was dropped.",
+                              [({"reason": "idle"}, self.evicted_idle), ({"reason": "lru"}, self.evicted_lru)],
+                              kind="counter")
+        return lines
+
+
+user_state_janitor = UserStateJanitor()
@@ -0,0 +1,157 @@
+# webhook.py
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_ENQUEUE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = b"x-telegram-bot-api-secret-token"
+
+
+class WebhookApp:
+    """
+    Минимальное ASGI-приложение, принимающее обновления от Telegram.
+
+    Проверяет заголовок X-Telegram-Bot-Api-Secret-Token и кладёт обновление в
+    application.update_queue. Очередь ограничена (UPDATE_QUEUE_MAXSIZE), поэтому
+    если обработчики не успевают, запрос ждёт места до enqueue_timeout секунд и
+    затем получает 503 - Telegram повторит доставку позже.
+
+    Без секрета вебхук принимал бы поддельные обновления, поэтому он обязателен:
+    если secret_token не задан, а вебхук регистрирует само приложение (webhook_url),
+    секрет генерируется и передаётся в setWebhook; иначе WebhookApp не создаётся.
+
+    При запуске через ASGI-сервер lifespan-события инициализируют и запускают
+    Application, а также регистрируют вебхук (если задан webhook_url).
+    """
+
+    def __init__(self, application: Application, secret_token: str = WEBHOOK_SECRET_TOKEN,
+                 path: str = WEBHOOK_PATH, webhook_url: str = WEBHOOK_URL,
+                 enqueue_timeout: float = WEBHOOK_ENQUEUE_TIMEOUT):
+        if not secret_token:
+            if not webhook_url:
+                raise ValueError("WEBHOOK_SECRET_TOKEN is required when the webhook is not registered "
+                                 "by the bot (WEBHOOK_URL is empty)")
+            secret_token = secrets.token_urlsafe(32)
+            logger.info("WEBHOOK_SECRET_TOKEN is not set, using a generated secret token")
+        self.application = application
+        self.secret_token = secret_token.encode()
+        self.path = path
+        self.webhook_url = webhook_url
+        self.enqueue_timeout = enqueue_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.exception("Webhook startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        await self.application.initialize()
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        if self.webhook_url:
+            await self.application.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.secret_token.decode(),
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+            logger.info(f"Webhook registered at {self.webhook_url}")
+        await self.application.start()
+
+    async def shutdown(self):
+        if self.application.running:
+            await self.application.stop()
+        if self.application.post_stop:
+            await self.application.post_stop(self.application)
+        await self.application.shutdown()
+        if self.application.post_shutdown:
+            await self.application.post_shutdown(self.application)
+
+    async def _http(self, scope, receive, send):
+        if scope["path"] != self.path:
+            await self._respond(send, 404)
+            return
+        if scope["method"] != "POST":
+            await self._respond(send, 405)
+            return
+
+        received = dict(scope["headers"]).get(SECRET_TOKEN_HEADER, b"")
+        if not hmac.compare_digest(received, self.secret_token):
+            logger.warning("Webhook request with invalid secret token rejected")
+            await self._respond(send, 403)
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f"Invalid update payload: {e}")
+            await self._respond(send, 400)
+            return
+
+        try:
+            await asyncio.wait_for(self.application.update_queue.put(update), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue is full, update {update.update_id} will be redelivered")
+            await self._respond(send, 503)
+            return
+
+        await self._respond(send, 200)
+
+    @staticmethod
+    async def _respond(send, status_code: int):
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", b"0")],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+def run_webhook(application: Application):
+    """
+    Запускает бота в режиме вебхука под uvicorn.
+    """
+    import uvicorn  # Нужен только в режиме вебхука
+
+    app = WebhookApp(application)
+    uvicorn.run(app, host=WEBHOOK_LISTEN, port=WEBHOOK_PORT, lifespan="on", log_level="info")
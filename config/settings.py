@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -135,6 +136,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'files/static')
 MEDIA_URL = '/uploads/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'files/uploads')
 
+# Кэш готовых ответов справочных эндпоинтов (blog/response_cache.py). Файловый
+# кэш в общей папке виден всем воркерам на машине; при нескольких машинах -
+# общая папка или другой бэкенд Django с атомарным add() (например, DatabaseCache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'blog.cache_backends.FileBasedCache',
+        'LOCATION': os.environ.get('RESPONSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'blog-response-cache')),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 24 * 3600)),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+# Сколько ждать ответ, который строит другой запрос, прежде чем строить самому (сек)
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 